@@ -0,0 +1,46 @@
+import threading
+from collections import OrderedDict
+
+
+class AgentCache:
+    """
+    LRU cache of compiled agents keyed by the set of tool names they are allowed to use.
+    build(tool_names) compiles the agent, it is only called on a miss, the max_size least recently used agents are kept.
+    """
+    def __init__(self, build, max_size: int = 32):
+        self.build = build
+        self.max_size = max_size
+        self._agents = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, tool_names):
+        key = frozenset(tool_names)
+        with self._lock:
+            agent = self._agents.get(key)
+            if agent is not None:
+                self._agents.move_to_end(key)
+                self.hits += 1
+                return agent
+            self.misses += 1
+
+        # Built outside the lock, two requests racing for a new tool set both compile, one result is kept
+        agent = self.build(key)
+        with self._lock:
+            agent = self._agents.setdefault(key, agent)
+            self._agents.move_to_end(key)
+            while len(self._agents) > self.max_size:
+                self._agents.popitem(last=False)
+        return agent
+
+    def clear(self):
+        """
+        Drops every agent, call it when the tool list changes.
+        """
+        with self._lock:
+            self._agents.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"agents": len(self._agents), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
@@ -12,6 +12,7 @@ function appendMessage(sender, text, isHtml = false) {
     }
     chatWindow.appendChild(msgDiv);
     chatWindow.scrollTop = chatWindow.scrollHeight;
+    return msgDiv;
 }
 
 let allTools = [];
@@ -136,8 +137,40 @@ document.addEventListener('DOMContentLoaded', () => {
         appendMessage('user', message);
         userInput.value = '';
         appendMessage('agent', '...'); // loading indicator
+        const agentDiv = chatWindow.querySelector('.message.agent:last-child');
+        let answer = '';
+        // Tool messages by the run_id of their call, parallel calls may finish in any order
+        const toolDivs = new Map();
+        const render = (text) => {
+            agentDiv.innerHTML = marked.parse(text);
+            chatWindow.scrollTop = chatWindow.scrollHeight;
+        };
+        // Events arrive as NDJSON: tokens are appended to the answer, tool calls are shown as they happen
+        const handleEvent = (event) => {
+            if (event.type === 'token') {
+                answer += event.content;
+                render(answer);
+            } else if (event.type === 'tool_start') {
+                toolDivs.set(event.run_id, appendMessage('tool', `Calling ${event.name}...`));
+            } else if (event.type === 'tool_end') {
+                const toolDiv = toolDivs.get(event.run_id);
+                if (toolDiv) toolDiv.textContent = `${event.name} finished`;
+                toolDivs.delete(event.run_id);
+            } else if (event.type === 'done') {
+                answer = event.response || answer;
+                if (answer) {
+                    render(answer);
+                } else {
+                    agentDiv.textContent = '[No response]';
+                }
+                // Keep the answer below the tool messages of this turn
+                chatWindow.appendChild(agentDiv);
+            } else if (event.type === 'error') {
+                agentDiv.textContent = '[Error] ' + event.error;
+            }
+        };
         try {
-            const res = await fetch('http://0.0.0.0:8080/agent', {
+            const res = await fetch('http://0.0.0.0:8080/agent/stream', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({ 
@@ -145,23 +178,22 @@ document.addEventListener('DOMContentLoaded', () => {
                     session_id: uuid,
                 })
             });
-            const data = await res.json();
-            console.log("DATA IS :", data);
-            // Remove the loading indicator
-            const loading = chatWindow.querySelector('.message.agent:last-child');
-            if (loading && loading.textContent === '...') loading.remove();
-            if (data.response) {
-                const html = marked.parse(data.response);
-                appendMessage('agent', html, true);
-            } else if (data.error) {
-                appendMessage('agent', '[Error] ' + data.error);
-            } else {
-                appendMessage('agent', '[No response]');
+            const reader = res.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                const lines = buffer.split('\n');
+                buffer = lines.pop();
+                for (const line of lines) {
+                    if (line.trim()) handleEvent(JSON.parse(line));
+                }
             }
+            if (buffer.trim()) handleEvent(JSON.parse(buffer));
         } catch (err) {
-            const loading = chatWindow.querySelector('.message.agent:last-child');
-            if (loading && loading.textContent === '...') loading.remove();
-            appendMessage('agent', '[Network error]');
+            agentDiv.textContent = '[Network error]';
         }
     });
 });
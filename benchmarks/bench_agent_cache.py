@@ -0,0 +1,65 @@
+"""
+Per request agent setup overhead of lg_agent.agent_node.
+Compares bind_tools + create_react_agent on every request with the AgentCache lookup.
+No LLM is called, only the setup before agent.invoke is timed.
+
+Usage: python benchmarks/bench_agent_cache.py [--tools 40] [--requests 50]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import create_model
+from langchain.tools import StructuredTool
+from langchain_openai import ChatOpenAI
+from langgraph.prebuilt import create_react_agent
+from agent_cache import AgentCache
+
+
+def make_tools(n_tools: int) -> list:
+    tools = []
+    for i in range(n_tools):
+        args_schema = create_model(f"Tool{i}_Args", **{f"field{j}": (str, None) for j in range(10)})
+        tools.append(StructuredTool(name=f"tool{i}", func=lambda **kwargs: kwargs, description=f"Synthetic tool {i}", args_schema=args_schema))
+    return tools
+
+def report(name: str, times: list):
+    print(f"{name:<8} median {statistics.median(times):9.3f} ms   min {min(times):9.3f} ms   max {max(times):9.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tools", type=int, default=40)
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    llm = ChatOpenAI(openai_api_key="sk-benchmark", temperature=0, model="gpt-4o-mini")
+    tools = make_tools(args.tools)
+    tool_names = [tool.name for tool in tools]
+
+    def build_agent(names):
+        return create_react_agent(llm, tools=[tool for tool in tools if tool.name in names], prompt="benchmark")
+
+    before = []
+    for _ in range(args.requests):
+        start = time.perf_counter()
+        # Old agent_node
+        llm_with_tools = llm.bind_tools(tools)
+        create_react_agent(llm_with_tools, tools=tools, prompt="benchmark")
+        before.append((time.perf_counter() - start) * 1000)
+
+    cache = AgentCache(build_agent)
+    cache.get(tool_names)  # compiled at startup in lg_agent's lifespan
+    after = []
+    for _ in range(args.requests):
+        start = time.perf_counter()
+        cache.get(tool_names)
+        after.append((time.perf_counter() - start) * 1000)
+
+    print(f"{args.tools} tools, {args.requests} requests")
+    report("before", before)
+    report("after", after)
@@ -0,0 +1,132 @@
+"""
+Startup benchmark for IDEP tool/resource registration.
+Compares the old exec-based registration with the compiled registry (cold: no cache, warm: cache on disk).
+
+Usage: python benchmarks/bench_idep_startup.py [--tables 300] [--functions 50] [--repeat 5]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastmcp import FastMCP
+import idep_registry
+from idep_registry import load_registry, clear_registry_memo, param_to_python_type
+
+FIELD_TYPES = ["text", "integer", "real", "datetime"]
+
+
+def make_idep(n_tables: int, n_functions: int) -> dict:
+    functions = {}
+    for i in range(n_functions):
+        functions[f"Function{i}"] = {
+            "description": f"Synthetic function {i}.",
+            "constants": {"ScenarioCode": "string", "UserName": "string"},
+            "params": {f"Param{j}": ["string", "integer", "boolean", "list"][j % 4] for j in range(8)},
+            "returns": {"IsFeasible": "boolean"}
+        }
+    db_schemas = []
+    for i in range(n_tables):
+        fields = {f"Field{j}": FIELD_TYPES[j % len(FIELD_TYPES)] for j in range(12)}
+        db_schemas.append({f"Table{i}": {"Description": f"Synthetic table {i}", "PrimaryKeys": ["Field0"], "Fields": fields}})
+    return {"LLMTools": {"Functions": functions, "DBSchemas": db_schemas}}
+
+
+# --- Old exec based registration, kept here as the baseline ---
+
+def _noop_message(name, **kwargs):
+    return json.dumps(kwargs, default=str)
+
+def _noop_call(name, json_msg):
+    return {"result": json_msg}
+
+def register_exec(mcp: FastMCP, idep_file: str):
+    with open(idep_file, "r") as file:
+        function_jsons = json.load(file).get("LLMTools", {}).get("Functions", {})
+    for tool_name, tool_json in function_jsons.items():
+        params = list(tool_json.get("params", {}).items()) + list(tool_json.get("constants", {}).items())
+        param_sig = ", ".join(f"{param}: {param_to_python_type(typ)}" for param, typ in params)
+        function_code = f"""
+def {tool_name}({param_sig}):
+    \"\"\"{tool_json.get("description", "")}\"\"\"
+    kwargs = locals()
+    return external_function_call('{tool_name}', get_message_json('{tool_name}', **kwargs))
+        """
+        namespace = {"get_message_json": _noop_message, "external_function_call": _noop_call}
+        exec(function_code, namespace)
+        mcp.tool(namespace[tool_name], output_schema=idep_registry.output_schema_from_returns(tool_json.get("returns", {})))
+
+    with open(idep_file, "r") as file:
+        db_schemas = json.load(file).get("LLMTools", {}).get("DBSchemas", {})
+    for db_schema in db_schemas:
+        table_name, table_json = next(iter(db_schema.items()))
+        fields = table_json.get("Fields", {})
+        param_sig = ", ".join(f"{field}: {param_to_python_type(typ)}" for field, typ in fields.items())
+        function_code = f"""
+def {table_name}({param_sig}):
+    \"\"\"{table_json.get("Description", "")}\"\"\"
+    kwargs = locals()
+    return external_data_extract_call('{table_name}', get_data_message('{table_name}', **kwargs))
+        """
+        namespace = {"datetime": datetime, "get_data_message": _noop_message, "external_data_extract_call": _noop_call}
+        exec(function_code, namespace)
+        uri_params = "/".join([f"{{{field}}}" for field in fields.keys()])
+        mcp.resource(f"resource://{table_name}/{uri_params}")(namespace[table_name])
+
+def register_compiled(mcp: FastMCP, idep_file: str, cache_dir: str):
+    async def call(name, kwargs):
+        return _noop_call(name, _noop_message(name, **kwargs))
+    registry = load_registry(idep_file, cache_dir=cache_dir)
+    for tool in registry.build_tools(call):
+        mcp.add_tool(tool)
+    for template in registry.build_resource_templates(call):
+        mcp.add_template(template)
+
+
+def timed(func, repeat: int, setup=None) -> list:
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        mcp = FastMCP(name="bench")
+        start = time.perf_counter()
+        func(mcp)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+def report(name: str, times: list):
+    print(f"{name:<10} median {statistics.median(times):9.2f} ms   min {min(times):9.2f} ms   max {max(times):9.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tables", type=int, default=300)
+    parser.add_argument("--functions", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="idep_bench_")
+    try:
+        idep_file = os.path.join(work_dir, "bench.idep")
+        cache_dir = os.path.join(work_dir, "cache")
+        with open(idep_file, "w") as file:
+            json.dump(make_idep(args.tables, args.functions), file)
+        print(f"{args.functions} functions, {args.tables} tables, IDEP size {os.path.getsize(idep_file) / 1024:.1f} KiB")
+
+        def cold_setup():
+            clear_registry_memo()
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+        report("exec", timed(lambda mcp: register_exec(mcp, idep_file), args.repeat))
+        report("cold", timed(lambda mcp: register_compiled(mcp, idep_file, cache_dir), args.repeat, setup=cold_setup))
+        # The cache is left on disk by the last cold run, only the in-process memo is dropped
+        report("warm", timed(lambda mcp: register_compiled(mcp, idep_file, cache_dir), args.repeat, setup=clear_registry_memo))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
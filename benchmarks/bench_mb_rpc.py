@@ -0,0 +1,97 @@
+"""
+Throughput of concurrent OrderSimulation calls over the message broker RPC transport (mb_rpc.RPCClient).
+Every call is published with its own correlation id on one connection, the server answers {"IsFeasible": true}
+after --latency seconds. Runs against the in-memory broker stand-in by default, --rabbitmq uses a real broker
+(the server then consumes a temporary queue on the same broker).
+
+Usage: python benchmarks/bench_mb_rpc.py [--calls 2000] [--concurrency 1,8,64] [--latency 0.005] [--rabbitmq localhost:5672]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mb_rpc import RPCClient, InMemoryBroker, PikaBroker
+
+ORDER = {
+    "CustomerName": "Beykoz Market", "ItemName": "Widget", "Priority": 1, "Quantity": 40, "Date": "2025-07-01 00:00:00",
+    "LineStatus": "Confirmed", "ScenarioCode": "Base", "UserName": "benchmark", "InventoryCode": "INV-1",
+}
+QUEUE = "bench_order_simulation"
+
+
+def order_simulation(body: bytes, headers: dict) -> bytes:
+    request = json.loads(body)
+    return json.dumps({"IsFeasible": request["Quantity"] < 100}).encode("utf-8")
+
+def start_rabbitmq_server(host: str, port: int, latency: float, workers: int):
+    """
+    RPC server threads on a real broker: consume QUEUE, answer to reply_to with the request's correlation id.
+    """
+    import pika
+
+    def serve():
+        connection = pika.BlockingConnection(pika.ConnectionParameters(host=host, port=port))
+        channel = connection.channel()
+        channel.queue_declare(queue=QUEUE, auto_delete=True)
+        channel.basic_qos(prefetch_count=1)
+
+        def on_request(channel, method, properties, body):
+            if latency:
+                time.sleep(latency)
+            channel.basic_publish(exchange="", routing_key=properties.reply_to, body=order_simulation(body, properties.headers),
+                                  properties=pika.BasicProperties(correlation_id=properties.correlation_id))
+            channel.basic_ack(method.delivery_tag)
+
+        channel.basic_consume(queue=QUEUE, on_message_callback=on_request)
+        channel.start_consuming()
+
+    for _ in range(workers):
+        threading.Thread(target=serve, daemon=True).start()
+    time.sleep(1)
+
+async def run(client: RPCClient, calls: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    body = json.dumps(ORDER)
+
+    async def one_call():
+        async with semaphore:
+            reply = json.loads(await client.acall(QUEUE, body, {"RequestType": "Function", "Name": "OrderSimulation"}))
+            assert reply == {"IsFeasible": True}
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_call() for _ in range(calls)))
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--concurrency", default="1,8,64")
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--workers", type=int, default=64, help="server instances answering in parallel")
+    parser.add_argument("--rabbitmq", default=None, help="host:port of a RabbitMQ broker")
+    args = parser.parse_args()
+
+    if args.rabbitmq:
+        host, port = args.rabbitmq.split(":")
+        start_rabbitmq_server(host, int(port), args.latency, args.workers)
+        broker = PikaBroker(host, int(port))
+    else:
+        broker = InMemoryBroker(workers=args.workers, latency=args.latency)
+        broker.serve(QUEUE, order_simulation)
+
+    client = RPCClient(broker, exchange="", timeout=5.0)
+    client.start()
+    print(f"{args.calls} OrderSimulation calls, server latency {args.latency * 1000:g} ms, {'rabbitmq' if args.rabbitmq else 'in-memory broker'}")
+    for concurrency in [int(value) for value in args.concurrency.split(",")]:
+        calls = min(args.calls, 200) if concurrency == 1 else args.calls
+        elapsed = asyncio.run(run(client, calls, concurrency))
+        print(f"in flight {concurrency:4d}   {calls / elapsed:9.1f} calls/s   {elapsed / calls * 1000:7.3f} ms per call")
+    print(f"timeouts {client.stats['timeouts']}   late replies {client.stats['late_replies']}   pending {client.pending()}")
+    client.close()
@@ -0,0 +1,96 @@
+"""
+Tool call latency benchmark of the agents' MCP client.
+Compares the old requests.post + resp.text scan with the shared MCPTransport against a local FastMCP server.
+The old client sends no MCP session id, so the server is started in stateless mode for it to work at all.
+
+Usage: python benchmarks/bench_mcp_transport.py [--calls 500] [--threads 8] [--payload 2000]
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from fastmcp import FastMCP
+from mcp_transport import MCPTransport
+
+
+def start_server(port: int, payload_size: int):
+    mcp = FastMCP(name="bench", stateless_http=True)
+
+    @mcp.tool
+    def echo(text: str) -> dict:
+        return {"result": json.dumps({"text": text, "padding": "x" * payload_size})}
+
+    thread = threading.Thread(
+        target=mcp.run,
+        kwargs={"transport": "http", "port": port, "log_level": "error"},
+        daemon=True,
+    )
+    thread.start()
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("Benchmark server did not start")
+
+
+# --- Old lg_agent.mcp_tool_call, kept here as the baseline ---
+
+def legacy_tool_call(url, tool_name, input_dict):
+    payload = {"jsonrpc": "2.0", "id": 1, "method": "tools/call", "params": {"name": tool_name, "arguments": input_dict}}
+    resp = requests.post(url, json=payload, headers={"Accept": "application/json, text/event-stream", "Content-Type": "application/json"})
+    resp.raise_for_status()
+    if resp.text.startswith("event: message"):
+        for line in resp.text.splitlines():
+            if line.startswith("data: "):
+                data = json.loads(line[len("data: "):].strip())
+                if isinstance(data, dict) and "result" in data:
+                    return data["result"]
+                return data
+    return resp.json().get("result", resp.text)
+
+
+def run(call, calls: int, threads: int) -> list:
+    def timed(i):
+        start = time.perf_counter()
+        result = call(i)
+        assert "content" in result, result
+        return (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(timed, range(min(calls, 20))))  # warm up
+        start = time.perf_counter()
+        times = list(pool.map(timed, range(calls)))
+        elapsed = time.perf_counter() - start
+    return times, elapsed
+
+def report(name: str, times: list, elapsed: float):
+    times = sorted(times)
+    print(f"{name:<10} p50 {statistics.median(times):7.2f} ms   p95 {times[int(len(times) * 0.95) - 1]:7.2f} ms   {len(times) / elapsed:8.1f} calls/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--payload", type=int, default=2000)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    url = f"http://127.0.0.1:{args.port}/mcp/"
+    start_server(args.port, args.payload)
+    transport = MCPTransport(url)
+    print(f"{args.calls} calls, {args.threads} threads, ~{args.payload} byte results")
+    report("legacy", *run(lambda i: legacy_tool_call(url, "echo", {"text": str(i)}), args.calls, args.threads))
+    report("transport", *run(lambda i: transport.call_tool("echo", {"text": str(i)}), args.calls, args.threads))
+    transport.close()
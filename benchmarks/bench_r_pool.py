@@ -0,0 +1,59 @@
+"""
+R tool call latency: one Rscript process per call (terminal_approach) against the warm RWorkerPool.
+Both call myfunc from the test_tool.r scripts with the same argument. Needs R and Rscript on the PATH.
+
+Usage: python benchmarks/bench_r_pool.py [--calls 50] [--threads 4] [--workers 4]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from r_pool import RWorkerPool
+
+SPAWN_SCRIPT = os.path.join(ROOT, "terminal_approach", "test_tool.r")
+POOL_SCRIPT = os.path.join(ROOT, "not_terminal_approach", "test_tool.r")
+
+
+def spawn_call(x):
+    # terminal_approach/test_tool.py's call_myfunc
+    out = subprocess.run(["Rscript", SPAWN_SCRIPT, str(x)], capture_output=True, text=True, check=True)
+    return out.stdout
+
+def timed(func, x) -> float:
+    start = time.perf_counter()
+    func(x)
+    return (time.perf_counter() - start) * 1000
+
+def run(name: str, func, calls: int, threads: int):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        times = list(executor.map(lambda i: timed(func, 21 + i), range(calls)))
+    elapsed = time.perf_counter() - start
+    times.sort()
+    print(f"{name:<6} median {statistics.median(times):9.2f} ms   p95 {times[int(len(times) * 0.95) - 1]:9.2f} ms   {calls / elapsed:8.1f} calls/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    pool = RWorkerPool([POOL_SCRIPT], size=args.workers)
+    pool.start()
+    print(f"{args.workers} R workers started in {(time.perf_counter() - start) * 1000:.0f} ms")
+    assert pool.call("myfunc", 21) == "42"
+
+    print(f"{args.calls} calls, {args.threads} threads")
+    run("spawn", spawn_call, args.calls, args.threads)
+    run("pool", lambda x: pool.call("myfunc", x), args.calls, args.threads)
+    pool.stop()
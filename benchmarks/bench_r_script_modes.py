@@ -0,0 +1,48 @@
+"""
+Latency of an R-backed tool call in the two RScriptRunner modes of terminal_approach.
+"spawn" starts Rscript per call, "persistent" runs the script in a long-running R worker.
+Both run terminal_approach/test_tool.r with the same argument and must print the same output. Needs R and Rscript on the PATH.
+
+Usage: python benchmarks/bench_r_script_modes.py [--calls 30]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from r_pool import RScriptRunner
+
+SCRIPT = os.path.join(ROOT, "terminal_approach", "test_tool.r")
+
+
+def report(name: str, times: list):
+    times = sorted(times)
+    print(f"{name:<10} median {statistics.median(times):9.2f} ms   p95 {times[int(len(times) * 0.95) - 1]:9.2f} ms   min {times[0]:9.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=30)
+    args = parser.parse_args()
+
+    runners = {"spawn": RScriptRunner(SCRIPT, mode="spawn"), "persistent": RScriptRunner(SCRIPT, mode="persistent")}
+
+    start = time.perf_counter()
+    warm = runners["persistent"](21)
+    print(f"persistent worker started and first call answered in {(time.perf_counter() - start) * 1000:.0f} ms")
+    assert warm == runners["spawn"](21), "the two modes printed different output"
+
+    print(f"{args.calls} sequential calls")
+    for name, runner in runners.items():
+        times = []
+        for i in range(args.calls):
+            start = time.perf_counter()
+            runner(i)
+            times.append((time.perf_counter() - start) * 1000)
+        report(name, times)
+    print(f"persistent fallbacks to spawn: {runners['persistent'].fallbacks}")
+    runners["persistent"].close()
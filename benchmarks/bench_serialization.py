@@ -0,0 +1,122 @@
+"""
+Tool result serialization cost, server encode + client decode, per result.
+- before: {"result": json.dumps(payload)} returned to FastMCP (indented text content plus a structured content copy),
+  decoded by the client with the stdlib in two steps
+- after: serialization.tool_result(payload), one orjson encoded text block, decoded with orjson once
+Payloads: get_employees pages and extract_table pages of the IDEP DBSchemas tables.
+Also prints the memory a cached result takes as a ToolResult and as an EncodedToolResult.
+
+Usage: python benchmarks/bench_serialization.py [--idep config/test_config.idep] [--rows 100 1000] [--calls 200]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp.types import CallToolResult
+from fastmcp.tools.tool import ToolResult, _convert_to_content, default_serializer
+from serialization import tool_result, loads, EncodedToolResult
+from bulk_extract import BulkExtractor
+from idep_registry import load_registry
+
+DEPARTMENTS = ["It", "Hr", "Sales", "Finance", "Operations"]
+OFFICES = ["Istanbul", "Ankara", "Izmir"]
+DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday"]
+
+
+def employees_payload(rows: int) -> dict:
+    employees = [
+        {
+            "name": f"Çalışan {index:05d} Sağbaş",
+            "department": random.choice(DEPARTMENTS),
+            "gender": random.choice(["Male", "Female"]),
+            "office": random.choice(OFFICES),
+            "rank": random.choice(["Junior", "Senior", "Lead"]),
+            **{day: random.random() < 0.5 for day in DAYS},
+        }
+        for index in range(rows)
+    ]
+    return {"count": rows * 3, "employees": employees, "next_offset": rows}
+
+def sample_value(field_type: str, index: int):
+    if field_type == "integer":
+        return index
+    if field_type == "real":
+        return round(random.uniform(0, 1000), 3)
+    if field_type == "datetime":
+        return (datetime(2025, 1, 1) + timedelta(minutes=index)).strftime("%Y-%m-%d %H:%M:%S")
+    return f"Value {index % 97}"
+
+def table_payload(spec: dict, rows: int) -> dict:
+    extractor = BulkExtractor.from_resource_spec(spec)
+    request = extractor.build_request(limit=rows)
+    source_rows = [{column: sample_value(extractor.fields[column], index) for column in request["Columns"]} for index in range(rows)]
+    return extractor.page(source_rows, request)
+
+
+def before_encode(payload) -> bytes:
+    # What FunctionTool.run did with {"result": json.dumps(...)} and what the server then puts on the wire
+    result = {"result": json.dumps(payload)}
+    tool = ToolResult(content=_convert_to_content(result, serializer=default_serializer), structured_content=result)
+    return CallToolResult(content=tool.content, structuredContent=tool.structured_content).model_dump_json(by_alias=True, exclude_none=True).encode()
+
+def before_decode(wire: bytes):
+    message = json.loads(wire)
+    return json.loads(json.loads(message["content"][0]["text"])["result"])
+
+def after_encode(payload) -> bytes:
+    tool = tool_result(payload)
+    return CallToolResult(content=tool.content, structuredContent=tool.structured_content).model_dump_json(by_alias=True, exclude_none=True).encode()
+
+def after_decode(wire: bytes):
+    return loads(loads(wire)["content"][0]["text"])["result"]
+
+def per_call_us(func, arg, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        func(arg)
+    return (time.perf_counter() - start) / calls * 1e6
+
+def retained_bytes(build, count: int = 20) -> int:
+    tracemalloc.start()
+    kept = [build() for _ in range(count)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size // count
+
+def bench(name: str, payload, calls: int):
+    before_wire, after_wire = before_encode(payload), after_encode(payload)
+    assert before_decode(before_wire) == after_decode(after_wire) == json.loads(json.dumps(payload))
+    encode = (per_call_us(before_encode, payload, calls), per_call_us(after_encode, payload, calls))
+    decode = (per_call_us(before_decode, before_wire, calls), per_call_us(after_decode, after_wire, calls))
+    cached = (
+        retained_bytes(lambda: ToolResult(content=_convert_to_content({"result": json.dumps(payload)}, serializer=default_serializer), structured_content={"result": json.dumps(payload)})),
+        retained_bytes(lambda: EncodedToolResult(tool_result(payload))),
+    )
+    print(f"{name:<28} wire {len(before_wire) / 1024:8.1f} -> {len(after_wire) / 1024:7.1f} KiB"
+          f"   encode {encode[0]:8.0f} -> {encode[1]:7.0f} us ({encode[0] / encode[1]:4.1f}x)"
+          f"   decode {decode[0]:7.0f} -> {decode[1]:6.0f} us ({decode[0] / decode[1]:4.1f}x)"
+          f"   cached {cached[0] / 1024:7.1f} -> {cached[1] / 1024:6.1f} KiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--idep", default="config/test_config.idep")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+    random.seed(0)
+
+    registry = load_registry(args.idep)
+    tables = sorted(registry.resources.values(), key=lambda spec: len(spec["idep"].get("Fields", {})), reverse=True)[:2]
+    for rows in args.rows:
+        bench(f"get_employees {rows} rows", employees_payload(rows), args.calls)
+        for spec in tables:
+            bench(f"{spec['name'][:18]} {rows} rows", table_payload(spec, rows), args.calls)
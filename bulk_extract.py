@@ -0,0 +1,208 @@
+import os
+import json
+import base64
+import hashlib
+import importlib.util
+from datetime import datetime
+from idep_validation import parse_idep_datetime, format_idep_datetime
+
+DEFAULT_PAGE_SIZE = int(os.getenv("BULK_PAGE_SIZE", "1000"))
+MAX_PAGE_SIZE = int(os.getenv("BULK_MAX_PAGE_SIZE", "10000"))
+ARROW_MISSING = "Arrow output needs pyarrow, which is not installed on the server, use format json"
+
+# Filter ops the data source evaluates, the request only carries their names
+FILTER_OPS = ("eq", "ne", "lt", "le", "gt", "ge", "in", "not_in", "contains")
+# Arrow types of the IDEP field types, only used when pyarrow is installed
+ARROW_TYPES = {
+    "text": "string",
+    "integer": "int64",
+    "real": "float64",
+    "datetime": "timestamp[s]",
+}
+
+
+class BulkQueryError(ValueError):
+    """
+    The columns, filters, limit or cursor of a bulk extraction are invalid.
+    """
+
+
+def parse_value(value, field_type: str):
+    """
+    Coerces a value to the IDEP field type, datetimes are parsed with the IDEP date format (ISO 8601 is accepted too).
+    """
+    if value is None:
+        return None
+    if field_type == "integer":
+        if isinstance(value, float) and not value.is_integer():
+            raise ValueError(f"{value!r} is not an integer")
+        return int(value)
+    if field_type == "real":
+        return float(value)
+    if field_type == "datetime":
+        return parse_idep_datetime(value)
+    return str(value)
+
+def format_value(value):
+    if isinstance(value, datetime):
+        return format_idep_datetime(value)
+    return value
+
+
+class BulkExtractor:
+    """
+    Bulk, column oriented reads of one IDEP DBSchemas table.
+    - build_request() validates a projection, filters and a cursor and turns them into the request sent to the data source
+    - page() turns the rows the source returned into typed columns plus the cursor of the next page
+    Pages are keyed on the primary keys (keyset paging) when they are all fields of the table, otherwise on the row offset.
+    """
+    def __init__(self, table_name: str, fields: dict, primary_keys: list):
+        self.table_name = table_name
+        self.fields = fields
+        self.order_by = list(primary_keys) if primary_keys and all(key in fields for key in primary_keys) else []
+
+    @classmethod
+    def from_resource_spec(cls, spec: dict) -> "BulkExtractor":
+        """
+        Extractor of a compiled IdepRegistry resource.
+        """
+        return cls(spec["name"], spec["idep"].get("Fields", {}), spec.get("primary_keys", []))
+
+    def _query_digest(self, columns: list, filters: list) -> str:
+        query = json.dumps([self.table_name, columns, filters], sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha1(query.encode("utf-8")).hexdigest()[:16]
+
+    def _parse_filters(self, filters: list) -> list:
+        parsed = []
+        for item in filters or []:
+            if not isinstance(item, dict):
+                raise BulkQueryError(f"A filter must be an object with field, op and value, got {item!r}")
+            field, op, value = item.get("field"), item.get("op", "eq"), item.get("value")
+            if field not in self.fields:
+                raise BulkQueryError(f"Unknown field {field!r} of {self.table_name}")
+            if op not in FILTER_OPS:
+                raise BulkQueryError(f"Unknown filter op {op!r}, use one of {', '.join(FILTER_OPS)}")
+            field_type = self.fields[field]
+            try:
+                if op in ("in", "not_in"):
+                    if not isinstance(value, list):
+                        raise ValueError(f"{op} needs a list of values")
+                    value = [format_value(parse_value(option, field_type)) for option in value]
+                elif op == "contains":
+                    value = str(value)
+                else:
+                    value = format_value(parse_value(value, field_type))
+            except (TypeError, ValueError) as e:
+                raise BulkQueryError(f"Bad value for {field} ({field_type}): {e}")
+            parsed.append({"Field": field, "Op": op, "Value": value})
+        return parsed
+
+    def encode_cursor(self, digest: str, position: dict) -> str:
+        raw = json.dumps({"q": digest, **position}, separators=(",", ":"), default=format_value)
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+    def decode_cursor(self, cursor: str, digest: str) -> dict:
+        try:
+            position = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        except Exception:
+            raise BulkQueryError("Malformed cursor")
+        if not isinstance(position, dict) or position.pop("q", None) != digest:
+            raise BulkQueryError("The cursor belongs to another query, repeat the columns and filters of the first page")
+        return position
+
+    def build_request(self, columns: list = None, filters: list = None, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None, format: str = "json") -> dict:
+        """
+        Validated request for the data source. The source returns at most Limit rows (one more than the page size,
+        so we know whether another page follows) with the Columns of the request.
+        """
+        columns = list(columns) if columns else list(self.fields)
+        unknown = [column for column in columns if column not in self.fields]
+        if unknown:
+            raise BulkQueryError(f"Unknown columns of {self.table_name}: {', '.join(unknown)}")
+        if not isinstance(limit, int) or not 1 <= limit <= MAX_PAGE_SIZE:
+            raise BulkQueryError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+        if format not in ("json", "arrow"):
+            raise BulkQueryError(f"Unknown format {format!r}, use json or arrow")
+        # pyarrow is optional, refuse arrow before the data source is asked for the rows
+        if format == "arrow" and importlib.util.find_spec("pyarrow") is None:
+            raise BulkQueryError(ARROW_MISSING)
+        parsed_filters = self._parse_filters(filters)
+        digest = self._query_digest(columns, parsed_filters)
+
+        request = {
+            "Table": self.table_name,
+            # The order keys are fetched even when they are not projected, the next cursor is made of them
+            "Columns": columns + [key for key in self.order_by if key not in columns],
+            "Filters": parsed_filters,
+            "OrderBy": self.order_by,
+            "Limit": limit + 1,
+            "PageSize": limit,
+            "Projection": columns,
+            "QueryDigest": digest,
+            "Format": format,
+        }
+        position = self.decode_cursor(cursor, digest) if cursor else {}
+        if self.order_by:
+            if "after" in position:
+                request["After"] = position["after"]
+        else:
+            request["Offset"] = position.get("offset", 0)
+        return request
+
+    def page(self, rows: list, request: dict) -> dict:
+        """
+        Rows of the source (dicts, or lists in the order of request["Columns"]) -> one columnar page.
+        """
+        source_columns = request["Columns"]
+        projection = request["Projection"]
+        page_size = request["PageSize"]
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+
+        columns = {column: [] for column in source_columns}
+        for row in rows:
+            if isinstance(row, dict):
+                values = [row.get(column) for column in source_columns]
+            else:
+                values = row
+            for column, value in zip(source_columns, values):
+                try:
+                    columns[column].append(parse_value(value, self.fields[column]))
+                except (TypeError, ValueError):
+                    raise BulkQueryError(f"The data source returned {value!r} for {column} ({self.fields[column]})")
+
+        next_cursor = None
+        if has_more:
+            if self.order_by:
+                position = {"after": [columns[key][-1] for key in self.order_by]}
+            else:
+                position = {"offset": request.get("Offset", 0) + len(rows)}
+            next_cursor = self.encode_cursor(request["QueryDigest"], position)
+
+        result = {
+            "table": self.table_name,
+            "columns": projection,
+            "types": [self.fields[column] for column in projection],
+            "row_count": len(rows),
+            "next_cursor": next_cursor,
+        }
+        if request["Format"] == "arrow":
+            result["arrow_ipc_base64"] = self.to_arrow_ipc(projection, columns)
+        else:
+            result["data"] = {column: [format_value(value) for value in columns[column]] for column in projection}
+        return result
+
+    def to_arrow_ipc(self, projection: list, columns: dict) -> str:
+        """
+        Arrow IPC stream of the projected columns, base64 encoded. Needs pyarrow.
+        """
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise BulkQueryError(ARROW_MISSING)
+        schema = pa.schema([(column, pa.type_for_alias(ARROW_TYPES.get(self.fields[column], "string"))) for column in projection])
+        table = pa.Table.from_arrays([pa.array(columns[column], type=schema.field(column).type) for column in projection], schema=schema)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, schema) as writer:
+            writer.write_table(table)
+        return base64.b64encode(sink.getvalue().to_pybytes()).decode("ascii")
@@ -0,0 +1,94 @@
+import asyncio
+from collections import defaultdict
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+from result_cache import canonical_key, resource_name
+
+
+class SingleFlight:
+    """
+    Runs one execution per key at a time, concurrent callers with the same key share its result (or exception).
+    The execution runs as its own task, so a caller that is cancelled does not cancel it for the others.
+    """
+    def __init__(self):
+        self._flights = {}  # key -> (task, number of callers)
+        self.stats = defaultdict(lambda: {"calls": 0, "executions": 0, "coalesced": 0, "max_waiters": 0})
+
+    async def do(self, key: str, name: str, func):
+        stats = self.stats[name]
+        stats["calls"] += 1
+        flight = self._flights.get(key)
+        if flight is None:
+            stats["executions"] += 1
+            task = asyncio.ensure_future(func())
+            self._flights[key] = [task, 1]
+            stats["max_waiters"] = max(stats["max_waiters"], 1)
+            task.add_done_callback(lambda _: self._flights.pop(key, None))
+        else:
+            stats["coalesced"] += 1
+            flight[1] += 1
+            stats["max_waiters"] = max(stats["max_waiters"], flight[1])
+            task = flight[0]
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+
+class CoalescingMiddleware(Middleware):
+    """
+    Collapses concurrent identical tool calls and IDEP resource reads (same name and canonical arguments / URI)
+    into one execution whose result goes to every caller. Calls that arrive after it finished run again,
+    caching finished results is ResultCacheMiddleware's job, so this goes after it.
+    Two identical calls of a tool with side effects must both happen, so a tool is only coalesced once it opted in,
+    either with the @coalesced decorator / coalesce_tool, or with "coalesce": true in its IDEP function definition.
+    IDEP tables are read-only, their resources are always coalesced.
+    """
+    def __init__(self):
+        self.flight = SingleFlight()
+        self.tool_settings = {}
+        self._idep_tool_settings = {}
+
+    def coalesce_tool(self, name: str, enabled: bool = True):
+        """
+        Opts a read-only tool in (or back out) of coalescing.
+        """
+        self.tool_settings[name] = enabled
+
+    def coalesced(self, func):
+        """
+        Decorator form of coalesce_tool, place it under @mcp.tool.
+        """
+        self.coalesce_tool(func.__name__)
+        return func
+
+    def on_idep_registry(self, registry, diff: dict = None):
+        self._idep_tool_settings = {name: bool(spec["idep"]["coalesce"]) for name, spec in registry.tools.items() if "coalesce" in spec["idep"]}
+
+    def is_coalesced(self, name: str) -> bool:
+        if name in self.tool_settings:
+            return self.tool_settings[name]
+        return self._idep_tool_settings.get(name, False)
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        name = context.message.name
+        if not self.is_coalesced(name):
+            return await call_next(context)
+        key = f"tool:{canonical_key(name, context.message.arguments)}"
+        return await self.flight.do(key, name, lambda: call_next(context))
+
+    async def on_read_resource(self, context: MiddlewareContext, call_next):
+        uri = str(context.message.uri)
+        if not uri.startswith("resource://"):
+            return await call_next(context)
+        key = f"resource:{uri}"
+        return await self.flight.do(key, resource_name(uri), lambda: call_next(context))
+
+    def stats(self) -> dict:
+        """
+        Per tool / resource: calls, upstream executions, calls that joined an execution in flight and the most callers of one execution.
+        """
+        totals = {"calls": 0, "executions": 0, "coalesced": 0}
+        for stats in self.flight.stats.values():
+            for field in totals:
+                totals[field] += stats[field]
+        return {"in_flight": self.flight.in_flight(), **totals, "by_name": dict(self.flight.stats)}
@@ -0,0 +1,393 @@
+import os
+import json
+import time
+import random
+import sqlite3
+import asyncio
+import threading
+from langchain_core.messages import SystemMessage, HumanMessage, ToolMessage, RemoveMessage
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    WRITES_IDX_MAP,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+DEFAULT_CHECKPOINT_DB = os.getenv("CHECKPOINT_DB", os.path.join("checkpoints", "agent.sqlite"))
+DEFAULT_SESSION_TTL = float(os.getenv("SESSION_TTL", str(7 * 24 * 3600)))
+DEFAULT_MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "1000"))
+DEFAULT_HISTORY_TOKENS = int(os.getenv("HISTORY_TOKEN_BUDGET", "6000"))
+DEFAULT_TOOL_OUTPUT_CHARS = int(os.getenv("TOOL_OUTPUT_CHAR_BUDGET", "2000"))
+COMPACTION_NOTE_ID = "history-compaction-note"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    thread_id TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at);
+"""
+
+
+class SqliteCheckpointSaver(BaseCheckpointSaver[str]):
+    """
+    LangGraph checkpointer backed by a local SQLite file, a drop-in replacement for MemorySaver that survives restarts.
+    - Only the keep_checkpoints latest checkpoints of a thread are kept, with the channel values they reference
+    - Sessions (threads) idle for longer than session_ttl seconds are deleted
+    - Past max_sessions threads, the least recently used ones are deleted
+    """
+    def __init__(self, path: str = DEFAULT_CHECKPOINT_DB, session_ttl: float = DEFAULT_SESSION_TTL, max_sessions: int = DEFAULT_MAX_SESSIONS,
+                 keep_checkpoints: int = 2, evict_interval: float = 60.0, serde=None):
+        super().__init__(serde=serde)
+        self.path = path
+        self.session_ttl = session_ttl
+        self.max_sessions = max_sessions
+        self.keep_checkpoints = keep_checkpoints
+        self.evict_interval = evict_interval
+        self.evicted = 0
+        self._last_eviction = 0.0
+        self._lock = threading.Lock()
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    # --- Reads ---
+
+    def _load_blobs(self, thread_id: str, checkpoint_ns: str, versions: dict) -> dict:
+        channel_values = {}
+        for channel, version in versions.items():
+            row = self.conn.execute(
+                "SELECT type, value FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version))
+            ).fetchone()
+            if row is not None and row[0] != "empty":
+                channel_values[channel] = self.serde.loads_typed((row[0], row[1]))
+        return channel_values
+
+    def _to_tuple(self, thread_id: str, checkpoint_ns: str, row) -> CheckpointTuple:
+        checkpoint_id, parent_checkpoint_id, type_, checkpoint, metadata_type, metadata = row
+        checkpoint = self.serde.loads_typed((type_, checkpoint))
+        writes = self.conn.execute(
+            "SELECT task_id, channel, type, value FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id)
+        ).fetchall()
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}},
+            checkpoint={**checkpoint, "channel_values": self._load_blobs(thread_id, checkpoint_ns, checkpoint["channel_versions"])},
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_checkpoint_id}}
+                if parent_checkpoint_id else None
+            ),
+            pending_writes=[(task_id, channel, self.serde.loads_typed((type_, value))) for task_id, channel, type_, value in writes],
+        )
+
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata"
+        with self._lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self.conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id)
+                ).fetchone()
+            else:
+                row = self.conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns)
+                ).fetchone()
+            if row is None:
+                return None
+            return self._to_tuple(thread_id, checkpoint_ns, row)
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        query = "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata FROM checkpoints"
+        conditions, params = [], []
+        if config:
+            conditions.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                conditions.append("checkpoint_ns = ?")
+                params.append(config["configurable"]["checkpoint_ns"])
+            if checkpoint_id := get_checkpoint_id(config):
+                conditions.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_checkpoint_id := get_checkpoint_id(before)):
+            conditions.append("checkpoint_id < ?")
+            params.append(before_checkpoint_id)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._lock:
+            rows = self.conn.execute(query, params).fetchall()
+            tuples = []
+            for row in rows:
+                if limit is not None and len(tuples) >= limit:
+                    break
+                checkpoint_tuple = self._to_tuple(row[0], row[1], row[2:])
+                if filter and not all(checkpoint_tuple.metadata.get(key) == value for key, value in filter.items()):
+                    continue
+                tuples.append(checkpoint_tuple)
+        yield from tuples
+
+    # --- Writes ---
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        checkpoint = checkpoint.copy()
+        values = checkpoint.pop("channel_values")
+        blobs = []
+        for channel, version in new_versions.items():
+            type_, value = self.serde.dumps_typed(values[channel]) if channel in values else ("empty", b"")
+            blobs.append((thread_id, checkpoint_ns, channel, str(version), type_, value))
+        type_, serialized = self.serde.dumps_typed(checkpoint)
+        metadata_type, serialized_metadata = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.executemany("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)", blobs)
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                     type_, serialized, metadata_type, serialized_metadata)
+                )
+                self.conn.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?)", (thread_id, time.time()))
+                self._prune_thread(thread_id, checkpoint_ns)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        self._maybe_evict()
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def _prune_thread(self, thread_id: str, checkpoint_ns: str):
+        """
+        Drops the checkpoints of a thread past the keep_checkpoints latest, with their writes and unreferenced blobs.
+        """
+        rows = self.conn.execute(
+            "SELECT checkpoint_id, type, checkpoint FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC",
+            (thread_id, checkpoint_ns)
+        ).fetchall()
+        if len(rows) <= self.keep_checkpoints:
+            return
+        stale_ids = [(thread_id, checkpoint_ns, row[0]) for row in rows[self.keep_checkpoints:]]
+        self.conn.executemany("DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", stale_ids)
+        self.conn.executemany("DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", stale_ids)
+
+        referenced = set()
+        for _, type_, checkpoint in rows[:self.keep_checkpoints]:
+            for channel, version in self.serde.loads_typed((type_, checkpoint))["channel_versions"].items():
+                referenced.add((channel, str(version)))
+        blob_keys = self.conn.execute(
+            "SELECT channel, version FROM blobs WHERE thread_id = ? AND checkpoint_ns = ?", (thread_id, checkpoint_ns)
+        ).fetchall()
+        stale_blobs = [(thread_id, checkpoint_ns, channel, version) for channel, version in blob_keys if (channel, version) not in referenced]
+        self.conn.executemany("DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?", stale_blobs)
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        # Like MemorySaver: regular writes are stored once, special channels (negative idx) are overwritten
+        replaced, inserted = [], []
+        for idx, (channel, value) in enumerate(writes):
+            type_, serialized = self.serde.dumps_typed(value)
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            row = (thread_id, checkpoint_ns, checkpoint_id, task_id, write_idx, channel, type_, serialized, task_path)
+            (replaced if write_idx < 0 else inserted).append(row)
+        with self._lock:
+            self.conn.executemany("INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", replaced)
+            self.conn.executemany("INSERT OR IGNORE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", inserted)
+
+    def delete_thread(self, thread_id: str):
+        with self._lock:
+            self._delete_threads([thread_id])
+
+    def _delete_threads(self, thread_ids: list):
+        params = [(thread_id,) for thread_id in thread_ids]
+        self.conn.execute("BEGIN")
+        for table in ("checkpoints", "blobs", "writes", "sessions"):
+            self.conn.executemany(f"DELETE FROM {table} WHERE thread_id = ?", params)
+        self.conn.execute("COMMIT")
+
+    # --- Eviction ---
+
+    def _maybe_evict(self):
+        now = time.time()
+        if now - self._last_eviction < self.evict_interval:
+            return
+        self._last_eviction = now
+        self.evict(now)
+
+    def evict(self, now: float = None) -> int:
+        """
+        Deletes the expired and the least recently used sessions past max_sessions, returns how many were deleted.
+        """
+        now = now or time.time()
+        with self._lock:
+            expired = [row[0] for row in self.conn.execute(
+                "SELECT thread_id FROM sessions WHERE updated_at < ?", (now - self.session_ttl,)
+            )]
+            overflow = [row[0] for row in self.conn.execute(
+                "SELECT thread_id FROM sessions WHERE updated_at >= ? ORDER BY updated_at DESC LIMIT -1 OFFSET ?",
+                (now - self.session_ttl, self.max_sessions)
+            )]
+            thread_ids = expired + overflow
+            if thread_ids:
+                self._delete_threads(thread_ids)
+                self.evicted += len(thread_ids)
+        return len(thread_ids)
+
+    def stats(self) -> dict:
+        with self._lock:
+            sessions = self.conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+            checkpoints = self.conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0]
+        return {"sessions": sessions, "checkpoints": checkpoints, "evicted": self.evicted}
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    # --- Async API, SQLite calls run in a worker thread to keep the event loop free ---
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        tuples = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for checkpoint_tuple in tuples:
+            yield checkpoint_tuple
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str):
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def get_next_version(self, current, channel):
+        # Same version format as MemorySaver, sortable as strings
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+
+# --- History compaction ---
+
+def _content_text(content) -> str:
+    if isinstance(content, str):
+        return content
+    return json.dumps(content, default=str)
+
+def estimate_tokens(message) -> int:
+    """
+    Rough token count (4 characters per token), good enough to keep a budget without a tokenizer.
+    """
+    if isinstance(message, dict):
+        size = len(_content_text(message.get("content", "")))
+    else:
+        size = len(_content_text(message.content))
+        for tool_call in getattr(message, "tool_calls", None) or []:
+            size += len(json.dumps(tool_call.get("args", {}), default=str))
+    return size // 4 + 4
+
+def compact_messages(messages: list, max_tokens: int = DEFAULT_HISTORY_TOKENS, max_tool_chars: int = DEFAULT_TOOL_OUTPUT_CHARS, summarize=None) -> list:
+    """
+    Keeps a conversation under max_tokens:
+    1. Tool outputs of earlier turns longer than max_tool_chars are cut
+    2. While over budget, the oldest turns are dropped, a turn starts at a human message so tool calls stay with their results
+    Dropped turns are replaced by one note, summarize(dropped_messages) -> str can provide its text (e.g. an LLM summary).
+    The latest turn is never cut. Messages keep their ids, so the result can replace the stored history.
+    """
+    turn_starts = [i for i, message in enumerate(messages) if isinstance(message, HumanMessage)]
+    last_turn = turn_starts[-1] if turn_starts else 0
+
+    compacted = []
+    for i, message in enumerate(messages):
+        if i < last_turn and isinstance(message, ToolMessage) and isinstance(message.content, str) and len(message.content) > max_tool_chars:
+            message = message.model_copy(update={
+                "content": message.content[:max_tool_chars] + f"... [{len(message.content) - max_tool_chars} characters cut]"
+            })
+        compacted.append(message)
+
+    previous_note = None
+    if compacted and getattr(compacted[0], "id", None) == COMPACTION_NOTE_ID:
+        previous_note = compacted.pop(0)
+        turn_starts = [i - 1 for i in turn_starts]
+        last_turn = max(last_turn - 1, 0)
+
+    total = sum(estimate_tokens(message) for message in compacted)
+    cut = 0
+    for start in turn_starts[1:]:
+        if total <= max_tokens or start > last_turn:
+            break
+        total -= sum(estimate_tokens(message) for message in compacted[cut:start])
+        cut = start
+    if cut == 0:
+        return ([previous_note] if previous_note else []) + compacted
+
+    dropped = ([previous_note] if previous_note else []) + compacted[:cut]
+    if summarize is not None:
+        note = f"Summary of the earlier conversation: {summarize(dropped)}"
+    else:
+        note = "Earlier messages of this conversation were removed to keep it short."
+    return [SystemMessage(content=note, id=COMPACTION_NOTE_ID)] + compacted[cut:]
+
+def compaction_hook(max_tokens: int = DEFAULT_HISTORY_TOKENS, max_tool_chars: int = DEFAULT_TOOL_OUTPUT_CHARS, summarize=None):
+    """
+    pre_model_hook for create_react_agent that compacts the stored history before every LLM call.
+    """
+    def hook(state):
+        messages = state["messages"]
+        compacted = compact_messages(messages, max_tokens, max_tool_chars, summarize)
+        if len(compacted) == len(messages) and all(a is b for a, b in zip(compacted, messages)):
+            return {"llm_input_messages": messages}
+        return {"messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES), *compacted]}
+    return hook
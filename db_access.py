@@ -0,0 +1,150 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+import httpx
+from dotenv import load_dotenv
+from postgrest import AsyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """
+    Per-operation latency counters.
+    setup_ms is the time spent getting a client (non-zero only when a client has to be built),
+    query_ms is the time spent executing the query over the pooled connection.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, name: str, setup_ms: float, query_ms: float, new_client: bool = False, error: bool = False):
+        with self._lock:
+            stat = self._stats.setdefault(name, {
+                "calls": 0,
+                "errors": 0,
+                "client_setups": 0,
+                "setup_ms_total": 0.0,
+                "query_ms_total": 0.0,
+                "query_ms_max": 0.0,
+            })
+            stat["calls"] += 1
+            if error:
+                stat["errors"] += 1
+            if new_client:
+                stat["client_setups"] += 1
+            stat["setup_ms_total"] += setup_ms
+            stat["query_ms_total"] += query_ms
+            stat["query_ms_max"] = max(stat["query_ms_max"], query_ms)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            result = {}
+            for name, stat in self._stats.items():
+                result[name] = dict(stat)
+                result[name]["query_ms_avg"] = stat["query_ms_total"] / stat["calls"] if stat["calls"] else 0.0
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+class SupabaseDataAccess:
+    """
+    Process-wide access to the Supabase REST API.
+    Builds one async PostgREST client lazily and reuses it (and its keep-alive connection pool)
+    for every query instead of creating a new client per tool call.
+    """
+    def __init__(self, url: str = None, key: str = None, max_connections: int = 20, max_keepalive_connections: int = 10, keepalive_expiry: float = 30.0, timeout: float = 10.0):
+        self.url = url
+        self.key = key
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = timeout
+        self.stats = QueryStats()
+        self._async_client = None
+        self._async_loop = None
+
+    def _rest_url_and_headers(self):
+        url = self.url or os.getenv("SUPABASE_URL")
+        key = self.key or os.getenv("SUPABASE_ANON_KEY")
+        if not url or not key:
+            raise Exception("Missing SUPABASE_URL or SUPABASE_ANON_KEY in environment variables.")
+        headers = {
+            **DEFAULT_POSTGREST_CLIENT_HEADERS,
+            "apiKey": key,
+            "Authorization": f"Bearer {key}",
+        }
+        return f"{url.rstrip('/')}/rest/v1", headers
+
+    async def get_async_client(self) -> AsyncPostgrestClient:
+        # httpx.AsyncClient is bound to the event loop it was first used on
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            await self._close_async_client()
+            rest_url, headers = self._rest_url_and_headers()
+            http_client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits, http2=True, follow_redirects=True)
+            self._async_client = AsyncPostgrestClient(rest_url, headers=headers, http_client=http_client)
+            self._async_loop = loop
+        return self._async_client
+
+    async def _close_async_client(self):
+        """
+        Closes the current client and its connection pool, on the loop it belongs to when that loop still runs elsewhere.
+        """
+        client, loop = self._async_client, self._async_loop
+        self._async_client = None
+        self._async_loop = None
+        if client is None:
+            return
+        try:
+            if loop is not None and loop is not asyncio.get_running_loop() and loop.is_running():
+                asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+            else:
+                await client.aclose()
+        except Exception as e:
+            # The loop of the old client is gone, its connections went with it
+            logger.warning("Could not close the previous Supabase client: %s", e)
+
+    async def aexecute(self, name: str, build_query):
+        """
+        Runs build_query(client).execute() on the shared async client and records its latency.
+        """
+        start = time.perf_counter()
+        new_client = self._async_client is None or self._async_loop is not asyncio.get_running_loop()
+        client = await self.get_async_client()
+        setup_done = time.perf_counter()
+        try:
+            response = await build_query(client).execute()
+        except Exception:
+            self.stats.record(name, (setup_done - start) * 1000, (time.perf_counter() - setup_done) * 1000, new_client, error=True)
+            raise
+        self.stats.record(name, (setup_done - start) * 1000, (time.perf_counter() - setup_done) * 1000, new_client)
+        return response
+
+    async def aclose(self):
+        await self._close_async_client()
+
+
+_data_access = None
+_data_access_lock = threading.Lock()
+
+def get_data_access() -> SupabaseDataAccess:
+    """
+    Returns the process-wide SupabaseDataAccess instance.
+    """
+    global _data_access
+    if _data_access is None:
+        with _data_access_lock:
+            if _data_access is None:
+                _data_access = SupabaseDataAccess()
+    return _data_access
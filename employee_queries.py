@@ -0,0 +1,127 @@
+import os
+import asyncio
+from collections import Counter
+from postgrest import APIError
+from db_access import get_data_access
+
+EMPLOYEE_TABLE = "employees"
+DAY_COLUMNS = ("monday", "tuesday", "wednesday", "thursday", "friday")
+GROUP_COLUMNS = ("department", "gender", "office", "rank")
+EMPLOYEE_COLUMNS = ("name",) + GROUP_COLUMNS + DAY_COLUMNS
+MAX_PAGE_SIZE = 1000
+# Rows per request when counting groups without PostgREST aggregates
+SCAN_PAGE_SIZE = int(os.getenv("EMPLOYEE_SCAN_PAGE_SIZE", "1000"))
+# PostgREST error code when aggregate functions are disabled (the Supabase default)
+AGGREGATES_DISABLED = "PGRST123"
+
+# None until the first aggregate query tells us, SUPABASE_AGGREGATES=off skips them altogether
+_aggregates_enabled = False if os.getenv("SUPABASE_AGGREGATES", "auto") == "off" else None
+
+
+def employee_filters(full_name: str = "", department: str = "", gender: str = "", office: str = "", rank: str = "", office_days: list = ()) -> list:
+    """
+    The get_employees filters as (column, value) equality pairs, normalized the way the table stores them.
+    """
+    filters = []
+    if full_name:
+        filters.append(("name", full_name.title().strip()))
+    if department:
+        filters.append(("department", department.capitalize()))
+    if gender:
+        filters.append(("gender", gender.capitalize()))
+    if office:
+        filters.append(("office", office.capitalize()))
+    if rank:
+        filters.append(("rank", rank.capitalize()))
+    for day in office_days or []:
+        day = day.strip().lower()
+        if day not in DAY_COLUMNS:
+            raise ValueError(f"Unknown office day {day}, use one of {', '.join(DAY_COLUMNS)}")
+        filters.append((day, True))
+    return filters
+
+def check_columns(columns: list, allowed: tuple = EMPLOYEE_COLUMNS) -> list:
+    columns = [column.strip().lower() for column in columns]
+    unknown = [column for column in columns if column not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown employee columns: {', '.join(unknown)}, use {', '.join(allowed)}")
+    return columns
+
+def _filtered(query, filters: list):
+    for column, value in filters:
+        query = query.eq(column, value)
+    return query
+
+
+async def count_employees(filters: list) -> int:
+    """
+    Number of matching employees from a HEAD request, no rows are transferred.
+    """
+    response = await get_data_access().aexecute(
+        "get_employees.count",
+        lambda client: _filtered(client.table(EMPLOYEE_TABLE).select("name", count="exact", head=True), filters),
+    )
+    return response.count or 0
+
+async def _scan_group_counts(column: str, filters: list) -> dict:
+    # Only the group column is read, page by page, and folded into the counter as the pages arrive
+    counts = Counter()
+    start = 0
+    while True:
+        response = await get_data_access().aexecute(
+            "get_employees.scan",
+            lambda client: _filtered(client.table(EMPLOYEE_TABLE).select(column), filters).order(column).order("name").range(start, start + SCAN_PAGE_SIZE - 1),
+        )
+        counts.update(row[column] for row in response.data)
+        if len(response.data) < SCAN_PAGE_SIZE:
+            return dict(counts)
+        start += SCAN_PAGE_SIZE
+
+async def group_counts(column: str, filters: list) -> dict:
+    """
+    {value of column: number of matching employees}.
+    Counted by Postgres with a PostgREST aggregate (select=column,count()) when the project allows aggregates,
+    otherwise by scanning only that column in pages.
+    """
+    global _aggregates_enabled
+    if _aggregates_enabled is not False:
+        try:
+            response = await get_data_access().aexecute(
+                "get_employees.group_count",
+                lambda client: _filtered(client.table(EMPLOYEE_TABLE).select(f"{column},count()"), filters),
+            )
+            _aggregates_enabled = True
+            return {row[column]: row["count"] for row in response.data}
+        except APIError as e:
+            if e.code != AGGREGATES_DISABLED:
+                raise
+            _aggregates_enabled = False
+    return await _scan_group_counts(column, filters)
+
+async def office_day_counts(filters: list, group_by: str = "") -> dict:
+    """
+    {day: number of matching employees in the office that day}, or {day: {group: count}} with group_by.
+    One count request per day, all in flight at once.
+    """
+    if group_by:
+        counts = await asyncio.gather(*(group_counts(group_by, filters + [(day, True)]) for day in DAY_COLUMNS))
+    else:
+        counts = await asyncio.gather(*(count_employees(filters + [(day, True)]) for day in DAY_COLUMNS))
+    return dict(zip(DAY_COLUMNS, counts))
+
+async def employee_page(columns: list, filters: list, limit: int, offset: int) -> dict:
+    """
+    One page of matching employees (only the requested columns), ordered by name, with the total count
+    and the offset of the next page (None on the last page).
+    """
+    response = await get_data_access().aexecute(
+        "get_employees",
+        lambda client: _filtered(client.table(EMPLOYEE_TABLE).select(*columns, count="exact"), filters).order("name").range(offset, offset + limit - 1),
+    )
+    total = response.count or 0
+    next_offset = offset + len(response.data)
+    return {
+        "count": total,
+        "employees": response.data,
+        "next_offset": next_offset if response.data and next_offset < total else None,
+    }
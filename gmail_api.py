@@ -0,0 +1,157 @@
+import asyncio
+import base64
+import random
+import logging
+import httpx
+from typing_extensions import TypedDict, NotRequired
+from google_oauth import get_token_manager
+
+GMAIL_API_URL = "https://gmail.googleapis.com/gmail/v1/users/me"
+# Status codes Gmail uses for quota / transient errors
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+logger = logging.getLogger(__name__)
+
+
+class MailMessage(TypedDict):
+    to: str
+    subject: str
+    body: str
+    cc: NotRequired[str]
+    bcc: NotRequired[str]
+
+
+def build_raw_message(to: str, subject: str, body: str, cc: str = "", bcc: str = "") -> str:
+    """
+    Builds the RFC 2822 message and returns it base64url encoded, as the Gmail API expects in "raw".
+    """
+    lines = [
+        f"To: {to}",
+        f"Cc: {cc}" if cc else "",
+        f"Bcc: {bcc}" if bcc else "",
+        f"Subject: {subject}",
+        "",
+        body
+    ]
+    # Filter out empty lines
+    filtered_lines = list(filter(bool, lines))
+    joined_lines = "\r\n".join(filtered_lines)
+
+    # Encode Base64
+    raw_bytes = joined_lines.encode("utf-8")
+    return base64.urlsafe_b64encode(raw_bytes).decode("utf-8").rstrip("=")
+
+_http_client = None
+_http_loop = None
+
+async def get_async_http_client() -> httpx.AsyncClient:
+    """
+    Returns the shared keep-alive client for Gmail API calls on the running event loop.
+    The client of a previous loop is closed first, so its connection pool is not leaked.
+    """
+    global _http_client, _http_loop
+    loop = asyncio.get_running_loop()
+    if _http_client is None or _http_loop is not loop:
+        await aclose_http_client()
+        _http_client = httpx.AsyncClient(
+            timeout=30.0,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)
+        )
+        _http_loop = loop
+    return _http_client
+
+async def aclose_http_client():
+    """
+    Closes the shared client, on the loop it belongs to when that loop still runs elsewhere. Called on shutdown too.
+    """
+    global _http_client, _http_loop
+    client, loop = _http_client, _http_loop
+    _http_client = None
+    _http_loop = None
+    if client is None:
+        return
+    try:
+        if loop is not None and loop is not asyncio.get_running_loop() and loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+        else:
+            await client.aclose()
+    except Exception as e:
+        # The loop of the old client is gone, its connections went with it
+        logger.warning("Could not close the previous Gmail HTTP client: %s", e)
+
+async def gmail_post(path: str, payload: dict) -> httpx.Response:
+    """
+    POSTs payload to the Gmail API (e.g. path="messages/send") with the cached access token.
+    """
+    token_manager = get_token_manager()
+    access_token = await token_manager.aget_access_token()
+    http_client = await get_async_http_client()
+    res = await http_client.post(
+        url = f"{GMAIL_API_URL}/{path}",
+        headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json"
+        },
+        json = payload
+    )
+    if res.status_code == 401:
+        token_manager.invalidate()
+    return res
+
+def _is_quota_error(res: httpx.Response) -> bool:
+    if res.status_code in RETRYABLE_STATUS_CODES:
+        return True
+    # Gmail reports per-user rate limits as 403 with a rateLimitExceeded reason
+    return res.status_code == 403 and ("rateLimitExceeded" in res.text or "userRateLimitExceeded" in res.text)
+
+async def gmail_post_with_backoff(path: str, payload: dict, max_retries: int = 4, base_delay: float = 1.0) -> httpx.Response:
+    """
+    gmail_post, retried with exponential backoff (or the Retry-After header) on quota and transient errors.
+    A 401 is retried once with a fresh token, a second 401 means the credentials are bad and is returned.
+    """
+    retried_unauthorized = False
+    for attempt in range(max_retries + 1):
+        res = await gmail_post(path, payload)
+        if attempt == max_retries:
+            return res
+        if res.status_code == 401:
+            if retried_unauthorized:
+                return res
+            # The stale token was dropped by gmail_post, retry right away with a fresh one
+            retried_unauthorized = True
+            continue
+        if not _is_quota_error(res):
+            return res
+        retry_after = res.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            delay = float(retry_after)
+        else:
+            delay = base_delay * (2 ** attempt) + random.uniform(0, base_delay)
+        await asyncio.sleep(delay)
+    return res
+
+async def post_batch(path: str, messages: list, build_payload, max_concurrency: int = 5) -> list:
+    """
+    Posts one request per message with at most max_concurrency requests in flight.
+    All requests share the cached token and the pooled connection.
+    Returns (message, response or exception) pairs in the order of messages.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    # Fetch the token once up front, so the batch does not race on the first refresh
+    await get_token_manager().aget_access_token()
+
+    async def post_one(message):
+        async with semaphore:
+            try:
+                raw_b64 = build_raw_message(
+                    message["to"],
+                    message["subject"],
+                    message["body"],
+                    message.get("cc", ""),
+                    message.get("bcc", "")
+                )
+                return message, await gmail_post_with_backoff(path, build_payload(raw_b64))
+            except Exception as e:
+                return message, e
+
+    return await asyncio.gather(*(post_one(message) for message in messages))
@@ -0,0 +1,147 @@
+import os
+import time
+import asyncio
+import threading
+import traceback
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
+
+
+class TokenManager:
+    """
+    Caches an OAuth access token obtained from a refresh token.
+    - The token is reused until it expires.
+    - Once it is within refresh_margin seconds of expiry, it is refreshed in a background thread
+      while callers keep using the still valid token.
+    - Concurrent refreshes are single-flighted, a burst of callers triggers exactly one token request.
+    token_url can point to a local stand-in endpoint for testing.
+    """
+    def __init__(self, token_url: str = GOOGLE_TOKEN_URL, client_id: str = None, client_secret: str = None, refresh_token: str = None, refresh_margin: float = 300.0, session: requests.Session = None):
+        self.token_url = token_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_token = refresh_token
+        self.refresh_margin = refresh_margin
+        self.session = session or requests.Session()
+        self.refresh_count = 0
+        self._lock = threading.Lock()
+        self._refresh_done = threading.Condition(self._lock)
+        self._refreshing = False
+        self._generation = 0
+        self._last_error = None
+        self._access_token = None
+        self._expires_at = 0.0
+
+    def _request_token(self):
+        token_res = self.session.post(
+            url = self.token_url,
+            data = {
+                "client_id": self.client_id or os.getenv("CLIENT_ID"),
+                "client_secret": self.client_secret or os.getenv("CLIENT_SECRET"),
+                "grant_type": "refresh_token",
+                "refresh_token": self.refresh_token or os.getenv("REFRESH_TOKEN")
+            },
+            headers = {
+                "Content-Type": "application/x-www-form-urlencoded"
+            }
+        )
+        if not token_res.ok:
+            raise Exception("Failed to refresh token")
+
+        token_json = token_res.json()
+        access_token = token_json.get("access_token")
+        if not access_token:
+            raise Exception("Failed to get access token")
+        return access_token, float(token_json.get("expires_in", 3600))
+
+    def _refresh(self):
+        """
+        Performs one token request. Must be called by the thread that set self._refreshing.
+        """
+        try:
+            access_token, expires_in = self._request_token()
+        except Exception as e:
+            with self._lock:
+                self._refreshing = False
+                self._generation += 1
+                self._last_error = e
+                self._refresh_done.notify_all()
+            raise
+        with self._lock:
+            self._access_token = access_token
+            self._expires_at = time.monotonic() + expires_in
+            self.refresh_count += 1
+            self._refreshing = False
+            self._generation += 1
+            self._last_error = None
+            self._refresh_done.notify_all()
+        return access_token
+
+    def _background_refresh(self):
+        try:
+            self._refresh()
+        except Exception:
+            # The current token is still valid, the next caller will retry
+            traceback.print_exc()
+
+    def get_access_token(self) -> str:
+        with self._lock:
+            now = time.monotonic()
+            if self._access_token and now < self._expires_at - self.refresh_margin:
+                return self._access_token
+
+            if self._access_token and now < self._expires_at:
+                # Close to expiry, refresh ahead of time without blocking the caller
+                if not self._refreshing:
+                    self._refreshing = True
+                    threading.Thread(target=self._background_refresh, daemon=True).start()
+                return self._access_token
+
+            # Expired or missing, wait for an in-flight refresh if there is one
+            if self._refreshing:
+                generation = self._generation
+                while self._refreshing and self._generation == generation:
+                    self._refresh_done.wait()
+                if self._access_token and time.monotonic() < self._expires_at:
+                    return self._access_token
+                if self._last_error is not None:
+                    raise self._last_error
+            self._refreshing = True
+        return self._refresh()
+
+    async def aget_access_token(self) -> str:
+        """
+        Async version of get_access_token. The cached token is returned inline,
+        a blocking refresh is run in a worker thread so the event loop is not stalled.
+        """
+        with self._lock:
+            if self._access_token and time.monotonic() < self._expires_at - self.refresh_margin:
+                return self._access_token
+        return await asyncio.to_thread(self.get_access_token)
+
+    def invalidate(self):
+        """
+        Drops the cached token, e.g. after the API rejected it with a 401.
+        """
+        with self._lock:
+            self._access_token = None
+            self._expires_at = 0.0
+
+
+_token_manager = None
+_token_manager_lock = threading.Lock()
+
+def get_token_manager() -> TokenManager:
+    """
+    Returns the process-wide TokenManager used by the Gmail tools.
+    """
+    global _token_manager
+    if _token_manager is None:
+        with _token_manager_lock:
+            if _token_manager is None:
+                _token_manager = TokenManager()
+    return _token_manager
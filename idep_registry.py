@@ -0,0 +1,382 @@
+import os
+import re
+import json
+import inspect
+import keyword
+import hashlib
+import logging
+import threading
+from datetime import datetime
+import fastmcp
+from fastmcp.tools.tool import FunctionTool, ToolResult
+from mcp.types import TextContent
+from fastmcp.resources.template import FunctionResourceTemplate
+from idep_validation import compile_validator
+from serialization import dumps, loads
+
+# Bump when the layout of the compiled registry changes, old cache files are then ignored
+COMPILER_VERSION = 3
+DEFAULT_CACHE_DIR = os.path.join("config", ".idep_cache")
+LEGACY_CACHE_FILE = re.compile(r"[0-9a-f]{64}\.json")
+
+logger = logging.getLogger(__name__)
+
+PYTHON_TYPES = {
+    "str": str,
+    "int": int,
+    "bool": bool,
+    "list": list,
+    "dict": dict,
+    "float": float,
+    "datetime": datetime,
+}
+
+
+def param_to_python_type(param_type: str) -> str:
+    if param_type == "string" or param_type == "text":
+        return "str"
+    elif param_type == "integer":
+        return "int"
+    elif param_type == "boolean":
+        return "bool"
+    elif param_type == "list" or param_type == "array":
+        return "list"
+    elif param_type == "dictionary":
+        return "dict"
+    elif param_type == "float" or param_type == "real":
+        return "float"
+    else:
+        return param_type
+
+def extract_llm_tools(idep: dict) -> dict:
+    """
+    Returns {"Functions": {...}, "DBSchemas": [...]} from either IDEP layout:
+    - top level "LLMTools" with "Functions" and "DBSchemas" (test_config.idep)
+    - "Services" where the LLM service's LLMServiceOptions.LLMTools is a list of table schemas (config.idep)
+    """
+    llm_tools = idep.get("LLMTools")
+    if llm_tools is None:
+        for service in idep.get("Services", []):
+            if "LLMServiceOptions" in service:
+                llm_tools = service["LLMServiceOptions"].get("LLMTools")
+                break
+    if isinstance(llm_tools, list):
+        return {"Functions": {}, "DBSchemas": llm_tools}
+    llm_tools = llm_tools or {}
+    return {"Functions": llm_tools.get("Functions", {}), "DBSchemas": llm_tools.get("DBSchemas", [])}
+
+def safe_identifier(name: str) -> str:
+    """
+    IDEP field names may contain spaces etc. (e.g. "Group Type"), map them to a valid Python identifier.
+    """
+    safe_name = re.sub(r"\W", "_", name)
+    if not safe_name or safe_name[0].isdigit() or keyword.iskeyword(safe_name):
+        safe_name = f"_{safe_name}"
+    return safe_name
+
+def safe_identifiers(names) -> dict:
+    """
+    Original name -> safe identifier, unique among names. Names that are already valid identifiers keep them,
+    the others get a numeric suffix when they collide, e.g. "Group_Type" and "Group Type" -> "Group_Type_2".
+    """
+    names = list(dict.fromkeys(names))
+    identifiers = {name: name for name in names if safe_identifier(name) == name}
+    taken = set(identifiers.values())
+    for name in names:
+        if name in identifiers:
+            continue
+        safe_name = candidate = safe_identifier(name)
+        suffix = 2
+        while candidate in taken:
+            candidate = f"{safe_name}_{suffix}"
+            suffix += 1
+        identifiers[name] = candidate
+        taken.add(candidate)
+    return {name: identifiers[name] for name in names}
+
+def make_function(name: str, description: str, params: list, call, validated: bool = False, schema_checked: bool = False):
+    """
+    Builds `async def name(<params>)` without exec.
+    params is a list of (param_name, idep_type) pairs, the call is awaited as call(name, kwargs)
+    with kwargs keyed by the original IDEP names.
+    With validated=True the arguments are checked and coerced by a validator compiled from params
+    (idep_validation.compile_validator) and the signature is left unannotated, so pydantic has nothing left to validate.
+    schema_checked is passed on to the validator, for tools whose arguments the MCP server checks against the input schema.
+    """
+    safe_names = safe_identifiers(param_name for param_name, _ in params)
+    original_names = {safe_name: param_name for param_name, safe_name in safe_names.items()}
+    renamed = any(safe_name != param_name for safe_name, param_name in original_names.items())
+
+    if validated:
+        validate = compile_validator(name, params, safe_names, schema_checked)
+
+        async def idep_function(**kwargs):
+            return await call(name, validate(kwargs))
+    else:
+        async def idep_function(**kwargs):
+            if renamed:
+                kwargs = {original_names.get(key, key): value for key, value in kwargs.items()}
+            return await call(name, kwargs)
+
+    annotations = {}
+    sig_params = []
+    for param_name, param_type in params:
+        param_name = safe_names[param_name]
+        if validated:
+            sig_params.append(inspect.Parameter(param_name, inspect.Parameter.KEYWORD_ONLY))
+            continue
+        annotation = PYTHON_TYPES.get(param_to_python_type(param_type), str)
+        annotations[param_name] = annotation
+        sig_params.append(inspect.Parameter(param_name, inspect.Parameter.KEYWORD_ONLY, annotation=annotation))
+
+    idep_function.__name__ = name
+    idep_function.__qualname__ = name
+    idep_function.__doc__ = description
+    idep_function.__annotations__ = annotations
+    idep_function.__signature__ = inspect.Signature(sig_params)
+    return idep_function
+
+def output_schema_from_returns(tool_returns: dict) -> dict:
+    output_schema = {
+        "type": "object",
+        "additionalProperties" : False,
+        "properties": {}
+    }
+    for param_name, param_type in tool_returns.items():
+        if param_type == "list" or param_type == "array":
+            output_schema["properties"][param_name] = {"type": "array"}
+        else:
+            output_schema["properties"][param_name] = {"type": param_type}
+    return output_schema
+
+
+# JSON schema pydantic generates for each parameter annotation, see parameters_schema
+PARAMETER_SCHEMAS = {
+    str: {"type": "string"},
+    int: {"type": "integer"},
+    bool: {"type": "boolean"},
+    list: {"items": {}, "type": "array"},
+    dict: {"additionalProperties": True, "type": "object"},
+    float: {"type": "number"},
+    datetime: {"format": "date-time", "type": "string"},
+}
+
+def parameters_schema(params: list) -> dict:
+    """
+    Input schema of a function with the (param_name, idep_type) keyword parameters, the same schema FastMCP
+    builds with pydantic for the typed signature of make_function, without generating a pydantic schema per function.
+    """
+    properties = {}
+    safe_names = safe_identifiers(param_name for param_name, _ in params)
+    for param_name, param_type in params:
+        safe_name = safe_names[param_name]
+        annotation = PYTHON_TYPES.get(param_to_python_type(param_type), str)
+        # Title as pydantic's GenerateJsonSchema.get_title_from_name makes it
+        properties[safe_name] = {"title": safe_name.title().replace("_", " ").strip(), **PARAMETER_SCHEMAS[annotation]}
+    schema = {"properties": properties, "type": "object"}
+    if properties:
+        schema["required"] = list(properties)
+    return schema
+
+def compile_tool(tool_name: str, tool_json: dict) -> dict:
+    # [name, type] lists rather than tuples, the form they have when the spec is read back from the cache
+    params = [[param_name, param_type] for param_name, param_type in list(tool_json.get("params", {}).items()) + list((tool_json.get("constants") or {}).items())]
+    description = tool_json.get("description", "")
+    output_schema = output_schema_from_returns(tool_json.get("returns", {}))
+    return {
+        "name": tool_name,
+        "description": description,
+        "params": params,
+        "parameters": parameters_schema(params),
+        "output_schema": output_schema,
+        "idep": tool_json,
+    }
+
+def compile_resource(db_schema: dict) -> dict:
+    table_name, table_json = next(iter(db_schema.items()))
+    description = table_json.get("Description", "")
+    fields = table_json.get("Fields", {})
+    params = [[field, field_type] for field, field_type in fields.items()]
+    uri_params = "/".join([f"{{{safe_name}}}" for safe_name in safe_identifiers(fields).values()])
+    uri_template = f"resource://{table_name}/{uri_params}"
+    return {
+        "name": table_name,
+        "description": description,
+        "params": params,
+        "uri_template": uri_template,
+        "parameters": parameters_schema(params),
+        "primary_keys": table_json.get("PrimaryKeys", []),
+        "idep": table_json,
+    }
+
+def compile_llm_tools(llm_tools: dict, previous: "IdepRegistry" = None) -> dict:
+    """
+    Compiles every function and table of llm_tools.
+    Specs of a previous registry are reused as is when their IDEP definition did not change,
+    so a recompile only pays for the entries that actually changed.
+    """
+    old_tools = previous.tools if previous else {}
+    old_resources = previous.resources if previous else {}
+
+    tools = []
+    for tool_name, tool_json in llm_tools["Functions"].items():
+        old_spec = old_tools.get(tool_name)
+        if old_spec is not None and old_spec["idep"] == tool_json:
+            tools.append(old_spec)
+        else:
+            tools.append(compile_tool(tool_name, tool_json))
+
+    resources = []
+    for db_schema in llm_tools["DBSchemas"]:
+        table_name, table_json = next(iter(db_schema.items()))
+        old_spec = old_resources.get(table_name)
+        if old_spec is not None and old_spec["idep"] == table_json:
+            resources.append(old_spec)
+        else:
+            resources.append(compile_resource(db_schema))
+
+    return {
+        "version": COMPILER_VERSION,
+        "tools": tools,
+        "resources": resources,
+    }
+
+
+class IdepFunctionTool(FunctionTool):
+    """
+    FunctionTool of an IDEP function built with make_function(validated=True).
+    The function checks its arguments with the validator compiled from the IDEP types, so the pydantic
+    validation FunctionTool.run does on every call is skipped.
+    """
+    # Same as FunctionTool.run of fastmcp 2.10.1 without the type adapter, IDEP tools always have an output schema
+    async def run(self, arguments: dict) -> ToolResult:
+        result = await self.fn(**arguments)
+        if isinstance(result, ToolResult):
+            return result
+        structured_output = {"result": result} if self.output_schema.get("x-fastmcp-wrap-result") else result
+        # The external services answer with decoded JSON, so the result is encoded once with orjson
+        # and not converted again by ToolResult
+        tool_result = ToolResult(content=[TextContent(type="text", text=dumps(result))])
+        tool_result.structured_content = structured_output
+        return tool_result
+
+
+class IdepRegistry:
+    """
+    Compiled tools and resources of one IDEP file.
+    Builds FastMCP components straight from the cached schemas, so no exec and no schema generation at startup.
+    """
+    def __init__(self, compiled: dict, digest: str):
+        self.digest = digest
+        self.tools = {spec["name"]: spec for spec in compiled["tools"]}
+        self.resources = {spec["name"]: spec for spec in compiled["resources"]}
+
+    def build_tool(self, name: str, call) -> FunctionTool:
+        spec = self.tools[name]
+        return IdepFunctionTool(
+            fn=make_function(name, spec["description"], spec["params"], call, validated=True, schema_checked=True),
+            name=name,
+            description=spec["description"],
+            parameters=spec["parameters"],
+            output_schema=spec["output_schema"],
+            tags=set(),
+        )
+
+    def build_resource_template(self, name: str, call) -> FunctionResourceTemplate:
+        spec = self.resources[name]
+
+        # FastMCP would re-encode a returned dict as indented JSON with pydantic, a str is served as is
+        async def read(resource_name, kwargs):
+            return dumps(await call(resource_name, kwargs))
+
+        return FunctionResourceTemplate(
+            uri_template=spec["uri_template"],
+            name=name,
+            description=spec["description"],
+            mime_type="text/plain",
+            fn=make_function(name, spec["description"], spec["params"], read, validated=True),
+            parameters=spec["parameters"],
+            tags=set(),
+        )
+
+    def build_tools(self, call) -> list:
+        return [self.build_tool(name, call) for name in self.tools]
+
+    def build_resource_templates(self, call) -> list:
+        return [self.build_resource_template(name, call) for name in self.resources]
+
+
+_registry_memo = {}
+_registry_lock = threading.Lock()
+
+def idep_digest(raw: bytes) -> str:
+    hasher = hashlib.sha256(raw)
+    hasher.update(f"|{COMPILER_VERSION}|{fastmcp.__version__}".encode("utf-8"))
+    return hasher.hexdigest()
+
+def cache_file_pattern(idep_file: str):
+    """
+    Names of the cache files of idep_file, "<file name>.<digest>.json".
+    """
+    return re.compile(re.escape(os.path.basename(idep_file)) + r"\.[0-9a-f]{64}\.json")
+
+def prune_cache(cache_dir: str, idep_file: str, keep: str):
+    """
+    Removes the cache files of the other versions of idep_file, only the current one is ever read again.
+    """
+    pattern = cache_file_pattern(idep_file)
+    for entry in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, entry)
+        # Files of the layout before COMPILER_VERSION 3 were named by the digest alone
+        if path != keep and (pattern.fullmatch(entry) or LEGACY_CACHE_FILE.fullmatch(entry)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def load_registry(idep_file: str, cache_dir: str = DEFAULT_CACHE_DIR, previous: IdepRegistry = None) -> IdepRegistry:
+    """
+    Parses and compiles the IDEP file once.
+    The compiled registry is kept in memory per file version and persisted under cache_dir keyed by the
+    content hash, so an unchanged config is not recompiled on the next start. Only the cache file of the
+    current version is kept. cache_dir=None disables the disk cache.
+    With previous, only the entries that differ from it are recompiled.
+    """
+    stat = os.stat(idep_file)
+    memo_key = os.path.abspath(idep_file)
+    with _registry_lock:
+        memo = _registry_memo.get(memo_key)
+        if memo and memo[0] == (stat.st_mtime_ns, stat.st_size):
+            return memo[1]
+
+        with open(idep_file, "rb") as file:
+            raw = file.read()
+        digest = idep_digest(raw)
+
+        compiled = None
+        cache_file = os.path.join(cache_dir, f"{os.path.basename(idep_file)}.{digest}.json") if cache_dir else None
+        if cache_file and os.path.exists(cache_file):
+            try:
+                with open(cache_file, "r") as file:
+                    compiled = json.load(file)
+            except Exception as e:
+                logger.warning("Ignoring unreadable IDEP cache %s: %s", cache_file, e)
+                compiled = None
+
+        if compiled is None:
+            compiled = compile_llm_tools(extract_llm_tools(loads(raw)), previous)
+            if cache_file:
+                os.makedirs(cache_dir, exist_ok=True)
+                tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+                with open(tmp_file, "w") as file:
+                    json.dump(compiled, file)
+                os.replace(tmp_file, cache_file)
+                prune_cache(cache_dir, idep_file, cache_file)
+
+        registry = IdepRegistry(compiled, digest)
+        _registry_memo[memo_key] = ((stat.st_mtime_ns, stat.st_size), registry)
+        return registry
+
+def clear_registry_memo():
+    with _registry_lock:
+        _registry_memo.clear()
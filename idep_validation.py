@@ -0,0 +1,191 @@
+from datetime import datetime
+
+# Date format of IDEP datetime values
+IDEP_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class IdepValidationError(ValueError):
+    """
+    The arguments of an IDEP tool or resource do not match its declared types. Lists every bad argument.
+    """
+    def __init__(self, name: str, errors: list):
+        self.errors = errors
+        super().__init__(f"Invalid arguments for {name}: " + "; ".join(errors))
+
+
+def parse_idep_datetime(value) -> datetime:
+    """
+    IDEP date string (ISO 8601 is accepted too) -> datetime.
+    """
+    if isinstance(value, datetime):
+        return value
+    if not isinstance(value, str):
+        raise ValueError(f"expected a date as {IDEP_DATE_FORMAT}, got {type(value).__name__}")
+    try:
+        # fromisoformat is much faster than strptime and accepts the IDEP format
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return datetime.strptime(value, IDEP_DATE_FORMAT)
+
+def format_idep_datetime(value: datetime) -> str:
+    return value.strftime(IDEP_DATE_FORMAT)
+
+
+def _coerce_str(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise ValueError(f"expected a string, got {type(value).__name__}")
+
+def _coerce_int(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            pass
+    raise ValueError(f"expected an integer, got {value!r}")
+
+def _coerce_float(value):
+    if isinstance(value, float):
+        return value
+    if isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value.strip())
+        except ValueError:
+            pass
+    raise ValueError(f"expected a number, got {value!r}")
+
+TRUE_STRINGS = {"true", "1", "yes"}
+FALSE_STRINGS = {"false", "0", "no"}
+
+def _coerce_bool(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str):
+        lowered = value.strip().lower()
+        if lowered in TRUE_STRINGS:
+            return True
+        if lowered in FALSE_STRINGS:
+            return False
+    raise ValueError(f"expected a boolean, got {value!r}")
+
+def _coerce_list(value):
+    if isinstance(value, list):
+        return value
+    if isinstance(value, tuple):
+        return list(value)
+    raise ValueError(f"expected a list, got {type(value).__name__}")
+
+def _coerce_dict(value):
+    if isinstance(value, dict):
+        return value
+    raise ValueError(f"expected an object, got {type(value).__name__}")
+
+def _coerce_datetime(value):
+    # Sent on as a canonical IDEP date string, so the message stays JSON serializable
+    if value.__class__ is str and len(value) == 19 and value[10] == " ":
+        try:
+            datetime.fromisoformat(value)
+            return value
+        except ValueError:
+            pass
+    return format_idep_datetime(parse_idep_datetime(value))
+
+def _passthrough(value):
+    return value
+
+def _integral_float(value):
+    # JSON schema "integer" accepts 3.0
+    return int(value)
+
+# Values of these exact types are already valid and skip the coercer
+EXACT_TYPES = {
+    "string": str,
+    "text": str,
+    "integer": int,
+    "boolean": bool,
+    "float": float,
+    "real": float,
+    "list": list,
+    "array": list,
+    "dictionary": dict,
+}
+
+_MISSING = object()
+
+COERCERS = {
+    "string": _coerce_str,
+    "text": _coerce_str,
+    "integer": _coerce_int,
+    "boolean": _coerce_bool,
+    "float": _coerce_float,
+    "real": _coerce_float,
+    "list": _coerce_list,
+    "array": _coerce_list,
+    "dictionary": _coerce_dict,
+    "datetime": _coerce_datetime,
+}
+
+# Tool arguments are validated against the tool's input schema by the MCP server before the tool runs,
+# so a tool never receives "3" for an integer or "true" for a boolean. Only the conversions the schema lets through are left
+SCHEMA_CHECKED_COERCERS = {
+    **COERCERS,
+    "string": _passthrough,
+    "text": _passthrough,
+    "integer": _integral_float,
+    "boolean": _passthrough,
+    "float": float,
+    "real": float,
+    "list": _passthrough,
+    "array": _passthrough,
+    "dictionary": _passthrough,
+}
+
+
+def compile_validator(name: str, params: list, renames: dict = None, schema_checked: bool = False):
+    """
+    Builds the argument validator of an IDEP tool or resource once from its (param_name, idep_type) pairs.
+    The validator takes the call's arguments (keyed by the names in renames, safe identifiers by default)
+    and returns them coerced and keyed by the IDEP names, or raises IdepValidationError before anything is called.
+    Resource arguments come from the URI, so they are strings and are converted here. With schema_checked
+    (tools, see SCHEMA_CHECKED_COERCERS) the types were already checked, only datetimes are parsed and numbers normalized.
+    """
+    renames = renames or {}
+    coercers = SCHEMA_CHECKED_COERCERS if schema_checked else COERCERS
+    fields = tuple(
+        (renames.get(param_name, param_name), param_name, EXACT_TYPES.get(param_type), coercers.get(param_type, _passthrough))
+        for param_name, param_type in params
+    )
+    known = frozenset(field[0] for field in fields)
+
+    def validate(arguments: dict) -> dict:
+        validated = {}
+        errors = None
+        get = arguments.get
+        for arg_name, param_name, exact_type, coerce in fields:
+            value = get(arg_name, _MISSING)
+            if value.__class__ is exact_type:
+                validated[param_name] = value
+            elif value is _MISSING:
+                errors = (errors or []) + [f"{arg_name}: missing"]
+            else:
+                try:
+                    validated[param_name] = coerce(value)
+                except (TypeError, ValueError) as e:
+                    errors = (errors or []) + [f"{arg_name}: {e}"]
+        if len(arguments) > len(validated) or errors:
+            unexpected = [key for key in arguments if key not in known]
+            errors = (errors or []) + [f"{key}: unexpected argument" for key in unexpected]
+            if errors:
+                raise IdepValidationError(name, errors)
+        return validated
+    return validate
@@ -0,0 +1,134 @@
+import os
+import asyncio
+import traceback
+import fastmcp
+from fastmcp import FastMCP
+from idep_registry import load_registry, DEFAULT_CACHE_DIR
+
+# fastmcp versions whose resource manager resource_templates was checked against
+TEMPLATE_REMOVAL_VERSIONS = ("2.10.",)
+
+
+def diff_specs(old: dict, new: dict) -> dict:
+    """
+    Diffs two name -> spec maps of an IdepRegistry.
+    """
+    return {
+        "added": [name for name in new if name not in old],
+        "removed": [name for name in old if name not in new],
+        "updated": [name for name in new if name in old and new[name] is not old[name] and new[name] != old[name]],
+    }
+
+
+def resource_templates(mcp: FastMCP) -> dict:
+    """
+    uri_template -> template map of the server's resource manager.
+    FastMCP has no public API to remove a template, so this reaches into the resource manager of the versions
+    it was checked against and refuses to guess on others.
+    """
+    templates = getattr(getattr(mcp, "_resource_manager", None), "_templates", None)
+    if not fastmcp.__version__.startswith(TEMPLATE_REMOVAL_VERSIONS) or not isinstance(templates, dict):
+        raise RuntimeError(f"Removing resource templates is not supported with fastmcp {fastmcp.__version__}, restart the server to apply IDEP table changes")
+    return templates
+
+
+class IdepReloader:
+    """
+    Keeps the IDEP tools and resources of a running FastMCP server in sync with the IDEP file.
+    On a change only the added, updated and removed entries are (re)compiled and swapped in.
+    The server runs with stateless HTTP, so there is no session to push list_changed notifications to,
+    clients pick the change up the next time they list (MCPClientPool re-lists after LISTING_MAX_AGE).
+    """
+    def __init__(self, mcp: FastMCP, idep_file: str, call_tool, call_resource, interval: float = 1.0, cache_dir: str = DEFAULT_CACHE_DIR):
+        self.mcp = mcp
+        self.idep_file = idep_file
+        self.call_tool = call_tool
+        self.call_resource = call_resource
+        self.interval = interval
+        self.cache_dir = cache_dir
+        self.registry = None
+        # Called as listener(registry, diff) after every load (diff is None) and reload
+        self.listeners = []
+        self._stat = None
+
+    def _file_stat(self):
+        stat = os.stat(self.idep_file)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def load(self):
+        """
+        Registers every tool and resource of the IDEP file.
+        """
+        self._stat = self._file_stat()
+        self.registry = load_registry(self.idep_file, self.cache_dir)
+        for tool in self.registry.build_tools(self.call_tool):
+            self.mcp.add_tool(tool)
+        for template in self.registry.build_resource_templates(self.call_resource):
+            self.mcp.add_template(template)
+        for listener in self.listeners:
+            listener(self.registry, None)
+        return self.registry
+
+    def apply(self, registry) -> dict:
+        """
+        Swaps in the changed entries of registry and returns the diff.
+        Everything that can fail (building the new components, the template removal check) happens before the
+        server is touched, so a failed reload leaves the previous config fully in place.
+        """
+        tool_diff = diff_specs(self.registry.tools, registry.tools)
+        resource_diff = diff_specs(self.registry.resources, registry.resources)
+
+        new_tools = [registry.build_tool(name, self.call_tool) for name in tool_diff["added"] + tool_diff["updated"]]
+        new_templates = [registry.build_resource_template(name, self.call_resource) for name in resource_diff["added"] + resource_diff["updated"]]
+        old_uri_templates = [self.registry.resources[name]["uri_template"] for name in resource_diff["removed"] + resource_diff["updated"]]
+        templates = resource_templates(self.mcp) if old_uri_templates else None
+
+        for name in tool_diff["removed"] + tool_diff["updated"]:
+            self.mcp.remove_tool(name)
+        for tool in new_tools:
+            self.mcp.add_tool(tool)
+        for uri_template in old_uri_templates:
+            templates.pop(uri_template, None)
+        for template in new_templates:
+            self.mcp.add_template(template)
+
+        self.registry = registry
+        diff = {"tools": tool_diff, "resources": resource_diff}
+        for listener in self.listeners:
+            listener(registry, diff)
+        return diff
+
+    async def reload(self) -> dict:
+        """
+        Recompiles the IDEP file if it changed and applies the diff. Returns None when nothing changed.
+        The file version is only recorded once the reload went through, a failed one is tried again on the next poll.
+        """
+        stat = self._file_stat()
+        if stat == self._stat:
+            return None
+        try:
+            # Parsing and compiling happens off the event loop, swapping the entries in happens on it
+            registry = await asyncio.to_thread(load_registry, self.idep_file, self.cache_dir, self.registry)
+            diff = None
+            if registry is not self.registry and registry.digest != self.registry.digest:
+                diff = self.apply(registry)
+        except Exception:
+            self._stat = None
+            raise
+        self._stat = stat
+        if diff is not None:
+            print(f"Reloaded {self.idep_file}: {diff}")
+        return diff
+
+    async def watch(self):
+        """
+        Polls the IDEP file every interval seconds, run it as a background task.
+        """
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.reload()
+            except Exception:
+                # Keep serving the previous config, e.g. while the file is half written
+                traceback.print_exc()
+
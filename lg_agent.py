@@ -1,23 +1,30 @@
 import asyncio
 import os
-import requests
 import json
+import logging
 from dotenv import load_dotenv
+from mcp_transport import get_mcp_transport, MCPError
+from serialization import dumps
+from agent_cache import AgentCache
+from mcp_client_pool import MCPClientPool
+from tool_index import ToolIndex, make_embedder, with_fetch_more
+from tool_schemas import schema_to_pydantic
+from parallel_tools import ParallelToolNode
+from conversation_memory import SqliteCheckpointSaver, compact_messages
 from langchain.tools import Tool, StructuredTool
 from langchain_openai import ChatOpenAI
 from langgraph.prebuilt import create_react_agent
 from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
 from langgraph.graph import StateGraph, START, END
 from typing import Annotated
 from typing_extensions import TypedDict
 from langgraph.graph.message import add_messages
-from langgraph.checkpoint.memory import MemorySaver
-from langchain_core.messages import HumanMessage, AIMessage
-from fastmcp import Client
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+from langchain_core.messages import HumanMessage, AIMessage, RemoveMessage
 from contextlib import asynccontextmanager
-from pydantic import create_model
 
 load_dotenv()
 
@@ -30,10 +37,19 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 MCP_SERVER_URL = "http://127.0.0.1:8000/mcp/"
 CONFIG_FILE_PATH = "config/config.idep"
 
-memory = MemorySaver()
+# Per request steps are logged at debug level, stdout is kept for startup output
+logger = logging.getLogger(__name__)
+
+TOOL_TOP_K = int(os.getenv("TOOL_TOP_K", "8"))
+
+# Conversations persist in SQLite (CHECKPOINT_DB), idle and surplus sessions are evicted
+memory = SqliteCheckpointSaver()
 model_name = "gpt-4o-mini"
 llm = ChatOpenAI(openai_api_key=OPENAI_API_KEY, temperature=0, model=model_name)
 tools = []
+# Embeddings of the MCP tools, PICK_TOOLS takes the top-k tools for the question from it
+tool_index = ToolIndex(make_embedder())
+tool_index.load()
 
 
 system_prompt = """
@@ -58,70 +74,19 @@ def get_allowed_tools(config_file_path : str):
         if "LLMServiceOptions" in service:
             return service["LLMServiceOptions"].get("MCPTools")
             
-def schema_to_pydantic(name, schema):
-    type_map = {
-        "string": str,
-        "integer": int,
-        "number": float,
-        "boolean": bool,
-        "array": list,
-        "object": dict,
-    }
-    fields = {}
-    for arg, props in schema.get("properties", {}).items():
-        typ = type_map.get(props.get("type", "string"), str)
-        default = props.get("default", None)
-        fields[arg] = (typ, default)
-    return create_model(f"{name}_Args", **fields)
-
-
 # --- Tool Function Wrappers ---
 
 def mcp_tool_call(tool_name, input_dict):
     """
     Generic function to call an MCP tool by name with arguments.
-    Handles both JSON and SSE (Server-Sent Events) responses.
+    Goes through the shared transport, which keeps the HTTP connection and MCP session alive between calls.
     """
-    
-    payload = {
-        "jsonrpc": "2.0",
-        "id": 1,
-        "method": "tools/call",
-        "params" : {
-            "name": tool_name,
-            "arguments": input_dict,
-        },
-    }
-    resp = requests.post(
-        MCP_SERVER_URL,
-        json=payload,
-        headers={
-            "Accept": "application/json, text/event-stream",
-            "Content-Type": "application/json"
-        }
-    )
     try:
-        resp.raise_for_status()
-        # Check for SSE (Server-Sent Events) response
-        if resp.text.startswith("event: message"):
-            # Find the line starting with 'data: '
-            for line in resp.text.splitlines():
-                if line.startswith("data: "):
-                    data_json = line[len("data: "):].strip()
-                    try:
-                        data = json.loads(data_json)
-                        # If it's a JSON-RPC response, extract 'result' if present
-                        if isinstance(data, dict) and "result" in data:
-                            return data["result"]
-                        return data
-                    except Exception as e:
-                        return f"Error parsing SSE data: {e}\nRaw data: {data_json}"
-            return "Error: No 'data:' line found in SSE response."
-        else:
-            # Fallback: try to parse as JSON
-            return resp.json().get("result", resp.text)
+        return get_mcp_transport(MCP_SERVER_URL).call_tool(tool_name, input_dict)
+    except MCPError as e:
+        return f"Error calling MCP tool '{tool_name}': {e}\nResponse: {e.response_text}"
     except Exception as e:
-        return f"Error calling MCP tool '{tool_name}': {e}\nResponse: {resp.text}"
+        return f"Error calling MCP tool '{tool_name}': {e}"
     
 
 def make_tool_func(tool_name, input_schema):
@@ -129,7 +94,7 @@ def make_tool_func(tool_name, input_schema):
     arg_names = list(input_schema.get("properties", {}).keys()) if input_schema else []
 
     def tool_func(**kwargs):
-        print(f"[TOOL CALL]   {tool_name} with {kwargs}")
+        logger.debug("[TOOL CALL]   %s with %s", tool_name, kwargs)
         return mcp_tool_call(tool_name, kwargs)
         # If input is a string, wrap it in a dict with the correct argument name
         print(input_dict, type(input_dict))
@@ -144,6 +109,20 @@ def make_tool_func(tool_name, input_schema):
         return mcp_tool_call(tool_name, input_dict)
     return tool_func
 
+def make_tool_coroutine(tool_name):
+    """
+    Async counterpart of make_tool_func, used when the graph runs async.
+    Goes over the long-lived MCP client pool and returns the same JSON-RPC result shape as mcp_tool_call.
+    """
+    async def tool_coroutine(**kwargs):
+        logger.debug("[TOOL CALL]   %s with %s", tool_name, kwargs)
+        try:
+            result = await mcp_pool.call_tool_mcp(tool_name, kwargs)
+            return result.model_dump(mode="json", by_alias=True, exclude_none=True)
+        except Exception as e:
+            return f"Error calling MCP tool '{tool_name}': {e}"
+    return tool_coroutine
+
 
 # --- Define State Schema ---
 class State(TypedDict):
@@ -154,43 +133,45 @@ class State(TypedDict):
 # --- Build the StateGraph ---
 graph_builder = StateGraph(State)
 
-def pick_tools_node(state: State):
-    print("Getting tools...")
-    #user_prompt = state["messages"][-1].content
-    #res = mcp_tool_call("pick_tools", {"user_prompt": user_prompt})
-    #res = json.loads(res.get("content")[0].get("text")).get("result")
-    #selected_tools = json.loads(res)
-    #print(f"Selected Tools: {selected_tools}")
-    #state["allowed_tools"] = tools
+async def pick_tools_node(state: State):
+    logger.debug("Getting tools...")
+    # Small catalogs are bound as a whole, retrieval only pays off past TOOL_TOP_K tools
+    if len(tool_index) <= TOOL_TOP_K:
+        state["allowed_tools"] = []
+        return state
+    user_prompt = state["messages"][-1].content
+    selected = await asyncio.to_thread(tool_index.search, user_prompt, TOOL_TOP_K)
+    # fetch_more is pinned whatever its score, a paged result is useless without it
+    state["allowed_tools"] = with_fetch_more(selected, all_tools)
+    logger.debug("Selected tools: %s", state["allowed_tools"])
     return state
 
-def agent_node(state: State):
-    print("Calling Agent...")
-    selected_tools = state.get("allowed_tools", [])
-    filtered_tools = [tool for tool in tools if tool.name in selected_tools]
-    llm_with_tools = llm.bind_tools(tools)
-    agent = create_react_agent(llm_with_tools, tools=tools, prompt=system_prompt)
+def build_agent(tool_names: frozenset):
+    filtered_tools = [tool for tool in tools if tool.name in tool_names]
+    # The independent tool calls of one turn run concurrently, capped and with a timeout per call
+    # checkpointer=False: the outer graph stores the conversation, the inner ReAct steps are not checkpointed
+    return create_react_agent(llm, tools=ParallelToolNode(filtered_tools), prompt=system_prompt, checkpointer=False)
+
+# Compiled agents per allowed tool set, so a request only invokes the agent
+agent_cache = AgentCache(build_agent)
+
+async def agent_node(state: State):
+    logger.debug("Calling Agent...")
+    # Without a selection from PICK_TOOLS the agent gets every tool
+    selected_tools = state.get("allowed_tools") or [tool.name for tool in tools]
+    agent = agent_cache.get(selected_tools)
+    # Old turns and large tool outputs are compacted to the token budget before the LLM sees them
+    history = compact_messages(state["messages"])
     try:
-        result = agent.invoke({"messages": state["messages"]})
+        result = await agent.ainvoke({"messages": history})
     except Exception as e:
         print(e)
-        state["messages"].append({"role": "assistant", "content": "I'm sorry, I'm having trouble processing your request. Please try again."})
-        return state
-    
-    if "messages" in result:
-        state["messages"].extend(result["messages"])
-    else:
-        state["messages"].append(result)
-    
-    
+        return {"messages": [AIMessage(content="I'm sorry, I'm having trouble processing your request. Please try again.")]}
+
     agent_response = result["messages"][-1].content
-    print(f"[AGENT]       {agent_response}")
-    try:
-        return state
-    except Exception as e:
-        print(e)
-        state["messages"].append(AIMessage(content="I'm sorry, I'm having trouble processing your request. Please try again."))
-        return state
+    logger.debug("[AGENT]       %s", agent_response)
+    # The compacted history replaces the stored one, so the checkpoint stays bounded as well
+    return {"messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES), *result["messages"]]}
 
 # Add nodes and edges as per docs
 graph_builder.add_node("PICK_TOOLS", pick_tools_node)
@@ -203,33 +184,58 @@ graph_builder.add_edge("TRIGGER_AGENT", END)
 graph = graph_builder.compile(checkpointer=memory)
 
 all_tools = []
-@asynccontextmanager
-async def lifespan(app : FastAPI):
-    print("Getting tools from MCP Server...")
-    print("======= Available Tools =======")
-    global all_tools
-    # Fetch all tools from MCP Server
-    async with Client(MCP_SERVER_URL) as client:
-        all_tools = await client.list_tools()
-    
-    for tool in all_tools:
-        print(f"Tool: {tool.name}")
+# Long-lived MCP sessions for the gateway endpoints, connected in the lifespan
+mcp_pool = MCPClientPool(MCP_SERVER_URL)
+
+def build_tools(mcp_tools: list) -> list:
+    built_tools = []
+    for tool in mcp_tools:
         if hasattr(tool, "inputSchema"):
             pyd_model = schema_to_pydantic(tool.name, tool.inputSchema)
-            tools.append(
+            built_tools.append(
                 StructuredTool(
                     name=tool.name,
                     func=make_tool_func(tool.name, tool.inputSchema),
+                    coroutine=make_tool_coroutine(tool.name),
                     description=tool.description,
                     args_schema=pyd_model
                 )
             )
         else:
-            tools.append(Tool(name=tool.name, func=make_tool_func(tool.name, None), description=tool.description))
-    for tool in tools:
-        #print(tool.get_input_jsonschema())
-        print()
-    yield
+            built_tools.append(Tool(name=tool.name, func=make_tool_func(tool.name, None), coroutine=make_tool_coroutine(tool.name), description=tool.description))
+    return built_tools
+
+def update_tool_index(mcp_tools: list):
+    diff = tool_index.update(mcp_tools)
+    if any(diff.values()):
+        print(f"Tool index updated: {diff}")
+        tool_index.save()
+
+async def refresh_tools():
+    global all_tools
+    all_tools = await mcp_pool.list_tools()
+    tools[:] = build_tools(all_tools)
+    await asyncio.to_thread(update_tool_index, all_tools)
+    # Compile the agent with every tool up front, so the first request only invokes it
+    agent_cache.clear()
+    agent_cache.get([tool.name for tool in tools])
+
+def on_mcp_list_changed(kind: str):
+    # Runs inside the MCP client's message loop, the refresh has to happen in a separate task
+    if kind == "tools":
+        asyncio.get_running_loop().create_task(refresh_tools())
+
+mcp_pool.listeners.append(on_mcp_list_changed)
+
+@asynccontextmanager
+async def lifespan(app : FastAPI):
+    print("Getting tools from MCP Server...")
+    print("======= Available Tools =======")
+    async with mcp_pool:
+        await refresh_tools()
+        for tool in all_tools:
+            print(f"Tool: {tool.name}")
+        yield
 
 app = FastAPI(lifespan=lifespan)
 
@@ -242,7 +248,7 @@ app.add_middleware(
 )
 @app.post("/all_tools")
 async def get_all_tools(req : Request):
-    global all_tools
+    all_tools = await mcp_pool.list_tools()
     transformed_tools = []
     for tool in all_tools:
         transformed_tools.append({
@@ -260,17 +266,15 @@ async def call_tool_endpoint(req: Request):
     arguments = data.get("arguments", {})
     if not tool_name:
         return {"error": "tool_name is required"}
-    async with Client(MCP_SERVER_URL) as client:
-        try:
-            result = await client.call_tool(tool_name, arguments)
-            return {"result": result}
-        except Exception as e:
-            return {"error": str(e)}
+    try:
+        result = await mcp_pool.call_tool(tool_name, arguments)
+        return {"result": result}
+    except Exception as e:
+        return {"error": str(e)}
 
 @app.post("/all_resource_templates")
 async def get_all_resource_templates(req : Request):
-    async with Client(MCP_SERVER_URL) as client:
-        resource_templates = await client.list_resource_templates()
+    resource_templates = await mcp_pool.list_resource_templates()
     print(resource_templates)
     
     return {"result": resource_templates}
@@ -283,19 +287,66 @@ async def run_agent(req : Request):
     session_id = data.get("session_id")
     question = data.get("question")
 
-    print("User input:", question)
-    print("Session ID:", session_id)
+    logger.debug("User input: %s", question)
+    logger.debug("Session ID: %s", session_id)
 
     config = {"configurable": {"thread_id": session_id}}
 
     state = State()
     state["messages"] = [HumanMessage(content=question)]
-    final_state = graph.invoke(state, config)
+    final_state = await graph.ainvoke(state, config)
     agent_response = final_state["messages"][-1].content
     return {"response": agent_response}
-    
 
 
+def ndjson_line(event: dict) -> str:
+    return dumps(event) + "\n"
+
+async def stream_agent_events(state: State, config: dict):
+    """
+    Runs the graph and yields NDJSON events as they happen:
+    {"type": "token"}, {"type": "tool_start"}, {"type": "tool_end"}, then {"type": "done"} or {"type": "error"}.
+    """
+    try:
+        async for event in graph.astream_events(state, config, version="v2"):
+            kind = event["event"]
+            if kind == "on_chat_model_stream":
+                content = event["data"]["chunk"].content
+                if content:
+                    yield ndjson_line({"type": "token", "content": content})
+            elif kind == "on_tool_start":
+                # run_id is the same on the start and end events of one tool call, the frontend pairs them with it
+                yield ndjson_line({"type": "tool_start", "run_id": event["run_id"], "name": event["name"], "input": event["data"].get("input")})
+            elif kind == "on_tool_end":
+                output = event["data"].get("output")
+                yield ndjson_line({"type": "tool_end", "run_id": event["run_id"], "name": event["name"], "output": getattr(output, "content", output)})
+        final_state = await graph.aget_state(config)
+        yield ndjson_line({"type": "done", "response": final_state.values["messages"][-1].content})
+    except Exception as e:
+        logger.exception("Agent stream failed")
+        yield ndjson_line({"type": "error", "error": str(e)})
+
+@app.post("/agent/stream")
+async def run_agent_stream(req : Request):
+    """
+    Streaming variant of /agent, the response is chunked NDJSON (one JSON event per line).
+    """
+    data = await req.json()
+    session_id = data.get("session_id")
+    question = data.get("question")
+
+    logger.debug("User input: %s", question)
+    logger.debug("Session ID: %s", session_id)
+
+    config = {"configurable": {"thread_id": session_id}}
+
+    state = State()
+    state["messages"] = [HumanMessage(content=question)]
+    return StreamingResponse(
+        stream_agent_events(state, config),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 if __name__ == "__main__":
@@ -1,7 +1,8 @@
 import os
-import requests
 import json
 from dotenv import load_dotenv
+from mcp_transport import get_mcp_transport, MCPError
+from conversation_memory import SqliteCheckpointSaver, compaction_hook
 from langchain.tools import Tool
 from langchain_openai import ChatOpenAI
 from langgraph.prebuilt import create_react_agent
@@ -33,48 +34,14 @@ def print_agent_history(agent_response, tools_called = []):
 def mcp_tool_call(tool_name, input_dict):
     """
     Generic function to call an MCP tool by name with arguments.
-    Handles both JSON and SSE (Server-Sent Events) responses.
+    Goes through the shared transport, which keeps the HTTP connection and MCP session alive between calls.
     """
-    
-    payload = {
-        "jsonrpc": "2.0",
-        "id": 1,
-        "method": "tools/call",
-        "params" : {
-            "name": tool_name,
-            "arguments": input_dict,
-        },
-    }
-    resp = requests.post(
-        MCP_SERVER_URL,
-        json=payload,
-        headers={
-            "Accept": "application/json, text/event-stream",
-            "Content-Type": "application/json"
-        }
-    )
     try:
-        resp.raise_for_status()
-        # Check for SSE (Server-Sent Events) response
-        if resp.text.startswith("event: message"):
-            # Find the line starting with 'data: '
-            for line in resp.text.splitlines():
-                if line.startswith("data: "):
-                    data_json = line[len("data: "):].strip()
-                    try:
-                        data = json.loads(data_json)
-                        # If it's a JSON-RPC response, extract 'result' if present
-                        if isinstance(data, dict) and "result" in data:
-                            return data["result"]
-                        return data
-                    except Exception as e:
-                        return f"Error parsing SSE data: {e}\nRaw data: {data_json}"
-            return "Error: No 'data:' line found in SSE response."
-        else:
-            # Fallback: try to parse as JSON
-            return resp.json().get("result", resp.text)
+        return get_mcp_transport(MCP_SERVER_URL).call_tool(tool_name, input_dict)
+    except MCPError as e:
+        return f"Error calling MCP tool '{tool_name}': {e}\nResponse: {e.response_text}"
     except Exception as e:
-        return f"Error calling MCP tool '{tool_name}': {e}\nResponse: {resp.text}"
+        return f"Error calling MCP tool '{tool_name}': {e}"
 
 
 # --- Tool Functions ---
@@ -172,10 +139,16 @@ You're task is to help the user with their questions.
 You can use the tools provided to you to answer the user's questions.
 """
 # Create the LangGraph ReAct agent
-agent = create_react_agent(llm, tools=tools, prompt=system_prompt)
+# Each session_id is its own thread in the checkpoint store, the hook keeps its history under the token budget
+agent = create_react_agent(
+    llm,
+    tools=tools,
+    prompt=system_prompt,
+    checkpointer=SqliteCheckpointSaver(),
+    pre_model_hook=compaction_hook()
+)
 
 app = FastAPI()
-history = []
 
 
 app.add_middleware(
@@ -195,18 +168,14 @@ async def run_agent(req : Request):
     print("User input:", question)
     print("Session ID:", session_id)
 
-    
-
-    global history
-    history.append({"role": "user", "content": question})
-
     if "question" in data:
         user_input = {"messages": [{"role": "user", "content": data["question"]}]}
     else:
         return {"error": "Missing 'question' or 'messages' in request."}
 
 
-    steps = agent.stream({"messages": history}, stream_mode="updates")
+    config = {"configurable": {"thread_id": session_id}}
+    steps = agent.stream(user_input, config, stream_mode="updates")
     tools_called = []
     for step in steps:
         
@@ -240,7 +209,6 @@ async def run_agent(req : Request):
             message = step.get("agent").get("messages")[-1]
             if hasattr(message, "content") and message.content:
                 agent_response = getattr(message, "content")
-                history.append({"role": "assistant", "content": agent_response})
                 print_agent_history(agent_response, tools_called)
                 return {"response": agent_response}
 
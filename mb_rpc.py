@@ -0,0 +1,311 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import threading
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+DIRECT_REPLY_TO = "amq.rabbitmq.reply-to"
+DEFAULT_TIMEOUT_MS = 5000
+
+
+class RPCError(Exception):
+    """
+    An RPC call over the message broker failed: no reply in time, or the connection was lost.
+    """
+
+
+def broker_settings_from_idep(idep: dict, service_code: str = "LLM", request_code: str = None) -> dict:
+    """
+    Connection settings of service_code's RPC client in a config.idep style IDEP.
+    - host, port, virtual host, exchange and routing keys come from the service's RPCMessages_Client entry
+      (request_code, or the first entry)
+    - the credentials are the service's user in the MessageBroker service
+    - timeout is the service's ICMOptions.ICRONQueryTimeout, in seconds
+    """
+    services = idep.get("Services", [])
+    service = next((service for service in services if service.get("ServiceCode") == service_code), None)
+    if service is None:
+        raise ValueError(f"No service {service_code} in the IDEP")
+    clients = service.get("RPCMessages_Client", [])
+    client = next((entry for entry in clients if request_code in (None, entry.get("RequestMessageCode"))), None)
+    if client is None:
+        raise ValueError(f"Service {service_code} has no RPC client {request_code or ''}")
+
+    broker = next((service for service in services if service.get("ServiceCode") == client.get("MBServiceCode")), {})
+    username = password = None
+    for user in broker.get("MessageBrokerOptions", {}).get("Users", []):
+        if user.get("ServiceCode") == service_code and user.get("Credentials"):
+            username, password = user["Credentials"][0]["Username"], user["Credentials"][0]["Password"]
+            break
+
+    return {
+        "host": client.get("MBHost", "localhost"),
+        "port": client.get("MBPort", 5672),
+        "virtual_host": client.get("MBVirtualHostName", "/"),
+        "exchange": client.get("MBExchangeName", ""),
+        "request_code": client.get("RequestMessageCode"),
+        "routing_keys": client.get("RoutingKeyParameters", {}),
+        "username": username,
+        "password": password,
+        "timeout": service.get("ICMOptions", {}).get("ICRONQueryTimeout", DEFAULT_TIMEOUT_MS) / 1000,
+    }
+
+
+class PikaBroker:
+    """
+    One RabbitMQ connection and channel, owned by a background I/O thread (pika connections are not thread safe).
+    Replies arrive on the direct reply-to pseudo queue, so no reply queue has to be declared.
+    publish() can be called from any thread, it is handed to the I/O thread.
+    """
+    def __init__(self, host: str = "localhost", port: int = 5672, virtual_host: str = "/", username: str = None, password: str = None, heartbeat: int = 30):
+        self.host = host
+        self.port = port
+        self.virtual_host = virtual_host
+        self.username = username
+        self.password = password
+        self.heartbeat = heartbeat
+        self.connection = None
+        self.channel = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._error = None
+
+    def _connect(self, on_reply):
+        import pika
+        credentials = pika.PlainCredentials(self.username, self.password) if self.username else pika.ConnectionParameters.DEFAULT_CREDENTIALS
+        parameters = pika.ConnectionParameters(host=self.host, port=self.port, virtual_host=self.virtual_host, credentials=credentials, heartbeat=self.heartbeat)
+        self.connection = pika.BlockingConnection(parameters)
+        self.channel = self.connection.channel()
+
+        def on_message(channel, method, properties, body):
+            on_reply(properties.correlation_id, body, properties.headers or {})
+
+        # Direct reply-to must be consumed (with auto ack) before anything is published with it
+        self.channel.basic_consume(queue=DIRECT_REPLY_TO, on_message_callback=on_message, auto_ack=True)
+
+    def _run(self, on_reply):
+        try:
+            self._connect(on_reply)
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        try:
+            self.channel.start_consuming()
+        except Exception:
+            traceback.print_exc()
+        finally:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+            self.connection = None
+
+    def start(self, on_reply, timeout: float = 10.0):
+        """
+        Connects and starts consuming replies, on_reply(correlation_id, body, headers) is called on the I/O thread.
+        """
+        self._ready.clear()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, args=(on_reply,), name="mb-rpc-io", daemon=True)
+        self._thread.start()
+        if not self._ready.wait(timeout) or self._error is not None:
+            raise RPCError(f"Could not connect to the message broker at {self.host}:{self.port}: {self._error!r}")
+
+    def is_open(self) -> bool:
+        return self.connection is not None and self.connection.is_open
+
+    def publish(self, exchange: str, routing_key: str, body: bytes, correlation_id: str, headers: dict):
+        import pika
+        properties = pika.BasicProperties(
+            reply_to=DIRECT_REPLY_TO,
+            correlation_id=correlation_id,
+            content_type="application/json",
+            headers=headers,
+        )
+        self.connection.add_callback_threadsafe(
+            lambda: self.channel.basic_publish(exchange=exchange, routing_key=routing_key, body=body, properties=properties)
+        )
+
+    def close(self):
+        if self.is_open():
+            try:
+                self.connection.add_callback_threadsafe(self.channel.stop_consuming)
+            except Exception:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+class InMemoryBroker:
+    """
+    Stand-in for RabbitMQ in tests and benchmarks, same interface as PikaBroker.
+    Servers are handler(body, headers) -> reply body functions registered per routing key, they run on a thread pool
+    (one thread per server instance), optionally after a fixed latency.
+    """
+    def __init__(self, workers: int = 8, latency: float = 0.0):
+        self.handlers = {}
+        self.latency = latency
+        self.published = 0
+        self._workers = workers
+        self._pool = None
+        self._on_reply = None
+
+    def serve(self, routing_key: str, handler):
+        self.handlers[routing_key] = handler
+
+    def start(self, on_reply, timeout: float = 10.0):
+        self._on_reply = on_reply
+        self._pool = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="mb-memory")
+
+    def is_open(self) -> bool:
+        return self._pool is not None
+
+    def _handle(self, handler, body: bytes, correlation_id: str, headers: dict):
+        if self.latency:
+            time.sleep(self.latency)
+        try:
+            reply = handler(body, headers)
+        except Exception:
+            # A server that fails does not answer, like an RPC server that crashed
+            traceback.print_exc()
+            return
+        self._on_reply(correlation_id, reply, {})
+
+    def publish(self, exchange: str, routing_key: str, body: bytes, correlation_id: str, headers: dict):
+        self.published += 1
+        handler = self.handlers.get(routing_key)
+        # Unroutable messages are dropped, the caller times out
+        if handler is not None:
+            self._pool.submit(self._handle, handler, body, correlation_id, headers)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+class RPCClient:
+    """
+    Request/reply over a message broker, many calls in flight on one connection.
+    Every request carries a fresh correlation id, replies are matched to the waiting call by it.
+    Replies that arrive after their call timed out are dropped.
+    routing_keys maps request names to routing keys, names without one are sent with default_routing_key.
+    """
+    def __init__(self, broker, exchange: str = "", timeout: float = DEFAULT_TIMEOUT_MS / 1000, routing_keys: dict = None, default_routing_key: str = ""):
+        self.broker = broker
+        self.exchange = exchange
+        self.timeout = timeout
+        self.routing_keys = routing_keys or {}
+        self.default_routing_key = default_routing_key
+        self.stats = {"calls": 0, "replies": 0, "timeouts": 0, "late_replies": 0}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._started = False
+
+    def start(self):
+        """
+        Connects the broker, or reconnects it when its connection was lost.
+        """
+        with self._lock:
+            if not self._started or not self.broker.is_open():
+                self.broker.start(self._on_reply)
+                self._started = True
+
+    def routing_key(self, name: str) -> str:
+        return self.routing_keys.get(name) or self.default_routing_key
+
+    def close(self):
+        with self._lock:
+            self._started = False
+            pending, self._pending = self._pending, {}
+        self.broker.close()
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(RPCError("The RPC client was closed"))
+
+    def _on_reply(self, correlation_id: str, body: bytes, headers: dict):
+        with self._lock:
+            future = self._pending.pop(correlation_id, None)
+            self.stats["replies" if future is not None else "late_replies"] += 1
+        if future is not None and not future.done():
+            future.set_result(body)
+
+    def send(self, routing_key: str, body, headers: dict = None) -> tuple:
+        """
+        Publishes a request, returns (correlation_id, Future of the reply body).
+        """
+        if not self._started or not self.broker.is_open():
+            self.start()
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        correlation_id = uuid.uuid4().hex
+        future = Future()
+        with self._lock:
+            self._pending[correlation_id] = future
+            self.stats["calls"] += 1
+        try:
+            self.broker.publish(self.exchange, routing_key, body, correlation_id, headers or {})
+        except Exception as e:
+            self._forget(correlation_id)
+            raise RPCError(f"Publishing to {routing_key} failed: {e}")
+        return correlation_id, future
+
+    def _forget(self, correlation_id: str):
+        with self._lock:
+            self._pending.pop(correlation_id, None)
+
+    def _timed_out(self, correlation_id: str, routing_key: str, timeout: float) -> RPCError:
+        with self._lock:
+            self._pending.pop(correlation_id, None)
+            self.stats["timeouts"] += 1
+        return RPCError(f"No reply from {routing_key} within {timeout:g} seconds")
+
+    def call(self, routing_key: str, body, headers: dict = None, timeout: float = None) -> bytes:
+        """
+        Blocking call, returns the reply body.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        correlation_id, future = self.send(routing_key, body, headers)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            raise self._timed_out(correlation_id, routing_key, timeout)
+
+    async def acall(self, routing_key: str, body, headers: dict = None, timeout: float = None) -> bytes:
+        """
+        Same as call, but awaits the reply without holding a thread.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        correlation_id, future = self.send(routing_key, body, headers)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise self._timed_out(correlation_id, routing_key, timeout)
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+
+def make_rpc_client(idep_file: str = None, transport: str = None) -> RPCClient:
+    """
+    RPC client selected by MB_TRANSPORT, "rabbitmq" is the only transport (settings from the IDEP in MB_IDEP_FILE).
+    Returns None when MB_TRANSPORT is not set.
+    InMemoryBroker has no handlers unless a test or benchmark registers them, so it is not offered here,
+    every call would wait for its timeout.
+    """
+    transport = transport or os.getenv("MB_TRANSPORT")
+    if not transport:
+        return None
+    if transport != "rabbitmq":
+        raise ValueError(f"Unknown MB_TRANSPORT {transport}, use rabbitmq (InMemoryBroker is for tests and benchmarks only)")
+    idep_file = idep_file or os.getenv("MB_IDEP_FILE", "config/config.idep")
+    with open(idep_file, "r") as file:
+        settings = broker_settings_from_idep(json.load(file), os.getenv("MB_SERVICE_CODE", "LLM"), os.getenv("MB_REQUEST_CODE"))
+    broker = PikaBroker(settings["host"], settings["port"], settings["virtual_host"], settings["username"], settings["password"])
+    return RPCClient(broker, settings["exchange"], settings["timeout"], settings["routing_keys"], settings["request_code"])
@@ -0,0 +1,188 @@
+import os
+import time
+import asyncio
+import itertools
+import traceback
+from fastmcp import Client
+from fastmcp.client.messages import MessageHandler
+
+# Seconds a tool / resource template listing is served from the cache.
+# my_mcp runs with stateless_http, so it has no session to send list_changed on, listings are re-read once they are this old
+LISTING_MAX_AGE = float(os.getenv("MCP_LISTING_MAX_AGE", "60"))
+
+
+class ListChangedHandler(MessageHandler):
+    """
+    Forwards the server's list_changed notifications to the pool (only sent by servers with stateful sessions).
+    """
+    def __init__(self, pool: "MCPClientPool"):
+        self.pool = pool
+
+    async def on_tool_list_changed(self, message):
+        self.pool.invalidate("tools")
+
+    async def on_resource_list_changed(self, message):
+        self.pool.invalidate("resource_templates")
+
+
+class MCPClientPool:
+    """
+    A few long-lived fastmcp Clients to one MCP server, meant to live as long as the FastAPI app (use it in the lifespan).
+    - Requests go round robin over the connected clients, so there is no initialize handshake per request
+    - A background task pings every client every health_interval seconds and reconnects the ones that fail
+    - Tool and resource template listings are cached for listing_max_age seconds, or until the server sends a
+      list_changed notification. The health loop re-reads expired listings and notifies the listeners when they changed,
+      so a stateless server's changes (e.g. an IDEP reload) reach the agents within about listing_max_age + health_interval
+    """
+    def __init__(self, url: str, size: int = 2, health_interval: float = 30.0, timeout: float = 60.0, listing_max_age: float = LISTING_MAX_AGE):
+        self.url = url
+        self.size = size
+        self.health_interval = health_interval
+        self.timeout = timeout
+        self.listing_max_age = listing_max_age
+        self.clients = []
+        # Called as listener(kind) with kind "tools" or "resource_templates" when a listing is invalidated.
+        # They run inside the client's message loop, so they must not await MCP requests themselves.
+        self.listeners = []
+        self.reconnects = 0
+        self._next = itertools.count()
+        self._listings = {}  # kind -> (fetched_at, listing)
+        self._listing_locks = {"tools": asyncio.Lock(), "resource_templates": asyncio.Lock()}
+        self._generations = {"tools": 0, "resource_templates": 0}
+        self._health_task = None
+
+    def _new_client(self) -> Client:
+        return Client(self.url, timeout=self.timeout, message_handler=ListChangedHandler(self))
+
+    async def start(self):
+        for _ in range(self.size):
+            client = self._new_client()
+            await client.__aenter__()
+            self.clients.append(client)
+        self._health_task = asyncio.create_task(self._health_loop())
+
+    async def stop(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        for client in self.clients:
+            try:
+                await client.close()
+            except Exception:
+                pass
+        self.clients = []
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    async def _reconnect(self, index: int) -> Client:
+        old_client = self.clients[index]
+        client = self._new_client()
+        await client.__aenter__()
+        self.clients[index] = client
+        self.reconnects += 1
+        try:
+            await old_client.close()
+        except Exception:
+            pass
+        # Whatever changed while we were disconnected was not notified
+        self.invalidate("tools")
+        self.invalidate("resource_templates")
+        return client
+
+    async def client(self) -> Client:
+        """
+        Returns the next connected client, reconnecting it first when its session is gone.
+        """
+        index = next(self._next) % len(self.clients)
+        client = self.clients[index]
+        if not client.is_connected():
+            client = await self._reconnect(index)
+        return client
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for index, client in enumerate(list(self.clients)):
+                try:
+                    await asyncio.wait_for(client.ping(), timeout=self.timeout)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"MCP client {index} failed its health check ({e}), reconnecting")
+                    try:
+                        await self._reconnect(index)
+                    except Exception:
+                        traceback.print_exc()
+            try:
+                await self._refresh_listings()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                traceback.print_exc()
+
+    async def _refresh_listings(self):
+        """
+        Re-reads the listings that expired, _cached_listing tells the listeners about the ones that changed.
+        """
+        if "tools" in self._listings and self._fresh_listing("tools") is None:
+            await self.list_tools()
+        if "resource_templates" in self._listings and self._fresh_listing("resource_templates") is None:
+            await self.list_resource_templates()
+
+    def invalidate(self, kind: str):
+        self._listings.pop(kind, None)
+        self._generations[kind] += 1
+        self._notify(kind)
+
+    def _notify(self, kind: str):
+        for listener in self.listeners:
+            try:
+                listener(kind)
+            except Exception:
+                traceback.print_exc()
+
+    def _fresh_listing(self, kind: str):
+        cached = self._listings.get(kind)
+        if cached is not None and time.monotonic() - cached[0] < self.listing_max_age:
+            return cached[1]
+        return None
+
+    async def _cached_listing(self, kind: str, fetch):
+        listing = self._fresh_listing(kind)
+        if listing is not None:
+            return listing
+        async with self._listing_locks[kind]:
+            listing = self._fresh_listing(kind)
+            if listing is None:
+                generation = self._generations[kind]
+                listing = await fetch(await self.client())
+                # Not cached when a list_changed arrived while fetching, the listing may already be stale
+                if generation == self._generations[kind]:
+                    previous = self._listings.get(kind)
+                    self._listings[kind] = (time.monotonic(), listing)
+                    # An expired listing that changed is the only sign of a change on a stateless server
+                    if previous is not None and previous[1] != listing:
+                        self._notify(kind)
+            return listing
+
+    async def list_tools(self) -> list:
+        return await self._cached_listing("tools", lambda client: client.list_tools())
+
+    async def list_resource_templates(self) -> list:
+        return await self._cached_listing("resource_templates", lambda client: client.list_resource_templates())
+
+    async def call_tool(self, tool_name: str, arguments: dict):
+        client = await self.client()
+        return await client.call_tool(tool_name, arguments)
+
+    async def call_tool_mcp(self, tool_name: str, arguments: dict, timeout: float = None):
+        """
+        Same as call_tool, but returns the raw mcp CallToolResult and does not raise on tool errors.
+        """
+        client = await self.client()
+        return await client.call_tool_mcp(tool_name, arguments, timeout=timeout)
@@ -0,0 +1,214 @@
+import re
+import codecs
+import itertools
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from serialization import dumpb, loads
+
+MCP_PROTOCOL_VERSION = "2025-06-18"
+ACCEPT_HEADER = "application/json, text/event-stream"
+LINE_END = re.compile(r"\r\n|\r|\n")
+
+
+class SSEParser:
+    """
+    Incremental Server-Sent Events parser.
+    Feed it chunks as they arrive, it returns the events completed so far as (event, data, id) tuples.
+    Multi-line data fields are joined with newlines, comments and unknown fields are ignored.
+    """
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._event = None
+        self._data = []
+        self._id = None
+
+    def feed(self, chunk) -> list:
+        if isinstance(chunk, bytes):
+            # A multi-byte character may be split over two chunks
+            chunk = self._decoder.decode(chunk)
+        self._buffer += chunk
+        events = []
+        while True:
+            match = LINE_END.search(self._buffer)
+            # A trailing \r may still be followed by \n in the next chunk
+            if match is None or (match.group() == "\r" and match.end() == len(self._buffer)):
+                return events
+            line = self._buffer[:match.start()]
+            self._buffer = self._buffer[match.end():]
+            event = self._feed_line(line)
+            if event is not None:
+                events.append(event)
+
+    def _feed_line(self, line: str):
+        if line == "":
+            if not self._data:
+                self._event = None
+                return None
+            event = (self._event or "message", "\n".join(self._data), self._id)
+            self._event = None
+            self._data = []
+            return event
+        if line.startswith(":"):
+            return None
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "data":
+            self._data.append(value)
+        elif field == "event":
+            self._event = value
+        elif field == "id":
+            self._id = value
+        return None
+
+    def close(self):
+        """
+        Flushes an event that was not terminated by a blank line.
+        """
+        events = self.feed("\n") if self._buffer else []
+        event = self._feed_line("")
+        if event is not None:
+            events.append(event)
+        return events
+
+
+class MCPError(Exception):
+    def __init__(self, message: str, response_text: str = ""):
+        super().__init__(message)
+        self.response_text = response_text
+
+
+class MCPTransport:
+    """
+    Blocking MCP streamable HTTP client shared by the agents.
+    - One pooled keep-alive requests.Session, safe to use from several threads at once
+    - The MCP session is initialized lazily and re-initialized when the server forgets it
+    - Request ids increase monotonically, so concurrent calls can be told apart
+    - Responses are parsed incrementally, JSON and SSE (single or multiple events) are both handled
+    """
+    def __init__(self, url: str, timeout: float = 60, pool_maxsize: int = 16):
+        self.url = url
+        self.timeout = timeout
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        self.http.mount("http://", adapter)
+        self.http.mount("https://", adapter)
+        self.http.headers.update({"Accept": ACCEPT_HEADER, "Content-Type": "application/json"})
+        self.session_id = None
+        self._ids = itertools.count(1)
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def next_id(self) -> int:
+        # next() on itertools.count is atomic under the GIL
+        return next(self._ids)
+
+    def _headers(self) -> dict:
+        return {"mcp-session-id": self.session_id} if self.session_id else {}
+
+    def initialize(self):
+        with self._init_lock:
+            if self._initialized:
+                return
+            self.session_id = None
+            payload = {
+                "jsonrpc": "2.0",
+                "id": self.next_id(),
+                "method": "initialize",
+                "params": {
+                    "protocolVersion": MCP_PROTOCOL_VERSION,
+                    "capabilities": {},
+                    "clientInfo": {"name": "icron-agent", "version": "1.0"},
+                },
+            }
+            resp = self.http.post(self.url, data=dumpb(payload), stream=True, timeout=self.timeout)
+            self.session_id = resp.headers.get("mcp-session-id")
+            self._read_response(resp, payload["id"])
+            notification = {"jsonrpc": "2.0", "method": "notifications/initialized"}
+            self.http.post(self.url, data=dumpb(notification), headers=self._headers(), timeout=self.timeout).close()
+            self._initialized = True
+
+    def _read_response(self, resp, request_id: int) -> dict:
+        """
+        Returns the JSON-RPC message answering request_id, notifications sent before it are skipped.
+        """
+        with resp:
+            if resp.status_code >= 400:
+                raise MCPError(f"HTTP {resp.status_code} from MCP server", resp.text)
+            content_type = resp.headers.get("content-type", "")
+            if not content_type.startswith("text/event-stream"):
+                return loads(resp.content)
+            parser = SSEParser()
+            for chunk in resp.iter_content(chunk_size=None):
+                for event, data, _ in parser.feed(chunk):
+                    message = self._match(event, data, request_id)
+                    if message is not None:
+                        return message
+            for event, data, _ in parser.close():
+                message = self._match(event, data, request_id)
+                if message is not None:
+                    return message
+        raise MCPError(f"MCP server closed the stream without answering request {request_id}")
+
+    @staticmethod
+    def _match(event: str, data: str, request_id: int):
+        if event != "message" or not data:
+            return None
+        message = loads(data)
+        if isinstance(message, dict) and message.get("id") == request_id:
+            return message
+        return None
+
+    def request(self, method: str, params: dict = None) -> dict:
+        """
+        Sends a JSON-RPC request and returns the raw response message.
+        """
+        if not self._initialized:
+            self.initialize()
+        for attempt in range(2):
+            payload = {"jsonrpc": "2.0", "id": self.next_id(), "method": method, "params": params or {}}
+            resp = self.http.post(self.url, data=dumpb(payload), headers=self._headers(), stream=True, timeout=self.timeout)
+            # 404 means the server dropped our session (e.g. it restarted), start a new one and retry once.
+            # Any other error is returned as is, the request may already have run (a tool call must not run twice)
+            if resp.status_code == 404 and self.session_id and attempt == 0:
+                resp.close()
+                with self._init_lock:
+                    self._initialized = False
+                self.initialize()
+                continue
+            return self._read_response(resp, payload["id"])
+
+    def call_tool(self, tool_name: str, arguments: dict):
+        """
+        Calls an MCP tool, returns the JSON-RPC result (or the error message when there is none).
+        """
+        message = self.request("tools/call", {"name": tool_name, "arguments": arguments})
+        if isinstance(message, dict) and "result" in message:
+            return message["result"]
+        return message
+
+    def close(self):
+        if self.session_id:
+            try:
+                self.http.delete(self.url, headers=self._headers(), timeout=self.timeout).close()
+            except requests.RequestException:
+                pass
+        self.http.close()
+
+
+_transports = {}
+_transports_lock = threading.Lock()
+
+def get_mcp_transport(url: str) -> MCPTransport:
+    """
+    Returns the process wide transport of the given MCP server URL.
+    """
+    transport = _transports.get(url)
+    if transport is None:
+        with _transports_lock:
+            transport = _transports.get(url)
+            if transport is None:
+                transport = _transports[url] = MCPTransport(url)
+    return transport
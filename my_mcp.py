@@ -1,20 +1,29 @@
-
 from fastmcp import FastMCP
 from datetime import datetime
 from openai import OpenAI
 from postgrest import APIError
 import pytz
-import json
 import requests
-import base64
 from dotenv import load_dotenv
 import os
 import traceback
 import asyncio
-from supabase import create_client
+from db_access import get_data_access
+from gmail_api import gmail_post, post_batch, build_raw_message, MailMessage, aclose_http_client
+from tool_executor import run_in_thread
+from idep_watcher import IdepReloader
+from result_cache import ResultCacheMiddleware
+from coalescing import CoalescingMiddleware
+from result_shaping import ResultShapingMiddleware, CursorError
+from serialization import dumps, loads, tool_result
+from tracing import TracingMiddleware
+from r_pool import RWorkerPool
+from bulk_extract import BulkExtractor, BulkQueryError, DEFAULT_PAGE_SIZE
+from mb_rpc import make_rpc_client
+import employee_queries
 from fastmcp.server.dependencies import get_http_headers, get_http_request
 from fastmcp.server.middleware import Middleware, MiddlewareContext
-from fastmcp.tools.tool import FunctionTool
+from fastmcp.tools.tool import FunctionTool, ToolResult
 from fastmcp.tools.tool import Tool
 from datetime import datetime
 from fastmcp.resources import FileResource
@@ -22,21 +31,10 @@ from pathlib import Path
 from fastapi.middleware.cors import CORSMiddleware
 load_dotenv()
 
-class LoggingMiddleware(Middleware):
-    async def on_call_tool(self, context: MiddlewareContext, call_next):
-        print("====== MCP TOOL CALL ======")
-        #print("Tool Context \n", context)
-        print("TOOL NAME IS :", context.message.name)
-        print("TOOL ARGUMENTS ARE :", context.message.arguments)
-        print("===========================")
-        result = await call_next(context)
-        return result
-
-
 # Helper Functions
 def get_message_json(tool_name, **kwargs):
     # TODO: Implement this
-    return json.dumps(kwargs)
+    return dumps(kwargs)
 
 def external_function_call(tool_name, json_msg):
     # TODO: Implement this
@@ -44,128 +42,65 @@ def external_function_call(tool_name, json_msg):
 
 def get_data_message(table_name, **kwargs):
     # TODO: Implement this
-    return json.dumps(kwargs)
+    return dumps(kwargs)
 
 def external_data_extract_call(table_name, json_msg):
     # TODO: Implement this
     return {"result": json_msg}
 
-def param_to_python_type(param_type: str) -> str:
-    if param_type == "string" or param_type == "text":
-        return "str"
-    elif param_type == "integer":
-        return "int"
-    elif param_type == "boolean":
-        return "bool"
-    elif param_type == "list" or param_type == "array":
-        return "list"
-    elif param_type == "dictionary":
-        return "dict"
-    elif param_type == "float" or param_type == "real":
-        return "float"
-    else:
-        return param_type
-
-def register_tools_from_idep(mcp: FastMCP, idep_file: str):
-    """
-    Registers the tools from the IDEP file.
-    """
-    with open(idep_file, "r") as file:
-        function_jsons = json.load(file).get("LLMTools", {}).get("Functions", {})
-    for tool_name, tool_json in function_jsons.items():
-
-        tool_description = tool_json.get("description", "")
-        tool_params = tool_json.get("params", {})
-        tool_returns = tool_json.get("returns", {})
-        tool_constants = tool_json.get("constants", {})
-
-
-        # Generate the function signature
-        param_strs = []
-        for param, typ in tool_params.items():
-            param_strs.append(f"{param}: {param_to_python_type(typ)}")
-
-        if tool_constants:
-            for param, typ in tool_constants.items():
-                param_strs.append(f"{param}: {param_to_python_type(typ)}")
-
-        param_sig = ", ".join(param_strs)
-        
-        # Generate the function code
-        function_code = f"""
-def {tool_name}({param_sig}):
-    \"\"\"{tool_description}\"\"\"
-    kwargs = locals()
-    json_msg = get_message_json('{tool_name}', **kwargs)
-    result = external_function_call('{tool_name}', json_msg)
-    return result
-        """
-        # Get the function executable
-        namespace = {"get_message_json": get_message_json, "external_function_call": external_function_call} # Generate a namespace
-        exec(function_code, namespace) # Save function definition to namespace
-        tool_func = namespace[tool_name] # Point to the function definition
+# Message broker RPC transport of the external calls, enabled with MB_TRANSPORT=rabbitmq (settings from MB_IDEP_FILE)
+rpc_client = make_rpc_client()
 
-        
-        output_schema = {
-            "type": "object",
-            "additionalProperties" : False,
-            "properties": {
-                # Filling this part dynamically
-                #...
-                #...
-            }
-            # "required": [] Used for non-default values
-            }
-        for param_name, param_type in tool_returns.items():
-            if param_type == "list" or param_type == "array":
-                output_schema["properties"][param_name] = {"type": "array"}
-            else:
-                output_schema["properties"][param_name] = {"type": param_type}
-        
-        # Register the tool
-        mcp.tool(tool_func, output_schema=output_schema)
-
-def register_resources_from_idep(mcp: FastMCP, idep_file: str):
+async def external_rpc_call(routing_name, json_msg, headers):
     """
-    Registers the resources from the IDEP file.
+    Publishes the message to the broker and awaits the correlated reply, no tool thread waits for it.
     """
-    with open(idep_file, "r") as file:
-        db_schemas = json.load(file).get("LLMTools", {}).get("DBSchemas", {})
-    for db_schema in db_schemas:
-        table_name, table_json = next(iter(db_schema.items()))
-        table_description : str = table_json.get("Description", "")
-        primary_keys : list[str] = table_json.get("PrimaryKeys", [])
-        fields : dict = table_json.get("Fields", {})
+    reply = await rpc_client.acall(rpc_client.routing_key(routing_name), json_msg, headers)
+    return loads(reply)
+
+async def call_idep_function(tool_name, kwargs):
+    json_msg = get_message_json(tool_name, **kwargs)
+    if rpc_client is not None:
+        return await external_rpc_call(tool_name, json_msg, {"RequestType": "Function", "Name": tool_name})
+    return await run_in_thread(external_function_call, tool_name, json_msg)
 
-        param_strs = []
-        for field_name, field_type in fields.items():
-            param_strs.append(f"{field_name}: {param_to_python_type(field_type)}")
+async def call_idep_data_extract(table_name, kwargs):
+    json_msg = get_data_message(table_name, **kwargs)
+    if rpc_client is not None:
+        return await external_rpc_call("ExtractData", json_msg, {"RequestType": "DataExtract", "Name": table_name})
+    return await run_in_thread(external_data_extract_call, table_name, json_msg)
 
-        param_sig = ", ".join(param_strs)
 
-        function_code = f"""
-def {table_name}({param_sig}):
-    \"\"\"{table_description}\"\"\"
-    kwargs = locals()
-    json_msg = get_data_message('{table_name}', **kwargs)
-    result = external_data_extract_call('{table_name}', json_msg)
-    return result
-        """
-        # Get the function executable
-        namespace = {"datetime": datetime, "get_data_message": get_data_message, "external_data_extract_call": external_data_extract_call} # Generate a namespace
-        exec(function_code, namespace) # Save function definition to namespace
-        resource_func = namespace[table_name] # Point to the function definition
+# Tools that do not return a tool_result (e.g. the IDEP tools) get their text content serialized compactly with orjson too
+mcp = FastMCP(name="Icron MCP Server", stateless_http=True, instructions="This is a simple MCP server that serves the Icron company.", tool_serializer=dumps)
 
-        uri_params = "/".join([f"{{{field}}}" for field in fields.keys()])
-        resource_uri = f"resource://{table_name}/{uri_params}"
+IDEP_FILE = "config/test_config.idep"
+idep_reloader = IdepReloader(mcp, IDEP_FILE, call_idep_function, call_idep_data_extract)
 
-        # Register the resource
-        mcp.resource(resource_uri)(resource_func)
+result_cache = ResultCacheMiddleware()
+idep_reloader.listeners.append(result_cache.on_idep_registry)
 
+# Only the read-only tools marked @coalescing.coalesced (and IDEP functions with "coalesce": true) are coalesced,
+# send_mail and the other side-effecting tools always run once per call
+coalescing = CoalescingMiddleware()
+idep_reloader.listeners.append(coalescing.on_idep_registry)
 
-mcp = FastMCP(name="Icron MCP Server", stateless_http=True, instructions="This is a simple MCP server that serves the Icron company.")
+# Results over their budget are paged before they reach the model, the full result is still what gets cached
+result_shaping = ResultShapingMiddleware()
+idep_reloader.listeners.append(result_shaping.on_idep_registry)
 
-mcp.add_middleware(LoggingMiddleware())
+tracing = TracingMiddleware()
+mcp.add_middleware(tracing)
+mcp.add_middleware(result_shaping)
+mcp.add_middleware(result_cache)
+mcp.add_middleware(coalescing)
+
+# R functions served by a pool of warm R processes, e.g. R_POOL_SCRIPTS=not_terminal_approach/test_tool.r R_POOL_FUNCTIONS=myfunc
+R_POOL_SCRIPTS = [script for script in os.getenv("R_POOL_SCRIPTS", "").split(os.pathsep) if script]
+R_POOL_FUNCTIONS = [name.strip() for name in os.getenv("R_POOL_FUNCTIONS", "").split(",") if name.strip()]
+r_pool = RWorkerPool(R_POOL_SCRIPTS) if R_POOL_FUNCTIONS else None
+for r_function in R_POOL_FUNCTIONS:
+    mcp.add_tool(r_pool.as_tool(r_function))
 
 
 path = Path("./info.txt").resolve()
@@ -183,7 +118,9 @@ if path.exists():
 
 
 @mcp.tool
-def get_date_time(timezone: str = "Europe/Istanbul") -> dict:
+@coalescing.coalesced
+@result_cache.cached(ttl=1)
+async def get_date_time(timezone: str = "Europe/Istanbul") -> ToolResult:
     """
    
     Gets the current date and time in a given timezone. \n
@@ -196,17 +133,15 @@ def get_date_time(timezone: str = "Europe/Istanbul") -> dict:
     try:
         tz = pytz.timezone(timezone)
         now = datetime.now(tz)
-        return {
-            "result" : json.dumps({
-                "datetime": now.strftime("%Y-%m-%d %H:%M:%S"),
-                "timezone": now.strftime("%Z")
-            })
-        }
+        return tool_result({
+            "datetime": now.strftime("%Y-%m-%d %H:%M:%S"),
+            "timezone": now.strftime("%Z")
+        })
     except pytz.UnknownTimeZoneError:
-        return {"result": json.dumps({"error": f"Unknown timezone: {timezone}"})}
+        return tool_result({"error": f"Unknown timezone: {timezone}"})
 
 @mcp.tool
-def draft_mail(to: str, subject: str, body: str, cc: str = "", bcc: str = "") -> dict:
+async def draft_mail(to: str, subject: str, body: str, cc: str = "", bcc: str = "") -> ToolResult:
     """
     Generates a draft email. \n
     Args:
@@ -219,71 +154,29 @@ def draft_mail(to: str, subject: str, body: str, cc: str = "", bcc: str = "") ->
         The draft email as a JSON object.
     """
     try:
-        token_res = requests.post(
-            url = "https://oauth2.googleapis.com/token",
-            data = {
-                "client_id": os.getenv("CLIENT_ID"),
-                "client_secret": os.getenv("CLIENT_SECRET"),
-                "grant_type": "refresh_token",
-                "refresh_token": os.getenv("REFRESH_TOKEN") 
-            },
-            headers = {
-                "Content-Type": "application/x-www-form-urlencoded"
+        raw_b64 = build_raw_message(to, subject, body, cc, bcc)
+
+        draft_res = await gmail_post("drafts", {
+            "message": {
+                "raw": raw_b64
             }
-        )
-        if not token_res.ok:
-            raise Exception("Failed to refresh token")
-        
-        access_token = token_res.json().get("access_token")
-        if not access_token:
-            raise Exception("Failed to get access token")
-        
-        lines = [
-            f"To: {to}",
-            f"Cc: {cc}" if cc else "",
-            f"Bcc: {bcc}" if bcc else "",
-            f"Subject: {subject}",
-            "",
-            body
-        ]
-        # Filter out empty lines
-        filtered_lines = list(filter(bool, lines))
-        joined_lines = "\r\n".join(filtered_lines)
-
-        # Encode Base64
-        raw_bytes = joined_lines.encode("utf-8")
-        raw_b64 = base64.urlsafe_b64encode(raw_bytes).decode("utf-8").rstrip("=")
-
-        draft_res = requests.post(
-            url = "https://gmail.googleapis.com/gmail/v1/users/me/drafts",
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-                "Content-Type": "application/json"
-            },
-            data = json.dumps({
-                "message": {
-                    "raw": raw_b64
-                }
-            })
-        )
-        if not draft_res.ok:
+        })
+        if not draft_res.is_success:
             raise Exception(f"Failed to generate draft email, Status Code: {draft_res.status_code}, Response: {draft_res.text}")
         
-        return {
-            "result" : json.dumps({
-                "To": to,
-                "Subject": subject,
-                "Body": body,
-                "DraftId": draft_res.json()["id"]
-            })
-        }
+        return tool_result({
+            "To": to,
+            "Subject": subject,
+            "Body": body,
+            "DraftId": draft_res.json()["id"]
+        })
 
     except Exception as e:
         traceback.print_exc()
-        return {"result": json.dumps({"error": f"Error generating draft email: {e}"})}
+        return tool_result({"error": f"Error generating draft email: {e}"})
 
 @mcp.tool
-def send_mail(to: str, subject: str, body: str, cc: str = "", bcc: str = "") -> dict:
+async def send_mail(to: str, subject: str, body: str, cc: str = "", bcc: str = "") -> ToolResult:
     """
     Sends an email using the Gmail API.\n
     Args:
@@ -296,73 +189,81 @@ def send_mail(to: str, subject: str, body: str, cc: str = "", bcc: str = "") ->
         The sent email info as a JSON object.
     """
     try:
-        headers = get_http_headers()
-        print(headers)
-        token_res = requests.post(
-            url = "https://oauth2.googleapis.com/token",
-            data = {
-                "client_id": os.getenv("CLIENT_ID"),
-                "client_secret": os.getenv("CLIENT_SECRET"),
-                "grant_type": "refresh_token",
-                "refresh_token": os.getenv("REFRESH_TOKEN") 
-            },
-            headers = {
-                "Content-Type": "application/x-www-form-urlencoded"
-            }
-        )
-        if not token_res.ok:
-            raise Exception("Failed to refresh token")
-        
-        access_token = token_res.json().get("access_token")
-        if not access_token:
-            raise Exception("Failed to get access token")
-        
-        lines = [
-            f"To: {to}",
-            f"Cc: {cc}" if cc else "",
-            f"Bcc: {bcc}" if bcc else "",
-            f"Subject: {subject}",
-            "",
-            body
-        ]
-        # Filter out empty lines
-        filtered_lines = list(filter(bool, lines))
-        joined_lines = "\r\n".join(filtered_lines)
-
-        # Encode Base64
-        raw_bytes = joined_lines.encode("utf-8")
-        raw_b64 = base64.urlsafe_b64encode(raw_bytes).decode("utf-8").rstrip("=")
-
-        send_res = requests.post(
-            url = "https://gmail.googleapis.com/gmail/v1/users/me/messages/send",
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-                "Content-Type": "application/json"
-            },
-            data = json.dumps({
-                    "raw": raw_b64
-            })
-        )
-        if not send_res.ok:
+        raw_b64 = build_raw_message(to, subject, body, cc, bcc)
+
+        send_res = await gmail_post("messages/send", {
+            "raw": raw_b64
+        })
+        if not send_res.is_success:
             raise Exception(f"Failed to send email, Status Code: {send_res.status_code}, Response: {send_res.text}")
         
-        return {
-            "result" : json.dumps({
-                "To": to,
-                "Subject": subject,
-                "Body": body,
-                "MessageId": send_res.json()["id"]
-            })
-        }
+        return tool_result({
+            "To": to,
+            "Subject": subject,
+            "Body": body,
+            "MessageId": send_res.json()["id"]
+        })
 
     except Exception as e:
         traceback.print_exc()
-        return {"result": json.dumps({"error": f"Error sending email: {e}"})}
+        return tool_result({"error": f"Error sending email: {e}"})
+
+def batch_results(pairs, id_key: str) -> dict:
+    """
+    Turns post_batch output into per-message results.
+    """
+    results = []
+    for index, (message, res) in enumerate(pairs):
+        item = {"Index": index, "To": message.get("to"), "Subject": message.get("subject")}
+        if isinstance(res, Exception):
+            item["error"] = str(res)
+        elif not res.is_success:
+            item["error"] = f"Status Code: {res.status_code}, Response: {res.text}"
+        else:
+            item[id_key] = res.json()["id"]
+        results.append(item)
+    failed = sum(1 for item in results if "error" in item)
+    return {"succeeded": len(results) - failed, "failed": failed, "results": results}
+
+@mcp.tool
+async def draft_mail_batch(messages: list[MailMessage]) -> ToolResult:
+    """
+    Generates multiple draft emails in one call. \n
+    Args:
+        messages: The emails to draft, each with to, subject, body and optionally cc and bcc
+    Returns:
+        The draft id or error of every email, in the given order, as a JSON object.
+    """
+    try:
+        pairs = await post_batch("drafts", messages, lambda raw_b64: {"message": {"raw": raw_b64}})
+        return tool_result(batch_results(pairs, "DraftId"))
+    except Exception as e:
+        traceback.print_exc()
+        return tool_result({"error": f"Error generating draft emails: {e}"})
 
 @mcp.tool
-def get_employees(full_name: str = "", department: str = "", gender: str = "", office: str = "", rank: str = "", office_days: list = [], only_count: bool = False, requested_info: list = ["name", "department", "gender", "office", "rank", "monday", "tuesday", "wednesday", "thursday", "friday"]) -> dict:
+async def send_mail_batch(messages: list[MailMessage]) -> ToolResult:
+    """
+    Sends multiple emails using the Gmail API in one call. Use this instead of calling send_mail repeatedly. \n
+    Args:
+        messages: The emails to send, each with to, subject, body and optionally cc and bcc
+    Returns:
+        The message id or error of every email, in the given order, as a JSON object.
+    """
+    try:
+        pairs = await post_batch("messages/send", messages, lambda raw_b64: {"raw": raw_b64})
+        return tool_result(batch_results(pairs, "MessageId"))
+    except Exception as e:
+        traceback.print_exc()
+        return tool_result({"error": f"Error sending emails: {e}"})
+
+@mcp.tool
+@coalescing.coalesced
+@result_cache.cached(ttl=60)
+async def get_employees(full_name: str = "", department: str = "", gender: str = "", office: str = "", rank: str = "", office_days: list = [], only_count: bool = False, requested_info: list = ["name", "department", "gender", "office", "rank", "monday", "tuesday", "wednesday", "thursday", "friday"], group_by: str = "", aggregate: str = "", limit: int = 100, offset: int = 0) -> ToolResult:
     """
     Get the employees in the company. Optionally filters by department, gender, office, rank, and day of the week.
+    Counting and grouping are done by the database, use them instead of listing employees to answer "how many" questions.
     Args:
         full_name: The **full name** of the employee (e.g., "Tarık Sağbaş"). 
         department: The department of the employee
@@ -372,61 +273,136 @@ def get_employees(full_name: str = "", department: str = "", gender: str = "", o
         office_days: The days of the week the employee works in the office (Monday, Tuesday, Wednesday, Thursday, Friday)
         requested_info: The information to be returned about the employees (name, department, gender, office, rank, monday, tuesday, wednesday, thursday, friday)
         only_count: Whether to return only the count of the employees or the employees with their attributes (True/False)
+        group_by: Count the employees per department, gender, office or rank instead of listing them
+        aggregate: "count" (number of employees, per group_by value if given), "distinct" (the values of group_by)
+            or "office_days" (number of employees in the office on each day, per group_by value if given)
+        limit: The maximum number of employees returned (1-1000), the rest is fetched with offset
+        offset: The number of employees to skip, next_offset of the previous result
     Returns:
-        The employees with their attributes as a JSON object.
+        The count, the groups, or a page of employees ({"count", "employees": [...], "next_offset"}) as a JSON object.
     """
     try:
-        SUPABASE_URL = os.getenv("SUPABASE_URL")
-        SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
-        if not SUPABASE_URL or not SUPABASE_ANON_KEY:
-            raise Exception("Missing SUPABASE_URL or SUPABASE_ANON_KEY in environment variables.")
-        
-        supabase = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
-        
-        selected_columns = ", ".join(info.strip() for info in requested_info)
-        query = supabase.table("employees").select(selected_columns, count="exact")
-
-        if full_name:
-            query = query.eq("name", full_name.title().strip())
-        if department:
-            query = query.eq("department", department.capitalize())
-        if gender:
-            query = query.eq("gender", gender.capitalize())
-        if office:
-            query = query.eq("office", office.capitalize())
-        if rank:
-            query = query.eq("rank", rank.capitalize())
-        if office_days:
-            for day in office_days:
-                query = query.eq(day.strip().lower(), True)
-        
-        
+        filters = employee_queries.employee_filters(full_name, department, gender, office, rank, office_days)
+        if group_by:
+            group_by = employee_queries.check_columns([group_by], employee_queries.GROUP_COLUMNS)[0]
+        aggregate = aggregate.strip().lower() or ("count" if only_count or group_by else "")
+
         try:
-            response = query.execute()
-            
+            if aggregate == "count" and group_by:
+                result = {"group_by": group_by, "counts": await employee_queries.group_counts(group_by, filters)}
+            elif aggregate == "count":
+                result = await employee_queries.count_employees(filters)
+            elif aggregate == "distinct":
+                if not group_by:
+                    raise ValueError("aggregate distinct needs group_by")
+                values = sorted(await employee_queries.group_counts(group_by, filters), key=lambda value: (value is None, str(value)))
+                result = {"group_by": group_by, "values": values, "count": len(values)}
+            elif aggregate == "office_days":
+                result = await employee_queries.office_day_counts(filters, group_by)
+            elif aggregate:
+                raise ValueError(f"Unknown aggregate {aggregate}, use count, distinct or office_days")
+            else:
+                if not 1 <= limit <= employee_queries.MAX_PAGE_SIZE:
+                    raise ValueError(f"limit must be between 1 and {employee_queries.MAX_PAGE_SIZE}")
+                if offset < 0:
+                    raise ValueError("offset must not be negative")
+                columns = employee_queries.check_columns(requested_info or list(employee_queries.EMPLOYEE_COLUMNS))
+                result = await employee_queries.employee_page(columns, filters, limit, offset)
         except APIError as e:
             raise Exception(f"Supabase query failed: {e.message}")
 
-        if only_count:
-            try:
-                return {"result": json.dumps(response.count)}
-            except Exception as e:
-                print("ERROR IS :", e)
-                return {"result": json.dumps({"error": f"Error getting employees: {e}"})}
-        
-        employees = {"count": response.count}
-        for e in response.data:
-            employees[e["name"]] = {}
-            for info in requested_info:
-                employees[e["name"]][info] = e[info]
-
-        return {"result": json.dumps(employees)}
+        return tool_result(result)
     except Exception as e:
         traceback.print_exc()
-        return {"result": json.dumps({"error": f"Error getting employees: {e}"})}
+        return tool_result({"error": f"Error getting employees: {e}"})
+
+async def extract_table(table: str, columns: list[str] = None, filters: list[dict] = None, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None, format: str = "json") -> ToolResult:
+    """
+    Reads many rows of an IDEP table in one call, the result is column oriented: {"columns", "types", "data": {column: [values]}, "next_cursor"}.
+    Use this instead of reading the table's resources one row at a time.
+    - columns: the fields to return, all fields when empty
+    - filters: list of {"field", "op", "value"}, op is one of eq, ne, lt, le, gt, ge, in, not_in, contains. Dates use the format %Y-%m-%d %H:%M:%S
+    - limit: rows per page, at most 10000
+    - cursor: next_cursor of the previous page, with the same columns and filters
+    - format: "json", or "arrow" for a base64 Arrow IPC stream (when the server has pyarrow)
+    """
+    registry = idep_reloader.registry
+    spec = registry.resources.get(table) if registry else None
+    if spec is None:
+        tables = ", ".join(registry.resources) if registry else ""
+        return tool_result({"error": f"Unknown table {table}, the tables are: {tables}"})
+    extractor = BulkExtractor.from_resource_spec(spec)
+    try:
+        request = extractor.build_request(columns, filters, limit, cursor, format)
+        response = await external_rpc_call("ExtractData", dumps(request), {"RequestType": "BulkExtract", "Name": table})
+        page = extractor.page(response.get("Rows", []), request)
+    except BulkQueryError as e:
+        return tool_result({"error": str(e)})
+    return tool_result(page)
+
+# Bulk extraction is served by the broker only, without MB_TRANSPORT there is no data source to page, so no tool
+if rpc_client is not None:
+    mcp.tool(coalescing.coalesced(extract_table))
+
+@mcp.tool
+@coalescing.coalesced
+async def fetch_more(cursor: str) -> ToolResult:
+    """
+    Get the next page of a result that was too large to return at once.
+    Args:
+        cursor: The cursor of the previous page of the result
+    Returns:
+        The page, where it sits in the whole result, and the cursor of the next page (null on the last page) as a JSON object.
+    """
+    try:
+        return tool_result(result_shaping.fetch(cursor))
+    except CursorError as e:
+        return tool_result({"error": str(e)})
+
+@mcp.resource("stats://supabase", mime_type="application/json")
+def supabase_stats() -> str:
+    """
+    Per-operation Supabase latency counters (client setup vs. query time).
+    """
+    return dumps(get_data_access().stats.snapshot())
+
+@mcp.resource("stats://result_cache", mime_type="application/json")
+def result_cache_stats() -> str:
+    """
+    Hit/miss counters and size of the tool result cache.
+    """
+    return dumps(result_cache.cache.stats())
+
+@mcp.resource("stats://coalescing", mime_type="application/json")
+def coalescing_stats() -> str:
+    """
+    How many tool calls and resource reads were coalesced into an identical call already in flight.
+    """
+    return dumps(coalescing.stats())
+
+@mcp.resource("stats://result_shaping", mime_type="application/json")
+def result_shaping_stats() -> str:
+    """
+    How many tool results were paged, and the size of the cursor store.
+    """
+    return dumps(result_shaping.stats())
+
+@mcp.resource("stats://tool_latency", mime_type="application/json")
+def tool_latency_stats() -> str:
+    """
+    p50/p95/p99 latency of the recent calls of every tool, in milliseconds.
+    """
+    return dumps(tracing.recorder.latency_stats())
+
+@mcp.resource("stats://r_pool", mime_type="application/json")
+def r_pool_stats() -> str:
+    """
+    Worker, restart and call counters of the R worker pool.
+    """
+    return dumps(r_pool.stats() if r_pool is not None else {})
 
 #@mcp.tool
-def ask_programmer_agent(user_prompt: str) -> dict:
+def ask_programmer_agent(user_prompt: str) -> ToolResult:
     """
     Use this tool if you are not able to satisfy the user's request. This tool will prompt the programmer agent to help you.
     """
@@ -442,21 +418,27 @@ def ask_programmer_agent(user_prompt: str) -> dict:
             "Content-Type": "application/json"
         }
     )
-    return {"result": json.dumps("asd")}
+    return tool_result("asd")
 
 
-if __name__ == "__main__":
-    register_tools_from_idep(mcp, "config/test_config.idep")
-    register_resources_from_idep(mcp, "config/test_config.idep")
-    all_tools = asyncio.run(mcp.get_tools())
-    """
-    for t in all_tools:
-        print("*"*100)
-        print(t)
-        print("*"*100)
-        print(all_tools[t])
-        print("*"*100)
-    """
-    mcp.run(transport="http", port=8000, log_level="debug", host="0.0.0.0")
+async def main():
+    idep_reloader.load()
+    # Picks up IDEP changes without restarting the server
+    watcher = asyncio.create_task(idep_reloader.watch())
+    tracing.recorder.start()
+    try:
+        await mcp.run_async(transport="http", port=8000, log_level="debug", host="0.0.0.0")
+    finally:
+        watcher.cancel()
+        tracing.recorder.stop()
+        if r_pool is not None:
+            r_pool.stop()
+        if rpc_client is not None:
+            rpc_client.close()
+        await get_data_access().aclose()
+        await aclose_http_client()
 
 
+if __name__ == "__main__":
+    asyncio.run(main())
+
@@ -1,39 +1,26 @@
-import subprocess
-import threading
-import queue
+import os
+import sys
 
-class RSession:
-    def __init__(self, script_path):
-        # start R in “slave” mode (no prompts, no GUI)
-        self.proc = subprocess.Popen(
-            ["R", "--slave"],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            text=True,
-            bufsize=1
-        )
-        # load your R file once
-        self._run(f"source('{script_path}')")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from r_pool import RWorkerPool
 
-    def _run(self, cmd):
-        """Send one command and read exactly one line back."""
-        self.proc.stdin.write(cmd + "\n")
-        self.proc.stdin.flush()
-        return self.proc.stdout.readline().strip()
+class RSession:
+    def __init__(self, script_path, workers=1):
+        # warm R processes that source the R file once, see r_pool.RWorkerPool
+        self.pool = RWorkerPool([script_path], size=workers)
+        self.pool.start()
 
     def call(self, func_name, *args):
-        
-        arg_list = ",".join(map(repr, args))
-        return self._run(f"cat({func_name}({arg_list}), '\\n')")
+        # vectors come back one element per line, joined like cat() prints them
+        return " ".join(self.pool.call(func_name, *args).split("\n"))
 
     def close(self):
-        self.proc.stdin.write("q('no')\n")
-        self.proc.stdin.flush()
-        self.proc.wait()
+        self.pool.stop()
 
 # usage
 if __name__ == "__main__":
-    r = RSession("test_tool.r")     
-    print(r.call("myfunc", 21, 20, 40, 50)) 
-    print(r.call("myfunc", 10)) 
-    r.close()
\ No newline at end of file
+    r = RSession(os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_tool.r"))
+    print(r.call("myfunc", 21, 20, 40, 50))
+    print(r.call("myfunc", 10))
+    r.close()
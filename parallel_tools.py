@@ -0,0 +1,43 @@
+import os
+import asyncio
+from langchain_core.messages import ToolMessage
+from langgraph.prebuilt import ToolNode
+
+DEFAULT_TOOL_CONCURRENCY = int(os.getenv("MCP_TOOL_CONCURRENCY", "4"))
+DEFAULT_TOOL_TIMEOUT = float(os.getenv("MCP_TOOL_TIMEOUT", "30"))
+
+
+class ParallelToolNode(ToolNode):
+    """
+    ToolNode that runs the tool calls of one assistant turn concurrently.
+    - At most max_concurrency calls of a turn run at once
+    - A call that takes longer than timeout seconds is cancelled and answered with an error ToolMessage
+    - The ToolMessages come back in the order of the tool calls, whatever order the calls finish in
+    Only the async path (ainvoke / astream) is parallel, invoke runs the calls like ToolNode does.
+    """
+    def __init__(self, tools, max_concurrency: int = DEFAULT_TOOL_CONCURRENCY, timeout: float = DEFAULT_TOOL_TIMEOUT, **kwargs):
+        super().__init__(tools, **kwargs)
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+
+    async def _arun_limited(self, semaphore, call, input_type, config) -> ToolMessage:
+        async with semaphore:
+            try:
+                return await asyncio.wait_for(self._arun_one(call, input_type, config), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                return ToolMessage(
+                    content=f"Error: tool '{call['name']}' did not answer within {self.timeout:g} seconds",
+                    name=call["name"],
+                    tool_call_id=call["id"],
+                    status="error",
+                )
+
+    # Overrides ToolNode._afunc (langgraph-prebuilt 0.5.x), which gathers every call without a limit or timeout
+    async def _afunc(self, input, config, *, store=None):
+        tool_calls, input_type = self._parse_input(input, store)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        # gather returns the results in the order of tool_calls
+        outputs = await asyncio.gather(
+            *(self._arun_limited(semaphore, call, input_type, config) for call in tool_calls)
+        )
+        return self._combine_tool_outputs(outputs, input_type)
@@ -0,0 +1,369 @@
+import os
+import json
+import math
+import logging
+import time
+import base64
+import queue
+import socket
+import struct
+import secrets
+import threading
+import subprocess
+from tool_executor import run_in_thread
+from fastmcp.tools.tool import FunctionTool, ToolResult
+from serialization import tool_result
+
+R_WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "r_worker.R")
+DEFAULT_R_WORKERS = int(os.getenv("R_POOL_WORKERS", "2"))
+DEFAULT_R_TIMEOUT = float(os.getenv("R_POOL_TIMEOUT", "30"))
+
+STATUS_TEXT = 0
+STATUS_RAW = 1
+STATUS_ERROR = 2
+
+logger = logging.getLogger(__name__)
+
+
+class RError(Exception):
+    """
+    The R code of a call raised an error, the worker is still usable.
+    """
+
+
+class RWorkerError(Exception):
+    """
+    The worker process died or did not answer in time, it is restarted.
+    """
+
+
+def r_literal(value) -> str:
+    """
+    Python value -> R expression. Lists become vectors, dicts named lists.
+    """
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float) and not math.isfinite(value):
+        # repr gives inf / nan, which are plain names in R
+        return "NaN" if math.isnan(value) else ("Inf" if value > 0 else "-Inf")
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, str):
+        # JSON string escapes are valid R string escapes
+        return json.dumps(value)
+    if isinstance(value, (list, tuple)):
+        return "c(" + ", ".join(r_literal(item) for item in value) + ")"
+    if isinstance(value, dict):
+        return "list(" + ", ".join(f"{json.dumps(str(key))} = {r_literal(item)}" for key, item in value.items()) + ")"
+    raise TypeError(f"Cannot pass {type(value).__name__} to R")
+
+def r_call_code(func_name: str, *args, **kwargs) -> str:
+    arguments = [r_literal(arg) for arg in args] + [f"{json.dumps(key)} = {r_literal(value)}" for key, value in kwargs.items()]
+    return f"{func_name}({', '.join(arguments)})"
+
+
+class RWorker:
+    """
+    One warm `R --slave` process running r_worker.R, connected back to us over a localhost socket.
+    Requests and responses are length prefixed frames, so multi-line and binary results come through intact.
+    """
+    def __init__(self, scripts: list = (), start_timeout: float = 30.0, r_binary: str = "R"):
+        self.scripts = list(scripts)
+        self.start_timeout = start_timeout
+        self.r_binary = r_binary
+        self.proc = None
+        self.sock = None
+        self.calls = 0
+
+    def start(self):
+        token = secrets.token_hex(8)
+        with socket.create_server(("127.0.0.1", 0)) as server:
+            server.settimeout(self.start_timeout)
+            port = server.getsockname()[1]
+            self.proc = subprocess.Popen(
+                [self.r_binary, "--slave", "--no-save", "--no-restore", "-f", R_WORKER_SCRIPT, "--args", str(port), token],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+            )
+            try:
+                self.sock, _ = server.accept()
+            except socket.timeout:
+                self.kill()
+                raise RWorkerError(f"R worker did not connect within {self.start_timeout:g} seconds")
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.settimeout(self.start_timeout)
+        try:
+            status, payload = self._read_frame()
+        except (OSError, struct.error, RWorkerError) as e:
+            self.kill()
+            raise RWorkerError(f"R worker failed to start: {e}")
+        if status != STATUS_TEXT or payload.decode("utf-8") != token:
+            self.kill()
+            raise RWorkerError("Unexpected handshake from R worker")
+        # Scripts are sourced once per process, their functions stay loaded for every later call
+        for script in self.scripts:
+            self.request(f"invisible(source({json.dumps(os.path.abspath(script))}, chdir = TRUE))", self.start_timeout)
+
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None and self.sock is not None
+
+    def kill(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+        if self.proc is not None:
+            if self.proc.poll() is None:
+                self.proc.kill()
+            self.proc.wait()
+            self.proc = None
+
+    def close(self):
+        """
+        Closing the socket ends the R loop, the process is killed if it does not exit on its own.
+        """
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        if self.proc is not None:
+            try:
+                self.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+            self.proc = None
+
+    def _recv_exact(self, n: int) -> bytes:
+        buf = bytearray()
+        while len(buf) < n:
+            chunk = self.sock.recv(n - len(buf))
+            if not chunk:
+                raise RWorkerError("R worker closed the connection")
+            buf += chunk
+        return bytes(buf)
+
+    def _read_frame(self) -> tuple:
+        status, size = struct.unpack(">BI", self._recv_exact(5))
+        return status, self._recv_exact(size)
+
+    def request(self, code: str, timeout: float):
+        """
+        Evaluates code in the worker, returns str for text results and bytes for raw vectors.
+        Raises RError for R errors and RWorkerError (after killing the process) for crashes and timeouts.
+        """
+        payload = code.encode("utf-8")
+        try:
+            self.sock.settimeout(timeout)
+            self.sock.sendall(struct.pack(">I", len(payload)) + payload)
+            status, result = self._read_frame()
+        except socket.timeout:
+            self.kill()
+            raise RWorkerError(f"R call did not answer within {timeout:g} seconds")
+        except (OSError, struct.error, RWorkerError) as e:
+            self.kill()
+            raise RWorkerError(f"R worker failed: {e}")
+        self.calls += 1
+        if status == STATUS_ERROR:
+            raise RError(result.decode("utf-8", errors="replace"))
+        if status == STATUS_RAW:
+            return result
+        return result.decode("utf-8")
+
+
+class RWorkerPool:
+    """
+    N warm R workers that share the sourced scripts.
+    - A call takes an idle worker, so concurrent callers never share a process
+    - Every call has a timeout, a worker that times out or crashes is killed and started again
+    - Workers are started on the first call, so importing this module does not need R
+    """
+    def __init__(self, scripts: list = (), size: int = DEFAULT_R_WORKERS, timeout: float = DEFAULT_R_TIMEOUT, r_binary: str = "R"):
+        self.scripts = list(scripts)
+        self.size = size
+        self.timeout = timeout
+        self.r_binary = r_binary
+        self.restarts = 0
+        self.workers = []
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+
+    def _new_worker(self) -> RWorker:
+        return RWorker(self.scripts, r_binary=self.r_binary)
+
+    def start(self):
+        with self._lock:
+            if self.workers:
+                return
+            for _ in range(self.size):
+                worker = self._new_worker()
+                worker.start()
+                self.workers.append(worker)
+                self._idle.put(worker)
+
+    def stop(self):
+        with self._lock:
+            for worker in self.workers:
+                worker.close()
+            self.workers = []
+            self._idle = queue.Queue()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _restart(self, worker: RWorker):
+        worker.kill()
+        try:
+            worker.start()
+            self.restarts += 1
+        except Exception as e:
+            logger.error("Restarting R worker failed: %s", e)
+            worker.kill()
+
+    def run(self, code: str, timeout: float = None):
+        """
+        Evaluates R code on an idle worker and returns its value (see RWorker.request).
+        """
+        if not self.workers:
+            self.start()
+        timeout = self.timeout if timeout is None else timeout
+        idle = self._idle
+        try:
+            worker = idle.get(timeout=timeout)
+        except queue.Empty:
+            raise RWorkerError(f"No idle R worker within {timeout:g} seconds")
+        try:
+            if not worker.alive():
+                self._restart(worker)
+                if not worker.alive():
+                    raise RWorkerError("R worker is down and could not be restarted")
+            try:
+                return worker.request(code, timeout)
+            except RWorkerError:
+                self._restart(worker)
+                raise
+        finally:
+            idle.put(worker)
+
+    def call(self, func_name: str, *args, timeout: float = None, **kwargs):
+        """
+        Calls an R function with Python arguments, e.g. pool.call("myfunc", 21, 20).
+        """
+        return self.run(r_call_code(func_name, *args, **kwargs), timeout)
+
+    def output(self, code: str, timeout: float = None) -> str:
+        """
+        Console output of R code, as it would be printed in an R session.
+        """
+        return self.run(f"paste(capture.output({{\n{code}\n}}), collapse = \"\\n\")", timeout)
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self.workers),
+            "idle": self._idle.qsize(),
+            "alive": sum(worker.alive() for worker in self.workers),
+            "restarts": self.restarts,
+            "calls": sum(worker.calls for worker in self.workers),
+        }
+
+    def as_tool(self, func_name: str, description: str = None, timeout: float = None) -> FunctionTool:
+        """
+        MCP tool that calls the R function func_name on the pool with a list of positional args.
+        """
+        async def r_tool(args: list = []) -> ToolResult:
+            try:
+                result = await run_in_thread(self.call, func_name, *args, timeout=timeout)
+            except (RError, RWorkerError, TypeError) as e:
+                return tool_result({"error": f"Error calling R function {func_name}: {e}"})
+            except FileNotFoundError:
+                # Popen of the first worker, R is not installed or not on the PATH
+                return tool_result({"error": f"Error calling R function {func_name}: the R binary {self.r_binary!r} was not found"})
+            if isinstance(result, bytes):
+                return tool_result({"base64": base64.b64encode(result).decode("ascii")})
+            return tool_result(result.split("\n") if result else [])
+        return FunctionTool.from_function(
+            r_tool,
+            name=func_name,
+            description=description or f"Calls the R function {func_name} with the given positional arguments.",
+        )
+
+
+def r_script_code(script: str, args: list) -> str:
+    """
+    R code that runs script like `Rscript script args...` would and returns its stdout as a raw vector.
+    commandArgs() is shadowed for the script, so it sees args instead of the worker's own arguments.
+    """
+    args_literal = "c(" + ", ".join(json.dumps(str(arg)) for arg in args) + ")" if args else "character(0)"
+    return f"""local({{
+    commandArgs <- function(trailingOnly = FALSE) if (trailingOnly) {args_literal} else c("R", "--args", {args_literal})
+    out <- rawConnection(raw(0), "w")
+    value <- raw(0)
+    sink(out)
+    tryCatch(
+        source({json.dumps(os.path.abspath(script))}, local = environment(), print.eval = TRUE),
+        finally = {{
+            sink()
+            value <- rawConnectionValue(out)
+            close(out)
+        }}
+    )
+    value
+}})"""
+
+
+class RScriptRunner:
+    """
+    Runs an R script with command line arguments and returns its stdout, like `Rscript script args...`.
+    - "persistent" mode runs the script in a long-running R worker, packages the script loads stay loaded between calls
+    - "spawn" mode starts Rscript for every call
+    A persistent call that fails because of the worker (not the script) is run with Rscript instead,
+    and the worker is left alone for retry_interval seconds.
+    """
+    def __init__(self, script: str, mode: str = None, pool: RWorkerPool = None, rscript: str = "Rscript", timeout: float = DEFAULT_R_TIMEOUT, retry_interval: float = 60.0):
+        self.script = script
+        self.mode = mode or os.getenv("R_TOOL_MODE", "persistent")
+        self.pool = pool
+        self.rscript = rscript
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.fallbacks = 0
+        self._failed_at = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> RWorkerPool:
+        if self.pool is None:
+            with self._lock:
+                if self.pool is None:
+                    self.pool = RWorkerPool(size=1, timeout=self.timeout)
+        return self.pool
+
+    def spawn(self, *args) -> str:
+        out = subprocess.run([self.rscript, self.script, *map(str, args)], capture_output=True, text=True, check=True, timeout=self.timeout)
+        return out.stdout
+
+    def persistent(self, *args) -> str:
+        return self._get_pool().run(r_script_code(self.script, args)).decode("utf-8")
+
+    def __call__(self, *args) -> str:
+        if self.mode != "persistent" or (self._failed_at is not None and time.monotonic() - self._failed_at < self.retry_interval):
+            return self.spawn(*args)
+        try:
+            result = self.persistent(*args)
+            self._failed_at = None
+            return result
+        except (RWorkerError, OSError) as e:
+            logger.warning("Persistent R worker failed (%s), running %s with %s", e, self.script, self.rscript)
+            self._failed_at = time.monotonic()
+            self.fallbacks += 1
+            return self.spawn(*args)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.stop()
@@ -0,0 +1,196 @@
+import time
+import threading
+from collections import OrderedDict
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+from serialization import dumps, is_error_result, EncodedToolResult
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# IDEP tables are read-only, their resources are cached unless the table sets "CacheTTL": 0
+DEFAULT_RESOURCE_TTL = 60.0
+
+
+def canonical_key(name: str, arguments: dict) -> str:
+    """
+    Cache key of a call, identical for argument dicts that only differ in key order.
+    """
+    return f"{name}:{dumps(arguments or {}, sort_keys=True)}"
+
+def resource_name(uri: str) -> str:
+    """
+    resource://SalesItem/a/b -> SalesItem
+    """
+    return uri.split("://", 1)[-1].split("/", 1)[0]
+
+def _resource_result_size(result) -> int:
+    return sum(len(item.content) for item in result) + 256
+
+
+class ResultCache:
+    """
+    Memory-bounded LRU cache with per-entry TTL.
+    Sizes are estimated from the serialized result, the least recently used entries are evicted past max_bytes.
+    """
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (name, expires_at, size, value)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[1] < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[3]
+
+    def set(self, key: str, name: str, value, ttl: float, size: int):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (name, time.monotonic() + ttl, size, value)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry[2]
+
+    def invalidate(self, name: str = None, arguments: dict = None) -> int:
+        """
+        Drops cached results and returns how many were dropped.
+        - no name: everything
+        - name: every result of that tool / resource
+        - name and arguments: the result of that single tool call
+        """
+        with self._lock:
+            if name is None:
+                count = len(self._entries)
+                self._entries.clear()
+                self._bytes = 0
+                return count
+            if arguments is not None:
+                key = canonical_key(name, arguments)
+                if key in self._entries:
+                    self._remove(key)
+                    return 1
+                return 0
+            keys = [key for key, entry in self._entries.items() if entry[0] == name]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+class ResultCacheMiddleware(Middleware):
+    """
+    Caches the results of read-only tools and resources.
+    A tool is only cached once it opted in, either with the @cached decorator / cache_tool,
+    or with "cache_ttl" in its IDEP function definition. IDEP tables are cached by default,
+    "CacheTTL" in the table definition overrides the TTL (0 opts out).
+    """
+    def __init__(self, cache: ResultCache = None, default_resource_ttl: float = DEFAULT_RESOURCE_TTL, keep_encoded: bool = True):
+        self.cache = cache or ResultCache()
+        self.default_resource_ttl = default_resource_ttl
+        # Tool results are cached as their encoded bytes (EncodedToolResult) instead of the ToolResult objects
+        self.keep_encoded = keep_encoded
+        self.tool_ttls = {}
+        self.resource_ttls = {}
+        self._idep_tool_ttls = {}
+        self._idep_resource_ttls = {}
+
+    def cache_tool(self, name: str, ttl: float):
+        """
+        Opts a tool in (ttl > 0) or out (ttl = 0) of caching.
+        """
+        self.tool_ttls[name] = ttl
+
+    def cached(self, ttl: float):
+        """
+        Decorator form of cache_tool, place it under @mcp.tool.
+        """
+        def decorator(func):
+            self.cache_tool(func.__name__, ttl)
+            return func
+        return decorator
+
+    def on_idep_registry(self, registry, diff: dict = None):
+        """
+        Picks up the cache settings of the IDEP file, on a reload drops the results of changed entries.
+        """
+        self._idep_tool_ttls = {name: spec["idep"]["cache_ttl"] for name, spec in registry.tools.items() if "cache_ttl" in spec["idep"]}
+        self._idep_resource_ttls = {name: spec["idep"]["CacheTTL"] for name, spec in registry.resources.items() if "CacheTTL" in spec["idep"]}
+        if diff:
+            for kind in ("tools", "resources"):
+                for name in diff[kind]["updated"] + diff[kind]["removed"]:
+                    self.cache.invalidate(name)
+
+    def tool_ttl(self, name: str) -> float:
+        if name in self.tool_ttls:
+            return self.tool_ttls[name]
+        return self._idep_tool_ttls.get(name, 0)
+
+    def resource_ttl(self, name: str) -> float:
+        if name in self.resource_ttls:
+            return self.resource_ttls[name]
+        return self._idep_resource_ttls.get(name, self.default_resource_ttl)
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        name = context.message.name
+        ttl = self.tool_ttl(name)
+        if not ttl:
+            return await call_next(context)
+
+        key = canonical_key(name, context.message.arguments)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached.to_tool_result() if isinstance(cached, EncodedToolResult) else cached
+        result = await call_next(context)
+        # Tools report failures as {"result": {"error": ...}}, those are never cached
+        if not is_error_result(result):
+            encoded = EncodedToolResult(result)
+            self.cache.set(key, name, encoded if self.keep_encoded else result, ttl, encoded.size + 256)
+        return result
+
+    async def on_read_resource(self, context: MiddlewareContext, call_next):
+        uri = str(context.message.uri)
+        if not uri.startswith("resource://"):
+            return await call_next(context)
+        name = resource_name(uri)
+        ttl = self.resource_ttl(name)
+        if not ttl:
+            return await call_next(context)
+
+        key = f"{name}:{uri}"
+        result = self.cache.get(key)
+        if result is not None:
+            return result
+        result = await call_next(context)
+        self.cache.set(key, name, result, ttl, _resource_result_size(result))
+        return result
@@ -0,0 +1,285 @@
+import os
+import time
+import secrets
+import threading
+from collections import OrderedDict
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+from serialization import dumpb, dumps, loads, tool_result, result_text
+
+# Largest encoded result (bytes) a tool returns to the model, bigger results are paged (0 turns paging off)
+DEFAULT_MAX_BYTES = int(os.getenv("RESULT_MAX_BYTES", "24000"))
+# Rough bytes per token of JSON for the tokenizers we use, for budgets given in tokens
+BYTES_PER_TOKEN = 4
+CURSOR_TTL = float(os.getenv("RESULT_CURSOR_TTL", "600"))
+CURSOR_MAX_ENTRIES = int(os.getenv("RESULT_CURSOR_MAX_ENTRIES", "1000"))
+CURSOR_MAX_BYTES = int(os.getenv("RESULT_CURSOR_MAX_BYTES", str(64 * 1024 * 1024)))
+# Room left in every page for the summary and cursor around the items
+PAGE_OVERHEAD = 400
+
+
+class CursorError(ValueError):
+    """
+    The cursor passed to fetch_more is malformed, unknown or expired.
+    """
+
+
+def _size(value) -> int:
+    return len(dumpb(value))
+
+def split_text(text: str, max_bytes: int) -> list:
+    """
+    Chunks of text that are at most max_bytes once JSON encoded.
+    """
+    chunks = []
+    start = 0
+    while start < len(text):
+        step = max_bytes
+        chunk = text[start:start + step]
+        # Escapes grow a character up to 6 bytes, shrink the chunk in proportion until it fits
+        while step > 1 and _size(chunk) > max_bytes:
+            step = max(min(step - 1, step * max_bytes // _size(chunk)), 1)
+            chunk = text[start:start + step]
+        chunks.append(chunk)
+        start += len(chunk)
+    return chunks or [""]
+
+def split_result(value, max_bytes: int) -> dict:
+    """
+    Splits a decoded tool result into pages of about max_bytes each.
+    Returns {"kind", "key", "envelope", "columns", "items", "pages"}, pages being the item index each page starts at:
+    - list: the items of the list
+    - field: the items of the longest list in a dict, the other keys (e.g. "count") are kept as the envelope
+    - columns: the rows of a dict of equally long lists in a dict (columnar data such as extract_table's "data")
+    - items: the (key, value) pairs of a dict without lists
+    - text: chunks of a string (or a result that is not JSON)
+    """
+    shape = {"kind": "text", "key": None, "envelope": None, "columns": None}
+    if isinstance(value, list):
+        shape["kind"], items = "list", value
+    elif isinstance(value, dict) and value:
+        lists = [(len(item), key) for key, item in value.items() if isinstance(item, list)]
+        tables = [
+            (len(next(iter(item.values()))), key) for key, item in value.items()
+            if isinstance(item, dict) and item and all(isinstance(column, list) for column in item.values())
+            and len({len(column) for column in item.values()}) == 1
+        ]
+        if lists and max(lists)[0] > max(tables, default=(0, None))[0]:
+            key = max(lists)[1]
+            shape.update(kind="field", key=key, envelope={name: item for name, item in value.items() if name != key})
+            items = value[key]
+        elif tables:
+            key = max(tables)[1]
+            columns = list(value[key])
+            shape.update(kind="columns", key=key, columns=columns, envelope={name: item for name, item in value.items() if name != key})
+            items = [list(row) for row in zip(*(value[key][column] for column in columns))]
+        else:
+            shape["kind"], items = "items", [list(pair) for pair in value.items()]
+    else:
+        items = split_text(value if isinstance(value, str) else dumps(value), max(max_bytes - PAGE_OVERHEAD, 256))
+
+    budget = max(max_bytes - PAGE_OVERHEAD - (_size(shape["envelope"]) if shape["envelope"] else 0), 1)
+    pages = [0]
+    used = 0
+    for index, item in enumerate(items):
+        size = _size(item) + 1
+        # A page holds at least one item, even one over the budget
+        if used and used + size > budget:
+            pages.append(index)
+            used = 0
+        used += size
+    shape["items"] = items
+    shape["pages"] = pages
+    return shape
+
+def page_value(shape: dict, page: int):
+    """
+    The value of one page, in the shape of the original result.
+    """
+    pages = shape["pages"]
+    end = pages[page + 1] if page + 1 < len(pages) else len(shape["items"])
+    items = shape["items"][pages[page]:end]
+    kind = shape["kind"]
+    if kind == "field":
+        return {**shape["envelope"], shape["key"]: items}
+    if kind == "columns":
+        columns = shape["columns"]
+        return {**shape["envelope"], shape["key"]: {column: [row[index] for row in items] for index, column in enumerate(columns)}}
+    if kind == "items":
+        return dict(items)
+    if kind == "text":
+        return "".join(items)
+    return items
+
+def summary(shape: dict, page: int) -> dict:
+    """
+    Where a page sits in the whole result.
+    """
+    pages = shape["pages"]
+    end = pages[page + 1] if page + 1 < len(pages) else len(shape["items"])
+    result = {
+        "tool": shape["tool"],
+        "page": page + 1,
+        "pages": len(pages),
+        "total_items": len(shape["items"]),
+        "items": f"{pages[page]}-{end - 1}" if end > pages[page] else "",
+    }
+    if shape["key"]:
+        result["paged_field"] = shape["key"]
+    if shape["kind"] == "text":
+        result["unit"] = "text chunks"
+    return result
+
+
+class CursorStore:
+    """
+    Pages of oversized results, kept for fetch_more.
+    Bounded by entry count and estimated size (least recently used results go first), an entry expires ttl seconds
+    after it was last read.
+    """
+    def __init__(self, ttl: float = CURSOR_TTL, max_entries: int = CURSOR_MAX_ENTRIES, max_bytes: int = CURSOR_MAX_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # handle -> (expires_at, size, shape)
+        self._bytes = 0
+        self.counters = {"created": 0, "fetched": 0, "misses": 0, "expired": 0, "evicted": 0}
+
+    def put(self, shape: dict, size: int) -> str:
+        handle = secrets.token_urlsafe(9)
+        with self._lock:
+            self._expire()
+            self._entries[handle] = (time.monotonic() + self.ttl, size, shape)
+            self._bytes += size
+            self.counters["created"] += 1
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.counters["evicted"] += 1
+        return handle
+
+    def get(self, handle: str) -> dict:
+        with self._lock:
+            entry = self._entries.get(handle)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(handle)
+                    self.counters["expired"] += 1
+                self.counters["misses"] += 1
+                return None
+            self._entries[handle] = (time.monotonic() + self.ttl, entry[1], entry[2])
+            self._entries.move_to_end(handle)
+            self.counters["fetched"] += 1
+            return entry[2]
+
+    def _expire(self):
+        now = time.monotonic()
+        for handle in [handle for handle, entry in self._entries.items() if entry[0] < now]:
+            self._remove(handle)
+            self.counters["expired"] += 1
+
+    def _remove(self, handle: str):
+        entry = self._entries.pop(handle)
+        self._bytes -= entry[1]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "max_entries": self.max_entries, "max_bytes": self.max_bytes, "ttl": self.ttl, **self.counters}
+
+
+class ResultShapingMiddleware(Middleware):
+    """
+    Keeps tool results within a byte budget before they reach the model's message history.
+    A tool_result whose encoded size is over its tool's budget is replaced by a summary, the first page and a cursor,
+    the following pages are read with the fetch_more tool. Budgets come from set_budget / the @budget decorator,
+    "result_budget" (bytes) in an IDEP function definition, or default_max_bytes.
+    """
+    def __init__(self, store: CursorStore = None, default_max_bytes: int = DEFAULT_MAX_BYTES, fetch_tool: str = "fetch_more"):
+        self.store = store or CursorStore()
+        self.default_max_bytes = default_max_bytes
+        self.fetch_tool = fetch_tool
+        # fetch_more's pages are already within the budget of the result they come from
+        self.tool_budgets = {fetch_tool: 0}
+        self._idep_tool_budgets = {}
+        self.shaped = 0
+
+    def set_budget(self, name: str, max_bytes: int = None, max_tokens: int = None):
+        """
+        Budget of a tool's results in bytes or tokens, 0 turns paging off for it.
+        """
+        self.tool_budgets[name] = max_bytes if max_bytes is not None else max_tokens * BYTES_PER_TOKEN
+
+    def budget(self, max_bytes: int = None, max_tokens: int = None):
+        """
+        Decorator form of set_budget, place it under @mcp.tool.
+        """
+        def decorator(func):
+            self.set_budget(func.__name__, max_bytes, max_tokens)
+            return func
+        return decorator
+
+    def on_idep_registry(self, registry, diff: dict = None):
+        self._idep_tool_budgets = {name: spec["idep"]["result_budget"] for name, spec in registry.tools.items() if "result_budget" in spec["idep"]}
+
+    def tool_budget(self, name: str) -> int:
+        if name in self.tool_budgets:
+            return self.tool_budgets[name]
+        return self._idep_tool_budgets.get(name, self.default_max_bytes)
+
+    def shape(self, name: str, value, max_bytes: int, size: int) -> dict:
+        """
+        Summary and first page of an oversized result, the rest is kept in the cursor store.
+        """
+        shape = split_result(value, max_bytes)
+        shape["tool"] = name
+        cursor = None
+        if len(shape["pages"]) > 1:
+            cursor = f"{self.store.put(shape, size)}.1"
+        self.shaped += 1
+        return {
+            "truncated": True,
+            "summary": summary(shape, 0),
+            "page": page_value(shape, 0),
+            "cursor": cursor,
+            "hint": f"Only part of the result is shown, call {self.fetch_tool} with the cursor for the next page.",
+        }
+
+    def fetch(self, cursor: str) -> dict:
+        """
+        The page a cursor points at, with the cursor of the page after it (None on the last page).
+        """
+        handle, _, page = (cursor or "").strip().rpartition(".")
+        if not handle or not page.isdigit():
+            raise CursorError(f"Malformed cursor {cursor!r}")
+        shape = self.store.get(handle)
+        if shape is None:
+            raise CursorError("The cursor expired or is unknown, call the original tool again")
+        page = int(page)
+        if not 0 <= page < len(shape["pages"]):
+            raise CursorError(f"The result has no page {page}")
+        return {
+            "summary": summary(shape, page),
+            "page": page_value(shape, page),
+            "cursor": f"{handle}.{page + 1}" if page + 1 < len(shape["pages"]) else None,
+        }
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        result = await call_next(context)
+        name = context.message.name
+        max_bytes = self.tool_budget(name)
+        # Results with structured content must match their tool's output schema, so they are never reshaped
+        if not max_bytes or getattr(result, "structured_content", None) is not None:
+            return result
+        text = result_text(result)
+        # A character is at most 4 bytes in UTF-8, only texts that may be over the budget are encoded to measure them
+        size = len(text.encode("utf-8")) if len(text) * 4 > max_bytes else len(text)
+        if size <= max_bytes:
+            return result
+        try:
+            value = loads(text)["result"]
+        except (ValueError, TypeError, KeyError):
+            value = text
+        return tool_result(self.shape(name, value, max_bytes, size))
+
+    def stats(self) -> dict:
+        return {"shaped_results": self.shaped, "cursors": self.store.stats()}
+
@@ -0,0 +1,94 @@
+import json
+from mcp.types import TextContent
+from fastmcp.tools.tool import ToolResult
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Every payload from tool_result starts with this when the tool reported a failure
+ERROR_PREFIX = '{"result":{"error"'
+
+
+def dumpb(value, sort_keys: bool = False) -> bytes:
+    """
+    Compact UTF-8 JSON. Values JSON has no type for (datetimes, sets, ...) are written as strings.
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(value, default=str, option=option)
+        except TypeError:
+            # e.g. integers over 64 bits, which the stdlib encoder handles
+            pass
+    return json.dumps(value, default=str, sort_keys=sort_keys, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def dumps(value, sort_keys: bool = False) -> str:
+    return dumpb(value, sort_keys).decode("utf-8")
+
+def loads(data):
+    """
+    JSON str / bytes -> value.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def tool_result(value) -> ToolResult:
+    """
+    Result of a tool: {"result": value} encoded once, as the only content block.
+    There is deliberately no structured content copy: it would send every result twice, our clients (lg_agent,
+    MCPTransport, the frontend) only read the text, and ResultShapingMiddleware can only page results without one,
+    because structured content has to match the tool's output schema. Annotate the tool with -> ToolResult so
+    FastMCP generates no output schema. Tools whose callers need structured content (the IDEP functions, see
+    IdepFunctionTool) return it with their output schema instead.
+    """
+    return ToolResult(content=[TextContent(type="text", text=dumps({"result": value}))])
+
+def result_text(result) -> str:
+    """
+    Text of a tool result's first content block, "" when it has none.
+    """
+    for block in getattr(result, "content", None) or []:
+        return getattr(block, "text", "") or ""
+    return ""
+
+def is_error_result(result) -> bool:
+    return result_text(result).startswith(ERROR_PREFIX)
+
+
+class EncodedToolResult:
+    """
+    A tool result held as its encoded UTF-8 bytes, smaller than the ToolResult and its content models.
+    to_tool_result() rebuilds an equal ToolResult. Results with non text content are kept as they are.
+    """
+    __slots__ = ("texts", "structured_content", "result")
+
+    def __init__(self, result: ToolResult):
+        blocks = getattr(result, "content", None) or []
+        if all(isinstance(block, TextContent) for block in blocks):
+            self.texts = [block.text.encode("utf-8") for block in blocks]
+            self.structured_content = result.structured_content
+            self.result = None
+        else:
+            self.texts = None
+            self.structured_content = None
+            self.result = result
+
+    @property
+    def size(self) -> int:
+        if self.texts is None:
+            return len(result_text(self.result))
+        return sum(len(text) for text in self.texts)
+
+    def to_tool_result(self) -> ToolResult:
+        if self.texts is None:
+            return self.result
+        result = ToolResult(content=[TextContent(type="text", text=text.decode("utf-8")) for text in self.texts])
+        # Already JSON compatible, set after construction so it is not converted again
+        result.structured_content = self.structured_content
+        return result
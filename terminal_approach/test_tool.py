@@ -1,8 +1,14 @@
-import subprocess
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from r_pool import RScriptRunner
+
+# R_TOOL_MODE=persistent (default) keeps one R process running the script, R_TOOL_MODE=spawn starts Rscript per call
+myfunc_script = RScriptRunner("terminal_approach/test_tool.r")
 
 def call_myfunc(x):
-    cmd = ["Rscript", "terminal_approach/test_tool.r", str(x)]
-    out = subprocess.run(cmd, capture_output=True, text=True, check=True)
-    return out.stdout
+    return myfunc_script(x)
 
-print(call_myfunc(21))  # → 42
\ No newline at end of file
+print(call_myfunc(21))  # → 42
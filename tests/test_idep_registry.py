@@ -0,0 +1,48 @@
+import os
+import sys
+import json
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from idep_registry import load_registry, safe_identifiers, make_function, compile_resource, COMPILER_VERSION
+
+
+def test_colliding_names_get_unique_identifiers():
+    assert safe_identifiers(["Group Type", "Group_Type", "Group-Type"]) == {
+        "Group Type": "Group_Type_2",
+        "Group_Type": "Group_Type",
+        "Group-Type": "Group_Type_3",
+    }
+
+def test_colliding_params_keep_their_idep_names():
+    calls = []
+
+    async def call(name, kwargs):
+        calls.append(kwargs)
+        return {}
+
+    params = [["Group Type", "string"], ["Group_Type", "integer"]]
+    for validated in (False, True):
+        function = make_function("Groups", "", params, call, validated=validated)
+        assert list(function.__signature__.parameters) == ["Group_Type_2", "Group_Type"]
+        asyncio.run(function(Group_Type_2="Plant", Group_Type=3))
+    assert calls == [{"Group Type": "Plant", "Group_Type": 3}] * 2
+
+def test_colliding_fields_make_a_valid_resource():
+    spec = compile_resource({"Groups": {"Fields": {"Group Type": "string", "Group_Type": "integer"}}})
+    assert spec["uri_template"] == "resource://Groups/{Group_Type_2}/{Group_Type}"
+    assert list(spec["parameters"]["properties"]) == ["Group_Type_2", "Group_Type"]
+
+def test_only_the_current_cache_file_is_kept(tmp_path):
+    idep_file = tmp_path / "test.idep"
+    cache_dir = tmp_path / "cache"
+    other_file = cache_dir / f"other.idep.{'0' * 64}.json"
+    cache_dir.mkdir()
+    other_file.write_text("{}")
+    for description in ("first", "second"):
+        idep_file.write_text(json.dumps({"LLMTools": {"Functions": {"Tool": {"description": description, "params": {}}}, "DBSchemas": []}}))
+        registry = load_registry(str(idep_file), str(cache_dir))
+        assert registry.tools["Tool"]["description"] == description
+    assert sorted(os.listdir(cache_dir)) == sorted([other_file.name, f"test.idep.{registry.digest}.json"])
+    assert json.loads((cache_dir / f"test.idep.{registry.digest}.json").read_text())["version"] == COMPILER_VERSION
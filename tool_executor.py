@@ -0,0 +1,48 @@
+import os
+import asyncio
+import functools
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# FastMCP runs plain `def` tools directly on the event loop, so tools await blocking calls (external services, R) on this pool instead
+DEFAULT_MAX_WORKERS = int(os.getenv("MCP_TOOL_THREADS", "16"))
+
+
+class ToolExecutor:
+    """
+    Bounded thread pool for tools that stay synchronous.
+    """
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS):
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mcp-tool")
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Runs func(*args, **kwargs) in the pool and awaits the result.
+        The context is copied so request scoped helpers (e.g. get_http_headers) keep working.
+        """
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()
+        return await loop.run_in_executor(self._pool, functools.partial(ctx.run, func, *args, **kwargs))
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+
+_tool_executor = None
+_tool_executor_lock = threading.Lock()
+
+def get_tool_executor() -> ToolExecutor:
+    """
+    Returns the process-wide ToolExecutor.
+    """
+    global _tool_executor
+    if _tool_executor is None:
+        with _tool_executor_lock:
+            if _tool_executor is None:
+                _tool_executor = ToolExecutor()
+    return _tool_executor
+
+async def run_in_thread(func, *args, **kwargs):
+    return await get_tool_executor().run(func, *args, **kwargs)
@@ -0,0 +1,199 @@
+import os
+import re
+import json
+import zlib
+import hashlib
+import threading
+import faiss
+import numpy as np
+
+DEFAULT_INDEX_DIR = os.path.join("config", ".tool_index")
+TOKEN_PATTERN = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+# Reads the next pages of a result the MCP server paged (result_shaping.ResultShapingMiddleware)
+FETCH_MORE_TOOL = "fetch_more"
+
+
+def tool_text(tool) -> str:
+    """
+    Text that represents a tool in the index: name, description and argument names.
+    Takes an MCP Tool or a dict with the same keys.
+    """
+    if isinstance(tool, dict):
+        name, description, schema = tool.get("name"), tool.get("description"), tool.get("inputSchema")
+    else:
+        name, description, schema = tool.name, tool.description, getattr(tool, "inputSchema", None)
+    fields = " ".join((schema or {}).get("properties", {}).keys())
+    return f"{name}\n{description or ''}\n{fields}"
+
+def tokenize(text: str) -> list:
+    """
+    Splits snake_case, camelCase and "Group Type" style names into lower case words.
+    """
+    return [token.lower() for token in TOKEN_PATTERN.findall(text)]
+
+
+class HashingEmbedder:
+    """
+    Local embedding function: words and character trigrams hashed into dim buckets, L2 normalized.
+    Needs no model or network, so the index can be built and tested offline.
+    """
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def __call__(self, texts: list) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                vectors[row, zlib.crc32(token.encode("utf-8")) % self.dim] += 1.0
+                padded = f"#{token}#"
+                for i in range(len(padded) - 2):
+                    vectors[row, zlib.crc32(padded[i:i + 3].encode("utf-8")) % self.dim] += 0.5
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class OpenAIEmbedder:
+    """
+    Embeddings from the OpenAI API.
+    """
+    def __init__(self, model: str = "text-embedding-3-small", api_key: str = None):
+        from openai import OpenAI
+        self.client = OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
+        self.model = model
+        self.name = f"openai-{model}"
+
+    def __call__(self, texts: list) -> np.ndarray:
+        response = self.client.embeddings.create(model=self.model, input=texts)
+        vectors = np.array([item.embedding for item in response.data], dtype=np.float32)
+        faiss.normalize_L2(vectors)
+        return vectors
+
+
+class ToolIndex:
+    """
+    FAISS inner product index over tool embeddings, used to pick the top-k tools for a query.
+    - embed is any callable list[str] -> float32 array of shape (n, dim) with normalized rows and a `name` attribute
+    - update() only embeds the tools that were added or whose text changed, removed tools are dropped
+    - The index is persisted in index_dir and reloaded as long as the embedder did not change
+    """
+    def __init__(self, embed, index_dir: str = DEFAULT_INDEX_DIR):
+        self.embed = embed
+        self.index_dir = index_dir
+        self.index = None
+        self.entries = {}  # tool name -> {"id": faiss id, "hash": hash of the tool text}
+        self.names = {}  # faiss id -> tool name
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _new_index(self, dim: int):
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def update(self, tools: list) -> dict:
+        """
+        Syncs the index with the given tools, returns the names that were added, updated and removed.
+        """
+        texts = {}
+        for tool in tools:
+            text = tool_text(tool)
+            name = text.split("\n", 1)[0]
+            texts[name] = text
+        hashes = {name: hashlib.sha1(text.encode("utf-8")).hexdigest() for name, text in texts.items()}
+
+        with self._lock:
+            added = [name for name in texts if name not in self.entries]
+            updated = [name for name in texts if name in self.entries and self.entries[name]["hash"] != hashes[name]]
+            removed = [name for name in self.entries if name not in texts]
+
+            stale_ids = [self.entries[name]["id"] for name in updated + removed]
+            if stale_ids and self.index is not None:
+                self.index.remove_ids(np.array(stale_ids, dtype=np.int64))
+            for name in updated + removed:
+                del self.names[self.entries.pop(name)["id"]]
+
+            new_names = added + updated
+            if new_names:
+                vectors = self.embed([texts[name] for name in new_names])
+                if self.index is None:
+                    self.index = self._new_index(vectors.shape[1])
+                ids = np.arange(self._next_id, self._next_id + len(new_names), dtype=np.int64)
+                self._next_id += len(new_names)
+                self.index.add_with_ids(vectors, ids)
+                for name, tool_id in zip(new_names, ids.tolist()):
+                    self.entries[name] = {"id": tool_id, "hash": hashes[name]}
+                    self.names[tool_id] = name
+        return {"added": added, "updated": updated, "removed": removed}
+
+    def search(self, query: str, k: int = 8) -> list:
+        """
+        Returns the names of the k tools closest to the query, best first.
+        """
+        with self._lock:
+            if self.index is None or not self.entries:
+                return []
+            vectors = self.embed([query])
+            _, ids = self.index.search(vectors, min(k, len(self.entries)))
+            return [self.names[tool_id] for tool_id in ids[0].tolist() if tool_id in self.names]
+
+    def save(self):
+        with self._lock:
+            if self.index is None or not self.index_dir:
+                return
+            os.makedirs(self.index_dir, exist_ok=True)
+            index_file = os.path.join(self.index_dir, "tools.faiss")
+            meta_file = os.path.join(self.index_dir, "tools.json")
+            faiss.write_index(self.index, f"{index_file}.tmp")
+            with open(f"{meta_file}.tmp", "w") as file:
+                json.dump({"embedder": self.embed.name, "next_id": self._next_id, "entries": self.entries}, file)
+            os.replace(f"{index_file}.tmp", index_file)
+            os.replace(f"{meta_file}.tmp", meta_file)
+
+    def load(self) -> bool:
+        """
+        Loads the persisted index, returns False when there is none or it was built with another embedder.
+        """
+        index_file = os.path.join(self.index_dir, "tools.faiss")
+        meta_file = os.path.join(self.index_dir, "tools.json")
+        if not os.path.exists(index_file) or not os.path.exists(meta_file):
+            return False
+        try:
+            with open(meta_file, "r") as file:
+                meta = json.load(file)
+            if meta.get("embedder") != self.embed.name:
+                return False
+            index = faiss.read_index(index_file)
+        except Exception as e:
+            print(f"Ignoring unreadable tool index {self.index_dir}: {e}")
+            return False
+        with self._lock:
+            self.index = index
+            self.entries = meta["entries"]
+            self.names = {entry["id"]: name for name, entry in self.entries.items()}
+            self._next_id = meta["next_id"]
+        return True
+
+
+def with_fetch_more(selected: list, tools: list) -> list:
+    """
+    The selected tool names plus fetch_more when one of them can return a paged result, so the model can follow
+    the cursor of a page. Results with structured content are never paged, so only tools without an output schema count.
+    """
+    if FETCH_MORE_TOOL in selected:
+        return selected
+    by_name = {tool.name: tool for tool in tools}
+    if FETCH_MORE_TOOL in by_name and any(name in by_name and by_name[name].outputSchema is None for name in selected):
+        return [*selected, FETCH_MORE_TOOL]
+    return selected
+
+
+def make_embedder(kind: str = None):
+    """
+    Embedding function selected by TOOL_EMBEDDINGS: "hashing" (local, the default) or "openai".
+    """
+    kind = kind or os.getenv("TOOL_EMBEDDINGS", "hashing")
+    if kind == "openai":
+        return OpenAIEmbedder(os.getenv("TOOL_EMBEDDING_MODEL", "text-embedding-3-small"))
+    return HashingEmbedder()
@@ -0,0 +1,153 @@
+import json
+import hashlib
+import threading
+from pydantic import create_model
+
+# Keywords OpenAI does not use for function parameters, everything else is passed through as is
+DROPPED_KEYWORDS = {"title", "$schema", "$defs", "definitions"}
+# Keywords whose values are data, they are copied without resolving
+DATA_KEYWORDS = {"default", "enum", "const", "examples"}
+
+PYDANTIC_TYPES = {
+    "string": str,
+    "integer": int,
+    "number": float,
+    "boolean": bool,
+    "array": list,
+    "object": dict,
+}
+
+_lock = threading.Lock()
+_openai_tools = {}  # (name, description, schema hash) -> (tool dict, serialized tool)
+_pydantic_models = {}  # (name, schema hash) -> pydantic model
+# id(schema) -> (schema, hash), listings are reused until the server reports a change, so this skips hashing them again
+_schema_hashes = {}
+MAX_SCHEMA_HASHES = 4096
+
+
+def schema_hash(schema: dict) -> str:
+    return hashlib.sha1(json.dumps(schema or {}, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+def cached_schema_hash(schema: dict) -> str:
+    """
+    schema_hash, remembered per schema object. Schemas must not be modified in place after they were hashed.
+    """
+    entry = _schema_hashes.get(id(schema))
+    if entry is not None and entry[0] is schema:
+        return entry[1]
+    digest = schema_hash(schema)
+    with _lock:
+        if len(_schema_hashes) >= MAX_SCHEMA_HASHES:
+            _schema_hashes.clear()
+        # The schema is kept alive with its hash, so its id cannot be reused by another object
+        _schema_hashes[id(schema)] = (schema, digest)
+    return digest
+
+def _resolve(node, defs: dict, seen: tuple = ()):
+    if isinstance(node, list):
+        return [_resolve(item, defs, seen) for item in node]
+    if not isinstance(node, dict):
+        return node
+    ref = node.get("$ref")
+    if isinstance(ref, str) and ref.startswith(("#/$defs/", "#/definitions/")):
+        ref_name = ref.rsplit("/", 1)[-1]
+        if ref_name in defs and ref_name not in seen:
+            resolved = _resolve(defs[ref_name], defs, seen + (ref_name,))
+            # Siblings of $ref (e.g. a description) win over the referenced schema
+            siblings = {key: _resolve(value, defs, seen) for key, value in node.items() if key != "$ref" and key not in DROPPED_KEYWORDS}
+            return {**resolved, **siblings}
+    resolved = {}
+    for key, value in node.items():
+        if key in DROPPED_KEYWORDS:
+            continue
+        if key in DATA_KEYWORDS:
+            resolved[key] = value
+        elif key == "properties" and isinstance(value, dict):
+            # Property names are user data, never keywords
+            resolved[key] = {name: _resolve(prop, defs, seen) for name, prop in value.items()}
+        else:
+            resolved[key] = _resolve(value, defs, seen)
+    return resolved
+
+def to_openai_parameters(schema: dict) -> dict:
+    """
+    MCP input schema -> OpenAI function parameters.
+    $refs are inlined, items, enums, required, defaults, nested objects and anyOf are kept.
+    """
+    schema = schema or {}
+    defs = {**schema.get("definitions", {}), **schema.get("$defs", {})}
+    parameters = _resolve(schema, defs)
+    parameters.setdefault("type", "object")
+    parameters.setdefault("properties", {})
+    parameters.setdefault("additionalProperties", False)
+    return parameters
+
+def _tool_fields(tool):
+    if isinstance(tool, dict):
+        return tool.get("name"), tool.get("description"), tool.get("inputSchema")
+    return tool.name, tool.description, getattr(tool, "inputSchema", None)
+
+def _cached_openai_tool(tool) -> tuple:
+    name, description, schema = _tool_fields(tool)
+    key = (name, description, cached_schema_hash(schema))
+    cached = _openai_tools.get(key)
+    if cached is None:
+        openai_tool = {
+            "type": "function",
+            "function": {
+                "name": name,
+                "description": description or "",
+                "parameters": to_openai_parameters(schema),
+            }
+        }
+        cached = (openai_tool, json.dumps(openai_tool, separators=(",", ":")))
+        with _lock:
+            cached = _openai_tools.setdefault(key, cached)
+    return cached
+
+def to_openai_tool(tool) -> dict:
+    """
+    MCP Tool (or a dict with name, description and inputSchema) -> OpenAI tool definition, memoized by schema hash.
+    The returned dict is shared, do not modify it.
+    """
+    return _cached_openai_tool(tool)[0]
+
+def openai_tools_json(tools: list) -> str:
+    """
+    The OpenAI "tools" array of the given tools, already serialized.
+    Each tool is serialized once, a call only joins the cached strings.
+    """
+    return "[" + ",".join(_cached_openai_tool(tool)[1] for tool in tools) + "]"
+
+def chat_request_body(tools_json: str, **fields) -> bytes:
+    """
+    Chat completions request body with a pre-serialized tools array spliced in, the tools are not re-encoded.
+    """
+    body = json.dumps(fields, separators=(",", ":"), ensure_ascii=False)
+    if tools_json != "[]":
+        separator = "," if fields else ""
+        body = body[:-1] + separator + '"tools":' + tools_json + "}"
+    return body.encode("utf-8")
+
+def schema_to_pydantic(name: str, schema: dict):
+    """
+    Pydantic args model of an MCP input schema, created once per (name, schema).
+    """
+    key = (name, cached_schema_hash(schema))
+    model = _pydantic_models.get(key)
+    if model is not None:
+        return model
+    fields = {}
+    for arg, props in (schema or {}).get("properties", {}).items():
+        typ = PYDANTIC_TYPES.get(props.get("type", "string"), str)
+        default = props.get("default", None)
+        fields[arg] = (typ, default)
+    model = create_model(f"{name}_Args", **fields)
+    with _lock:
+        return _pydantic_models.setdefault(key, model)
+
+def clear_schema_cache():
+    with _lock:
+        _openai_tools.clear()
+        _pydantic_models.clear()
+        _schema_hashes.clear()
@@ -1,14 +1,43 @@
 import json
 import os
-from openai import OpenAI
+import httpx
+from openai.types.chat import ChatCompletion
 from dotenv import load_dotenv
-from fastmcp import Client
 import asyncio
+from contextlib import asynccontextmanager
+from mcp_client_pool import MCPClientPool
+from tool_index import ToolIndex, make_embedder, with_fetch_more
+from tool_schemas import openai_tools_json, chat_request_body
 from fastapi import FastAPI, Request
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI()
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+MCP_SERVER_URL = "http://127.0.0.1:8000/mcp/"
+TOOL_TOP_K = int(os.getenv("TOOL_TOP_K", "8"))
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+
+# The tool listing is cached by the pool and refreshed when the server reports a change
+mcp_pool = MCPClientPool(MCP_SERVER_URL)
+# Only the top-k tools for the question are sent to the LLM
+tool_index = ToolIndex(make_embedder())
+tool_index.load()
+indexed_tools = None
+
+# The request body is built by hand so the cached tools JSON is sent without re-encoding
+openai_http = httpx.AsyncClient(
+    base_url=OPENAI_BASE_URL,
+    headers={"Authorization": f"Bearer {OPENAI_API_KEY}", "Content-Type": "application/json"},
+    timeout=60
+)
+
+@asynccontextmanager
+async def lifespan(app : FastAPI):
+    async with mcp_pool:
+        yield
+    await openai_http.aclose()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,68 +47,48 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-MCP_SERVER_URL = "http://127.0.0.1:8000/mcp/"
-
-
 @app.post("/agent")
 async def get_tools(req : Request):
 
-    async with Client(MCP_SERVER_URL) as client:
-        all_tools = await client.list_tools()
-    
-    
-    
-    openai_tools = []
-    for tool in list(all_tools):
-        print()
-        openai_tool = {
-            "type": "function",
-            "function": {
-                "name": tool.name,
-                "description": tool.description,
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        # Populate dynamically
-                    },
-                "additionalProperties": False
-                }
-            }
-        }
-        for key, value in tool.inputSchema.get("properties").items():
-            if value.get("type") == "array":
-                openai_tool["function"]["parameters"]["properties"][key] = {
-                    "type": value.get("type"),
-                    "items": value.get("items")
-                }
-            else:
-                openai_tool["function"]["parameters"]["properties"][key] = {
-                    "type": value.get("type"),
-                }
-        openai_tools.append(openai_tool)
-    
+    global indexed_tools
+    all_tools = await mcp_pool.list_tools()
+    # The pool returns the same list until the server reports a change
+    if all_tools is not indexed_tools:
+        diff = await asyncio.to_thread(tool_index.update, all_tools)
+        if any(diff.values()):
+            await asyncio.to_thread(tool_index.save)
+        indexed_tools = all_tools
+
     data = await req.json()
     user_prompt = data.get("question")
+    if len(all_tools) > TOOL_TOP_K:
+        selected_names = await asyncio.to_thread(tool_index.search, user_prompt, TOOL_TOP_K)
+        # fetch_more is pinned whatever its score, a paged result is useless without it
+        selected_names = set(with_fetch_more(selected_names, all_tools))
+        all_tools = [tool for tool in all_tools if tool.name in selected_names]
+
+    # Converted and serialized once per tool schema, not per request
+    tools_json = openai_tools_json(all_tools)
 
     #system_prompt = "You are a tool selector. You should pick multiple tools. Pick every single tool and their arguments to satisfy the user's request. Execute these tools with the necessary arguments. Respond with Error! if you come accross a problem. If you deem no need for any tools, do not execute any tools."
     #user_message = f"Given the user query: \"{user_prompt}\"\nSelect every tool that can be used to satisfy the user's request."
     system_prompt = """You choose one or multiple tools according to Turkish or English user queries about some employee shift management data. The tools chosen by you will be used by a python programmer agent.
                      While choosing a tool, you must consider what are the data fields written in the tool description, since multiple tables would be needeed as merged data related to a given user query."""
 
-    client = OpenAI(api_key=OPENAI_API_KEY)
+    body = chat_request_body(
+        tools_json,
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        parallel_tool_calls=True,
+        temperature=0
+    )
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            tools=openai_tools,
-            parallel_tool_calls=True,
-            temperature=0
-        )
-        
+        resp = await openai_http.post("/chat/completions", content=body)
+        resp.raise_for_status()
+        response = ChatCompletion.model_validate(resp.json())
     except Exception as e:
         print("ERROR IS :", e)
         return {"result": json.dumps({"error": f"Error picking tools: {e}"})}
@@ -0,0 +1,143 @@
+import os
+import time
+import random
+import threading
+from collections import deque
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+from serialization import dumps, dumpb, is_error_result
+
+DEFAULT_TRACE_FILE = os.getenv("MCP_TRACE_FILE", "traces/tool_calls.jsonl")
+DEFAULT_SAMPLE_RATE = float(os.getenv("MCP_TRACE_SAMPLE_RATE", "1.0"))
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class TraceRecorder:
+    """
+    Collects tool call spans without locking the hot path.
+    - Spans go into a bounded deque (appends are atomic), the oldest spans are dropped when it is full.
+    - A background thread drains the buffer into a JSONL file every flush_interval seconds.
+    - The last window_size durations per tool are kept for p50/p95/p99.
+    """
+    def __init__(self, sink_path: str = DEFAULT_TRACE_FILE, capacity: int = 10000, flush_interval: float = 1.0, window_size: int = 1024):
+        self.sink_path = sink_path
+        self.flush_interval = flush_interval
+        self.window_size = window_size
+        self.buffer = deque(maxlen=capacity)
+        self.durations = {}
+        self.errors = {}
+        self.recorded = 0
+        self.flushed = 0
+        self._flusher = None
+        self._stop = threading.Event()
+
+    def record(self, span: dict):
+        self.buffer.append(span)
+        self.recorded += 1
+
+    def observe(self, tool_name: str, duration_ms: float, failed: bool = False):
+        window = self.durations.get(tool_name)
+        if window is None:
+            window = self.durations.setdefault(tool_name, deque(maxlen=self.window_size))
+        window.append(duration_ms)
+        if failed:
+            self.errors[tool_name] = self.errors.get(tool_name, 0) + 1
+
+    def drain(self) -> list:
+        spans = []
+        while True:
+            try:
+                spans.append(self.buffer.popleft())
+            except IndexError:
+                return spans
+
+    def flush(self):
+        spans = self.drain()
+        if not spans or not self.sink_path:
+            return
+        with open(self.sink_path, "a", buffering=1024 * 1024) as file:
+            file.write("".join(dumps(span) + "\n" for span in spans))
+        self.flushed += len(spans)
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Failed to flush traces to {self.sink_path}: {e}")
+
+    def start(self):
+        if self._flusher is None and self.sink_path:
+            sink_dir = os.path.dirname(self.sink_path)
+            if sink_dir:
+                os.makedirs(sink_dir, exist_ok=True)
+            self._flusher = threading.Thread(target=self._flush_loop, name="trace-flusher", daemon=True)
+            self._flusher.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+
+    def latency_stats(self) -> dict:
+        stats = {}
+        for tool_name, window in list(self.durations.items()):
+            values = sorted(window)
+            stats[tool_name] = {
+                "count": len(values),
+                "p50_ms": percentile(values, 50),
+                "p95_ms": percentile(values, 95),
+                "p99_ms": percentile(values, 99),
+                "max_ms": values[-1] if values else 0.0,
+                "errors": self.errors.get(tool_name, 0),
+            }
+        return stats
+
+
+class TracingMiddleware(Middleware):
+    """
+    Records a span per tool call: start, end, duration, argument size, result size (UTF-8 bytes) and error class.
+    A call fails when it raises or returns a tool_result {"error": ...} (error "ToolResultError").
+    Only a sample_rate fraction of successful calls are written as spans, failed calls always are.
+    Latency percentiles are kept for every call regardless of sampling.
+    """
+    def __init__(self, recorder: TraceRecorder = None, sample_rate: float = DEFAULT_SAMPLE_RATE):
+        self.recorder = recorder or TraceRecorder()
+        self.sample_rate = sample_rate
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        tool_name = context.message.name
+        start = time.time()
+        start_perf = time.perf_counter()
+        error = None
+        result = None
+        try:
+            result = await call_next(context)
+            return result
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            duration_ms = (time.perf_counter() - start_perf) * 1000
+            failed = error is not None or is_error_result(result)
+            self.recorder.observe(tool_name, duration_ms, failed)
+            if failed or random.random() < self.sample_rate:
+                result_size = 0
+                for block in getattr(result, "content", None) or []:
+                    result_size += len((getattr(block, "text", "") or "").encode("utf-8"))
+                self.recorder.record({
+                    "tool": tool_name,
+                    "start": start,
+                    "end": start + duration_ms / 1000,
+                    "duration_ms": duration_ms,
+                    "args_bytes": len(dumpb(context.message.arguments or {})),
+                    "result_bytes": result_size,
+                    "error": type(error).__name__ if error is not None else ("ToolResultError" if failed else None),
+                })